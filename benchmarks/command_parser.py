@@ -0,0 +1,40 @@
+"""
+Measures how long it takes to parse /sereno commands, over a corpus of real command texts.
+
+Usage (from the root directory): python -m benchmarks.command_parser [iterations]
+"""
+import sys
+import timeit
+from slack_handlers.command_parser import CommandParser
+
+CORPUS = [
+    "register",
+    "help",
+    "responders list",
+    "responders add <@U01H45TA509|lisandro> <@U01GZ6XKQ3M|maria>",
+    "responders add <#C01HB8S5ZQF|incidents>",
+    "responders add",
+    "responders remove <@U01H45TA509|lisandro>",
+    "set oncall <@U01GZ6XKQ3M|maria>",
+    "oncall set <@U01GZ6XKQ3M>",
+    "set oncall",
+    "close incident",
+    "responders",
+    "what can you do?",
+    "Register",
+]
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    print(f"parse time over {iterations} iterations")
+    for text in CORPUS:
+        seconds = timeit.timeit(lambda: CommandParser.parse(text), number=iterations)
+        command = CommandParser.parse(text)
+        print(
+            f"{text[:45]:<47} {str(command.name):<18} {seconds / iterations * 1e6:6.2f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Measures how long it takes to import each lambda entry point in a fresh interpreter.
+This is the part of a cold start spent before the handler runs.
+
+Usage: python benchmarks/import_time.py [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+ENTRY_POINTS = [
+    "functions.handler",
+    "functions.mention",
+    "functions.message",
+    "functions.commands",
+    "functions.interaction",
+]
+
+# Only needed to import the modules, nothing is called
+FAKE_ENVIRONMENT = {
+    "STAGE": "dev",
+    "USERS_TABLE": "users-table-dev",
+    "INCIDENTS_TABLE": "incidents-table-dev",
+    "SLACK_SIGNING_SECRET": "secret",
+    "JIRA_CLIENT_ID": "jira",
+    "JIRA_REDIRECT_URL": "http://localhost/jira/auth",
+    "ZOOM_REDIRECT_URI": "http://localhost/zoom/auth",
+    "AWS_DEFAULT_REGION": "us-east-1",
+}
+
+IMPORT_SCRIPT = (
+    "import time; start = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def measure_import(module, runs, environment):
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT.format(module=module)],
+            env=environment,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        timings.append(float(output) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    environment = {**FAKE_ENVIRONMENT, **os.environ, "PYTHONPATH": root}
+    print(f"median import time over {runs} runs")
+    for module in ENTRY_POINTS:
+        print(f"{module:<25} {measure_import(module, runs, environment):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
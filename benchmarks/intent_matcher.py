@@ -0,0 +1,69 @@
+"""
+Compares the intent matcher, one regex scan of the text, with the substring checks the mention
+handler used to do, on short mentions and on long messages (pasted logs, stack traces).
+
+Usage (from the root directory): python -m benchmarks.intent_matcher [iterations]
+"""
+
+import re
+import sys
+import timeit
+from slack_handlers.intent_matcher import MENTION_INTENTS
+
+FILLER = "the db latency went up after the deploy and the retries piled up. "
+
+TEXTS = {
+    "short, no intent": "<@U01H45TA509> thanks!",
+    "short, new incident": "<@U01H45TA509> new incident payments are failing",
+    "short, ongoing": "<@U01H45TA509> any ongoing incidents?",
+    "4KB, no intent": "<@U01H45TA509> " + FILLER * 60,
+    "4KB, ongoing at the end": "<@U01H45TA509> " + FILLER * 60 + "ongoing incident?",
+    "32KB, no intent": "<@U01H45TA509> " + FILLER * 480,
+}
+
+
+def old_sanitise_incident_name(name):
+    name = re.sub(r"\<@([^\|]+)>", "", name)
+    return name.replace("new incident", "").replace("create incident", "").strip()
+
+
+def substring_checks(text):
+    """
+    The if/elif chain of the mention handler before the intent matcher,
+    with the incident name it built for new incidents
+    """
+    if "alive" in text:
+        return "alive"
+    if "create ticket" in text:
+        return "create_ticket"
+    if "create call" in text:
+        return "create_call"
+    if "get call" in text:
+        return "get_call"
+    if "new incident" in text or "create incident" in text:
+        old_sanitise_incident_name(text)
+        return "new_incident"
+    if "who is oncall" in text or "who’s oncall" in text:
+        return "oncall"
+    if "ongoing" in text and ("incident" in text or "incidents" in text):
+        return "ongoing_incidents"
+    return None
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"time per text over {iterations} iterations")
+    print(f"{'text':<26} {'matcher':>12} {'substrings':>12}")
+    for name, text in TEXTS.items():
+        intent = MENTION_INTENTS.match(text)
+        assert (intent.name if intent else None) == substring_checks(text)
+        matcher = timeit.timeit(lambda: MENTION_INTENTS.match(text), number=iterations)
+        substrings = timeit.timeit(lambda: substring_checks(text), number=iterations)
+        print(
+            f"{name:<26} {matcher / iterations * 1e6:9.2f} us "
+            f"{substrings / iterations * 1e6:9.2f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,7 @@ class Incident:
         self.name = name
         self.status = IncidentStatus.ONGOING
         self.started_datetime = DateTimeUtils.current_datetime_as_string()
+        self.closed_at = None
         self.ticket: Integration = None
         self.call: Integration = None
 
@@ -26,6 +27,7 @@ class Incident:
         )
         incident.status = input_dict.get("status")  # TODO - use value of for enum!
         incident.started_datetime = input_dict.get("started_datetime")
+        incident.closed_at = input_dict.get("closed_at")
         return incident
 
     def set_call(self, call: Integration):
@@ -1,6 +1,5 @@
 from domain.token_data import TokenData
 from domain.integrations.integration import Integration
-from flask import url_for
 from utils.integration_enum import IntegrationType
 
 
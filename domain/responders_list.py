@@ -1,4 +1,4 @@
-from utils.dynamo import DynamoUtils
+from utils.storage import Storage
 from typing import List
 from domain.slack_responder import SlackResponder
 
@@ -13,7 +13,7 @@ class RespondersList:
         """
         Returns the list of responders from the database.
         """
-        responder_id_list = list(DynamoUtils.get_responders(team_id))
+        responder_id_list = list(Storage.get_backend().get_responders(team_id))
         responders = cls.__build_responders_list(responder_id_list)
         return responders
 
@@ -25,7 +25,7 @@ class RespondersList:
                     team_id(str): Team id
                     responders_list (List[str]): List of slack user ids.
         """
-        response = DynamoUtils.save_responders(team_id, responders_list)
+        response = Storage.get_backend().save_responders(team_id, responders_list)
         if cls.has_responders(response):
             responders_complete = response.get("Attributes").get("responders")
             responders = cls.__build_responders_list(responders_complete)
@@ -40,7 +40,7 @@ class RespondersList:
                     team_id(str): Team id
                     responders_list (List[str]): List of slack user ids.
         """
-        response = DynamoUtils.remove_responders(team_id, responders_list)
+        response = Storage.get_backend().remove_responders(team_id, responders_list)
         if cls.has_responders(response):
             responders_complete = response.get("Attributes").get("responders")
             responders = cls.__build_responders_list(responders_complete)
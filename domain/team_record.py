@@ -0,0 +1,70 @@
+class TeamRecord:
+    """
+    Represents a team item from the users table (slack token, authorized apps, responders and oncall).
+    It is loaded once and then used to answer all the reads made for the team
+    """
+
+    def __init__(self, team_id, item: dict):
+        self.team_id = team_id
+        self.item = item
+
+    def get_version(self):
+        """Every write to the team item increases the version by one"""
+        return self.item.get("version", 0)
+
+    def set_version(self, version):
+        self.item["version"] = version
+
+    def get_slack_access_token(self):
+        return self.item.get("access_token")
+
+    def get_authorized_apps(self) -> dict:
+        return self.item.get("apps", {})
+
+    def get_oncall(self):
+        return self.item.get("oncall")
+
+    def get_responders(self):
+        if "responders" not in self.item:
+            return []
+        return self.item["responders"]
+
+    def has_open_incidents_summary(self) -> bool:
+        return "open_incidents" in self.item
+
+    def get_open_incidents(self) -> dict:
+        """
+        Returns the ongoing incidents of the team, keyed by incident id (channel id).
+        Each entry has the name, started_datetime, callLink and ticketLink
+        """
+        return self.item.get("open_incidents", {})
+
+    def set_slack_access_token(self, access_token):
+        self.item["access_token"] = access_token
+        self.item.setdefault("apps", {})
+        self.item.setdefault("open_incidents", {})
+
+    def set_app(self, app_name: str, app_data: dict):
+        self.item.setdefault("apps", {})[app_name] = app_data
+
+    def set_open_incidents(self, open_incidents: dict):
+        self.item["open_incidents"] = open_incidents
+
+    def set_open_incident(self, incident_id, incident_summary: dict):
+        self.item.setdefault("open_incidents", {})[incident_id] = incident_summary
+
+    def remove_open_incident(self, incident_id):
+        self.item.get("open_incidents", {}).pop(incident_id, None)
+
+    def set_oncall(self, user_id):
+        self.item["oncall"] = user_id
+
+    def set_responders(self, responders):
+        """
+        Replaces the responders with the full list returned by the database after an update.
+        An empty list removes the attribute, the same way dynamo does with empty sets
+        """
+        if responders:
+            self.item["responders"] = set(responders)
+        else:
+            self.item.pop("responders", None)
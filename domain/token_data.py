@@ -1,25 +1,24 @@
-import datetime as dt
+from decimal import Decimal
+from utils.date_time_utils import DateTimeUtils
 
 
 class TokenData:
-
     """
     Class to save token data coming from an oauth request.
     It represents an oauth response. Contains access_token, refresh_token, and expiry date.
+    The expiry date is kept as epoch seconds, dates saved as strings by older versions are converted
     """
 
-    datetime_format = "%Y-%m-%d %H:%M:%S"
-
     def __init__(self, access_token, refresh_token, expiry_date):
         self.access_token = access_token
         self.refresh_token = refresh_token
-        self.expiry_date = expiry_date
+        self.expiry_date = self.__to_epoch(expiry_date)
 
     def is_access_token_expired(self) -> bool:
-        datetime_formatted = dt.datetime.strptime(
-            self.expiry_date, self.datetime_format
-        )
-        return datetime_formatted <= dt.datetime.now()
+        return self.expires_within(0)
+
+    def expires_within(self, seconds) -> bool:
+        return self.expiry_date <= DateTimeUtils.current_epoch() + seconds
 
     def is_valid(self) -> bool:
         return (
@@ -27,3 +26,15 @@ class TokenData:
             and bool(self.refresh_token)
             and bool(self.expiry_date)
         )
+
+    @classmethod
+    def __to_epoch(cls, expiry_date):
+        if expiry_date is None or expiry_date == "":
+            return None
+        if isinstance(expiry_date, str):
+            # local date time saved by older versions
+            return DateTimeUtils.convert_string_datetime_to_epoch(expiry_date)
+        if isinstance(expiry_date, Decimal):
+            # numbers come back from dynamo as Decimal
+            return int(expiry_date)
+        return expiry_date
@@ -0,0 +1,16 @@
+"""
+Scheduled job that moves incidents closed long ago to the archive table
+"""
+import logging
+from utils.incident_archive import IncidentArchive
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def archive_incidents_handler(_event, context):
+    archived = IncidentArchive.archive_closed_incidents(
+        remaining_millis=context.get_remaining_time_in_millis
+    )
+    logger.info(f"incident archival finished, archived {archived} incidents")
+    return {"archived": archived}
@@ -1,17 +1,29 @@
 """
 Handle slack slash commands
 """
-import re
-from slack_sdk import WebClient
+from utils.slack_clients import SlackClients
+from slack_handlers.command_parser import CommandParser, ParsedCommand
 from slack_handlers.slack_commands_handler import SlackCommandsHandler
 from slack_message_formatters.help_formatter import HelpFormatter
-from utils.dynamo import DynamoUtils
+from utils.storage import Storage
 
 
-# responders_regex = "\<@([^\|]+)\|([^\>]+)\>" # in case we want to extract both username and user id
+class CommandRequest:
+    """The parsed command together with what its handler needs to answer"""
 
-USER_ID_REGEX = "\<@([^\|]+)"
-CHANNEL_ID_REGEX = "\<#([^\|]+)"
+    def __init__(self, message, command: ParsedCommand, client, slack_commands_handler):
+        self.message = message
+        self.command = command
+        self.client = client
+        self.slack_commands_handler = slack_commands_handler
+
+    def reply(self, **kwargs):
+        """Posts a message only the user who sent the command sees"""
+        self.client.chat_postEphemeral(
+            channel=self.message.get("channel_id"),
+            user=self.message["user_id"],
+            **kwargs,
+        )
 
 
 def command_handler(message, _context):
@@ -19,79 +31,93 @@ def command_handler(message, _context):
     Handles commands sent to slackbot
     """
     team_id = message["team_id"]
-    user_id = message["user_id"]
-    command = message["text"]
-    trigger_id = message.get("trigger_id")
-    channel_id = message.get("channel_id")
-    slack_access_token = DynamoUtils.get_slack_access_token(team_id)
-    client = WebClient(token=slack_access_token)
-    slack_commands_handler = SlackCommandsHandler(team_id)
-    if "register" in command:
-        client.chat_postEphemeral(
-            channel=channel_id,
-            user=user_id,
-            blocks=slack_commands_handler.build_register_response(user_id).get(
-                "blocks"
-            ),
-        )
-    elif "responders" in command:
-        if "add" in command:
-            responders_list_users = re.findall(USER_ID_REGEX, command)
-            responders_list_channels = re.findall(CHANNEL_ID_REGEX, command)
-            responders_list = responders_list_users + responders_list_channels
-            if len(responders_list) == 0:
-                client.chat_postEphemeral(
-                    channel=channel_id,
-                    user=user_id,
-                    text="List of responders cannot be empty!",
-                )
-            response = slack_commands_handler.add_responders(responders_list)
-            client.chat_postEphemeral(channel=channel_id, user=user_id, text=response)
-        elif "remove" in command:
-            responders_list_users = re.findall(USER_ID_REGEX, command)
-            responders_list_channels = re.findall(CHANNEL_ID_REGEX, command)
-            responders_list = responders_list_users + responders_list_channels
-            response = slack_commands_handler.remove_responders(responders_list)
-            client.chat_postEphemeral(channel=channel_id, user=user_id, text=response)
-        elif "list" in command:
-            response = slack_commands_handler.list_responders()
-            client.chat_postEphemeral(channel=channel_id, user=user_id, text=response)
-        else:
-            client.chat_postEphemeral(
-                channel=channel_id,
-                user=user_id,
-                text="Sorry I did not understand the command: options are add, remove, list",
-            )
-    elif "oncall" in command:
-        if "set" in command:
-            user_matched = re.search(USER_ID_REGEX, command)
-            if user_matched is not None:
-                user_id_to_set = user_matched.group(1)
-                slack_commands_handler.set_oncall(user_id_to_set)
-                client.chat_postEphemeral(
-                    channel=channel_id,
-                    user=user_id,
-                    text="<@%s> set as oncall" % user_id_to_set,
-                )
-            else:
-                client.chat_postEphemeral(
-                    channel=channel_id,
-                    user=user_id,
-                    text="Sorry, wrong format. Do `/sereno set oncall <user>`",
-                )
-    elif "help" in command:
-        formatter = HelpFormatter()
-        client.chat_postEphemeral(
-            channel=channel_id, user=user_id, blocks=formatter.format().get("blocks")
-        )
-    elif "close incident" in command:
-        slack_commands_handler.show_close_incident_modal(
-            team_id, channel_id, trigger_id
-        )
-    else:
-        client.chat_postEphemeral(
-            channel=channel_id,
-            user=user_id,
-            text="Sorry I did not understand the command. "
-            "Type `/sereno help` to see a list of available commands",
-        )
+    slack_access_token = Storage.get_backend().get_slack_access_token(team_id)
+    client = SlackClients.get_client(slack_access_token)
+    request = CommandRequest(
+        message,
+        CommandParser.parse(message["text"]),
+        client,
+        SlackCommandsHandler(team_id),
+    )
+    COMMAND_HANDLERS.get(request.command.name, unknown_command)(request)
+
+
+def register(request: CommandRequest):
+    response = request.slack_commands_handler.build_register_response(
+        request.message["user_id"]
+    )
+    request.reply(blocks=response.get("blocks"))
+
+
+def add_responders(request: CommandRequest):
+    responders_list = request.command.get_mentions()
+    if len(responders_list) == 0:
+        request.reply(text="List of responders cannot be empty!")
+        return
+    response = request.slack_commands_handler.add_responders(responders_list)
+    request.reply(text=response)
+
+
+def remove_responders(request: CommandRequest):
+    responders_list = request.command.get_mentions()
+    if len(responders_list) == 0:
+        request.reply(text="List of responders cannot be empty!")
+        return
+    response = request.slack_commands_handler.remove_responders(responders_list)
+    request.reply(text=response)
+
+
+def list_responders(request: CommandRequest):
+    request.reply(text=request.slack_commands_handler.list_responders())
+
+
+def responders_usage(request: CommandRequest):
+    request.reply(
+        text="Sorry I did not understand the command: options are add, remove, list"
+    )
+
+
+def set_oncall(request: CommandRequest):
+    if len(request.command.user_ids) == 0:
+        oncall_usage(request)
+        return
+    user_id_to_set = request.command.user_ids[0]
+    request.slack_commands_handler.set_oncall(user_id_to_set)
+    request.reply(text="<@%s> set as oncall" % user_id_to_set)
+
+
+def oncall_usage(request: CommandRequest):
+    request.reply(text="Sorry, wrong format. Do `/sereno set oncall <user>`")
+
+
+def show_help(request: CommandRequest):
+    request.reply(blocks=HelpFormatter().format().get("blocks"))
+
+
+def close_incident(request: CommandRequest):
+    request.slack_commands_handler.show_close_incident_modal(
+        request.message["team_id"],
+        request.message.get("channel_id"),
+        request.message.get("trigger_id"),
+    )
+
+
+def unknown_command(request: CommandRequest):
+    request.reply(
+        text="Sorry I did not understand the command. "
+        "Type `/sereno help` to see a list of available commands"
+    )
+
+
+# command name from CommandParser.COMMANDS -> handler
+COMMAND_HANDLERS = {
+    "register": register,
+    "responders": responders_usage,
+    "responders_add": add_responders,
+    "responders_remove": remove_responders,
+    "responders_list": list_responders,
+    "oncall": oncall_usage,
+    "set_oncall": set_oncall,
+    "help": show_help,
+    "close_incident": close_incident,
+}
@@ -0,0 +1,25 @@
+"""
+Applies the writes deferred while dynamo was throttled, see utils/deferred_writes.py
+"""
+import logging
+from domain.incident import IncidentStatus
+from utils.deferred_writes import DeferredWrites
+from utils.dynamo import DynamoUtils
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def apply_deferred_write(event, _context):
+    if event.get("write") != DeferredWrites.OPEN_INCIDENTS:
+        logger.error(f"unknown deferred write {event.get('write')}")
+        return
+    team_id = event["team"]
+    opened, closed_ids = [], []
+    for incident_id in event["incident_ids"]:
+        incident = DynamoUtils.get_incident(team_id, incident_id, consistent_read=True)
+        if incident is not None and incident.status == IncidentStatus.ONGOING:
+            opened.append(incident)
+        else:
+            closed_ids.append(incident_id)
+    DynamoUtils.update_open_incidents(team_id, opened, closed_ids)
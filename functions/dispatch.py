@@ -0,0 +1,136 @@
+"""
+Dispatchers that hand Slack events over to their handlers once the request is acknowledged
+"""
+import os
+import json
+import logging
+import importlib
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# route name to the module and function handling it, the route is also the lambda function suffix
+HANDLERS = {
+    "command": ("functions.commands", "command_handler"),
+    "interactive": ("functions.interaction", "interaction_handler"),
+    "message": ("functions.message", "handle_message"),
+    "mention": ("functions.mention", "handle_mention"),
+    # only sent to the events queue, see utils/deferred_writes.py
+    "deferred_write": ("functions.deferred_writes", "apply_deferred_write"),
+}
+
+
+def get_handler(route):
+    """Imports the handler of the route the first time it is used"""
+    module_name, function_name = HANDLERS[route]
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+class Dispatcher(ABC):
+    """Runs the handler of a route with the event, without waiting for it to finish"""
+
+    @abstractmethod
+    def dispatch(self, route, event: dict):
+        pass
+
+
+class LambdaDispatcher(Dispatcher):
+    """Invokes the lambda function of the route asynchronously"""
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def dispatch(self, route, event: dict):
+        # imported here so the thread mode doesn't load boto3 for nothing
+        from functions.invoke import invoke_lambda
+
+        payload = json.dumps(event).encode("utf-8")
+        invoke_lambda(f"slackbot-{self.stage}-{route}", "Event", payload)
+
+
+class ThreadPoolDispatcher(Dispatcher):
+    """
+    Runs the handlers in a pool of threads of this process, for long running deployments
+    (e.g. self hosted flask). The event is copied so the handler doesn't depend on the request
+    """
+
+    def __init__(self, max_workers):
+        self.__executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="dispatch"
+        )
+
+    def dispatch(self, route, event: dict):
+        handler = get_handler(route)
+        event_copy = json.loads(json.dumps(event))
+        future = self.__executor.submit(handler, event_copy, None)
+        future.add_done_callback(lambda done: self.__log_failure(route, done))
+        return future
+
+    def shutdown(self, wait=True):
+        self.__executor.shutdown(wait=wait)
+
+    @staticmethod
+    def __log_failure(route, future):
+        error = future.exception()
+        if error is not None:
+            logger.error(f"{route} handler failed {error}")
+
+
+class QueueDispatcher(Dispatcher):
+    """
+    Sends the route and the event to the events queue, functions/queue_consumer.py
+    handles them in batches and retries the ones that fail
+    """
+
+    def __init__(self, event_queue):
+        self.event_queue = event_queue
+
+    def dispatch(self, route, event: dict):
+        return self.event_queue.send_message(
+            json.dumps({"route": route, "event": event})
+        )
+
+
+class Dispatch:
+    """
+    Gives access to the configured dispatcher.
+    The DISPATCH_MODE environment variable selects it: lambda (default), thread or queue.
+    The thread pool has DISPATCH_WORKERS threads (8 by default), see EventQueues for the queue
+    """
+
+    LAMBDA = "lambda"
+    THREAD = "thread"
+    QUEUE = "queue"
+
+    __dispatcher: Dispatcher = None
+    __lock = threading.Lock()
+
+    @classmethod
+    def get_dispatcher(cls) -> Dispatcher:
+        if cls.__dispatcher is None:
+            with cls.__lock:
+                if cls.__dispatcher is None:
+                    cls.__dispatcher = cls.__build_dispatcher(
+                        os.environ.get("DISPATCH_MODE", cls.LAMBDA)
+                    )
+        return cls.__dispatcher
+
+    @classmethod
+    def set_dispatcher(cls, dispatcher: Dispatcher):
+        """Replaces the dispatcher, e.g. to run the handlers in tests"""
+        cls.__dispatcher = dispatcher
+
+    @classmethod
+    def __build_dispatcher(cls, mode) -> Dispatcher:
+        if mode == cls.LAMBDA:
+            return LambdaDispatcher(os.environ["STAGE"])
+        if mode == cls.THREAD:
+            return ThreadPoolDispatcher(int(os.environ.get("DISPATCH_WORKERS", "8")))
+        if mode == cls.QUEUE:
+            from utils.event_queue import EventQueues
+
+            return QueueDispatcher(EventQueues.get_queue())
+        raise Exception(f"Unknown dispatch mode {mode}")
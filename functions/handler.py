@@ -2,7 +2,6 @@
 Lambda function to handle slackbot interaction
 """
 
-import re
 import os
 import base64
 import json
@@ -12,13 +11,14 @@ from flask import Flask, redirect, render_template, request
 from domain.integrations.jira import Jira
 from domain.integrations.zoom import Zoom
 from domain.token_data import TokenData
-from utils.aws import AwsUtils
-from utils.dynamo import DynamoUtils
+from utils.storage import Storage
+from utils.idempotency import Idempotency
+from slack_handlers.event_router import EventRouter
 from services.oauth_services.slack_oauth_service import SlackOauthService
 from services.oauth_services.jira_oauth_service import JiraOauthService
 from services.oauth_services.zoom_oauth_service import ZoomOauthService
 
-from functions.invoke import invoke_lambda
+from functions.dispatch import Dispatch
 
 app = Flask(__name__)
 
@@ -26,11 +26,6 @@ SLACK_SIGNING_SECRET = os.environ["SLACK_SIGNING_SECRET"]
 STAGE = os.environ["STAGE"]
 slack_events_adapter = SlackEventAdapter(SLACK_SIGNING_SECRET, "/slack/events", app)
 
-USERS_TABLE = os.environ["USERS_TABLE"]
-dynamoResource = AwsUtils.get_dynamodb_resource()
-
-USER_ID_REGEX = "\<@([^\|]+)>"
-
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
@@ -58,7 +53,7 @@ def jira_oauth():
     try:
         account_id = JiraOauthService.get_jira_id(token_data.access_token)
         jira = Jira(token_data, account_id)
-        DynamoUtils.save_jira_data(team_id, jira)
+        Storage.get_backend().save_jira_data(team_id, jira)
         return redirect(
             f"https://slack.com/app_redirect?app=A01H45TA509&team={team_id}", code=302
         )
@@ -75,7 +70,7 @@ def slack_auth():
     code = request.args.get("code") or "no code!"
     try:
         team_id, access_token = SlackOauthService.get_access_token(code)
-        DynamoUtils.save_slack_access_token(team_id, access_token)
+        Storage.get_backend().save_slack_access_token(team_id, access_token)
         return redirect(
             f"https://slack.com/app_redirect?app=A01H45TA509&team={team_id}", code=302
         )
@@ -92,21 +87,45 @@ def zoom_auth():
     team_id, _user_id = decoded_state.split(":")
     token_data: TokenData = ZoomOauthService.get_token_data(code)
     zoom = Zoom(token_data)
-    DynamoUtils.save_zoom_data(team_id, zoom)
+    Storage.get_backend().save_zoom_data(team_id, zoom)
     return redirect(
         f"https://slack.com/app_redirect?app=A01H45TA509&team={team_id}", code=302
     )
 
 
+def is_slack_retry_duplicate(key) -> bool:
+    """True if the request is a delivery of an event that was already dispatched"""
+    return Idempotency.is_duplicate(key, request.headers.get("X-Slack-Retry-Num"))
+
+
+def dispatch_once(route, event, key):
+    """Dispatches a claimed event, if dispatching fails the claim is released for slack's retry"""
+    try:
+        Dispatch.get_dispatcher().dispatch(route, event)
+    except Exception:
+        Idempotency.release(key)
+        raise
+
+
+@app.after_request
+def stop_slack_retries(response):
+    """The first delivery was acknowledged, tells slack not to send more retries"""
+    if "X-Slack-Retry-Num" in request.headers:
+        response.headers["X-Slack-No-Retry"] = "1"
+    return response
+
+
 @app.route("/slack/command/", methods=["POST"])
 def commands():
     """
     Receives commands from slackbot
     """
-    logger.info("got command, dispatching to lambda...")
     message = request.form
-    payload = json.dumps(message).encode("utf-8")
-    invoke_lambda(f"slackbot-{STAGE}-command", "Event", payload)
+    trigger_key = Idempotency.trigger_key(message.get("trigger_id"))
+    if is_slack_retry_duplicate(trigger_key):
+        return ""
+    logger.info("got command, dispatching...")
+    dispatch_once("command", message, trigger_key)
     return ""
 
 
@@ -115,11 +134,13 @@ def interactive():
     """
     Handles interactive events from Slack elements like buttons
     """
-    logger.info("Interaction received, dispatching to lambda...")
     message = request.form
     json_payload = json.loads(message.get("payload"))
-    payload = json.dumps(json_payload).encode("utf-8")
-    invoke_lambda(f"slackbot-{STAGE}-interactive", "Event", payload)
+    trigger_key = Idempotency.trigger_key(json_payload.get("trigger_id"))
+    if is_slack_retry_duplicate(trigger_key):
+        return ""
+    logger.info("Interaction received, dispatching...")
+    dispatch_once("interactive", json_payload, trigger_key)
     return ""
 
 
@@ -128,9 +149,13 @@ def handle_message(event_data):
     """
     Handles messages from slack
     """
-    logger.info("Message received, dispatching to lambda...")
-    payload = json.dumps(event_data["event"]).encode("utf-8")
-    invoke_lambda(f"slackbot-{STAGE}-message", "Event", payload)
+    if EventRouter.route("message", event_data["event"]) is None:
+        return True
+    event_key = Idempotency.event_key(event_data.get("event_id"))
+    if is_slack_retry_duplicate(event_key):
+        return True
+    logger.info("Message received, dispatching...")
+    dispatch_once("message", event_data["event"], event_key)
     return True
 
 
@@ -139,21 +164,16 @@ def handle_mention(event_data):
     """
     Handles slackbot's mentions
     """
-    logger.info("Mention received, dispatching to lambda...")
-    payload = json.dumps(event_data["event"]).encode("utf-8")
-    invoke_lambda(f"slackbot-{STAGE}-mention", "Event", payload)
+    if EventRouter.route("mention", event_data["event"]) is None:
+        return True
+    event_key = Idempotency.event_key(event_data.get("event_id"))
+    if is_slack_retry_duplicate(event_key):
+        return True
+    logger.info("Mention received, dispatching...")
+    dispatch_once("mention", event_data["event"], event_key)
     return True
 
 
-def sanitise_incident_name(name):
-    """Remove unnecessary characters from incident name"""
-    # remove bot id
-    name = re.sub(USER_ID_REGEX, "", name)
-    # remove command
-    name = name.replace("new incident", "").replace("create incident", "").strip()
-    return name
-
-
 # Error events
 @slack_events_adapter.on("error")
 def error_handler(err):
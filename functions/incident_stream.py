@@ -0,0 +1,15 @@
+"""
+Consumer of the incidents table stream, updates the open incidents of the teams
+"""
+import logging
+from utils.incident_stream import IncidentStreamConsumer
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def incident_stream_handler(event, _context):
+    response = IncidentStreamConsumer.process(event.get("Records", []))
+    if len(response["batchItemFailures"]) > 0:
+        logger.warning(f"incident stream batch failures {response}")
+    return response
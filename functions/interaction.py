@@ -4,9 +4,9 @@ Handle interactions with slack interactive elements
 import json
 import logging
 import requests
-from slack_sdk import WebClient
+from utils.slack_clients import SlackClients
 from slack_handlers.slack_events_handler import SlackEventsHandler
-from utils.dynamo import DynamoUtils
+from utils.storage import Storage
 
 
 logger = logging.getLogger(__name__)
@@ -21,8 +21,8 @@ def interaction_handler(message, _context):
     interaction_type = message.get("type")
     team = message.get("team")
     team_id = team.get("id")
-    slack_access_token = DynamoUtils.get_slack_access_token(team_id)
-    client = WebClient(token=slack_access_token)
+    slack_access_token = Storage.get_backend().get_slack_access_token(team_id)
+    client = SlackClients.get_client(slack_access_token)
     if interaction_type == "view_submission":
         view = message.get("view")
         block_id = view.get("blocks")[0].get("block_id")
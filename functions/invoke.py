@@ -1,7 +1,7 @@
 """
 Util function to invoke a lambda function
 """
-import boto3
+from utils.aws import AwsUtils
 
 
 def invoke_lambda(function_name, invoke_type, payload):
@@ -13,7 +13,7 @@ def invoke_lambda(function_name, invoke_type, payload):
         invoke_type: EVENT if it's an async call - RequestResponse is synced. Waits for response
         payload: event data
     """
-    client = boto3.client("lambda")
+    client = AwsUtils.get_client("lambda")
     client.invoke(
         FunctionName=function_name, InvocationType=invoke_type, Payload=payload
     )
@@ -0,0 +1,153 @@
+"""
+Consumer of the events queue, handles the queued slack events in batches.
+
+As a lambda it's triggered by the SQS queue. Locally it runs as a worker next to the flask server:
+    DISPATCH_MODE=queue python -m functions.queue_consumer [--batch-size N]
+"""
+import json
+import random
+import logging
+import argparse
+from collections import OrderedDict
+from typing import List
+from functions.dispatch import get_handler
+from utils.event_queue import EventQueue, EventQueues, QueueMessage
+from utils.slack_clients import SlackClients
+from utils.storage import Storage
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+BASE_RETRY_DELAY_SECONDS = 5
+MAX_RETRY_DELAY_SECONDS = 300
+# the worker drops a message after this many receives, the SQS queue sends it to its dead letter queue
+MAX_RECEIVES = 5
+VISIBILITY_TIMEOUT_SECONDS = 60
+
+
+def get_team_id(route, event: dict):
+    if route == "command":
+        return event.get("team_id")
+    if route == "interactive":
+        return (event.get("team") or {}).get("id")
+    return event.get("team")
+
+
+def process_messages(messages: List[QueueMessage]) -> List[QueueMessage]:
+    """
+    Handles the events of the messages grouped by team, so each team loads its record and
+    its slack client once for the whole batch. Events of a team are handled in order.
+    Returns the messages that failed
+    """
+    events_by_team = OrderedDict()
+    for message in messages:
+        try:
+            body = json.loads(message.body)
+            route, event = body["route"], body["event"]
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"dropping malformed queue message {message.message_id} {e}")
+            continue
+        events_by_team.setdefault(get_team_id(route, event), []).append(
+            (message, route, event)
+        )
+
+    failed = []
+    for team_id, team_events in events_by_team.items():
+        try:
+            load_team(team_id)
+        except Exception as e:
+            logger.error(f"could not load team {team_id} {e}")
+            failed.extend(message for message, _route, _event in team_events)
+            continue
+        for message, route, event in team_events:
+            try:
+                get_handler(route)(event, None)
+            except Exception as e:
+                logger.error(f"{route} handler failed for team {team_id} {e}")
+                failed.append(message)
+    return failed
+
+
+def load_team(team_id):
+    """Warms the team record and the slack client the handlers of the team use"""
+    if team_id is None:
+        return
+    slack_access_token = Storage.get_backend().get_slack_access_token(team_id)
+    if slack_access_token is not None:
+        SlackClients.get_client(slack_access_token)
+
+
+def retry_delay(receive_count) -> int:
+    """Jittered exponential backoff, in seconds, before a failed message is received again"""
+    delay = min(
+        MAX_RETRY_DELAY_SECONDS, BASE_RETRY_DELAY_SECONDS * 2 ** (receive_count - 1)
+    )
+    return int(random.uniform(delay / 2, delay))
+
+
+def retry_later(event_queue: EventQueue, messages: List[QueueMessage]):
+    for message in messages:
+        try:
+            event_queue.change_message_visibility(
+                message.receipt_handle, retry_delay(message.receive_count)
+            )
+        except Exception as e:
+            # the message comes back once the visibility timeout ends anyway
+            logger.warning(f"could not delay retry of {message.message_id} {e}")
+
+
+def queue_consumer_handler(event, _context):
+    """Lambda handler of the SQS trigger, failed messages are retried with backoff"""
+    messages = [
+        QueueMessage(
+            record["messageId"],
+            record["receiptHandle"],
+            record["body"],
+            int(record.get("attributes", {}).get("ApproximateReceiveCount", "1")),
+        )
+        for record in event.get("Records", [])
+    ]
+    failed = process_messages(messages)
+    if len(failed) > 0:
+        retry_later(EventQueues.get_queue(), failed)
+    return {
+        "batchItemFailures": [
+            {"itemIdentifier": message.message_id} for message in failed
+        ]
+    }
+
+
+def consume_batch(event_queue: EventQueue, batch_size=10, wait_seconds=0) -> int:
+    """Receives and handles one batch, returns the number of received messages"""
+    messages = event_queue.receive_messages(
+        batch_size, VISIBILITY_TIMEOUT_SECONDS, wait_seconds=wait_seconds
+    )
+    failed = process_messages(messages)
+    failed_ids = {message.message_id for message in failed}
+    retried = []
+    for message in messages:
+        if message.message_id not in failed_ids:
+            event_queue.delete_message(message.receipt_handle)
+        elif message.receive_count >= MAX_RECEIVES:
+            logger.error(f"dropping {message.message_id} after {MAX_RECEIVES} receives")
+            event_queue.delete_message(message.receipt_handle)
+        else:
+            retried.append(message)
+    retry_later(event_queue, retried)
+    return len(messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Handles the queued slack events")
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--wait-seconds", type=int, default=5)
+    args = parser.parse_args()
+    event_queue = EventQueues.get_queue()
+    logger.info("queue consumer started")
+    while True:
+        consume_batch(event_queue, args.batch_size, args.wait_seconds)
+
+
+if __name__ == "__main__":
+    logging.basicConfig()
+    main()
@@ -0,0 +1,14 @@
+"""
+Scheduled job that refreshes the oauth tokens about to expire
+"""
+import logging
+from services.token_pre_refresh_service import TokenPreRefreshService
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def refresh_tokens_handler(_event, _context):
+    result = TokenPreRefreshService.refresh_expiring_tokens()
+    logger.info(f"token pre refresh finished {result}")
+    return result
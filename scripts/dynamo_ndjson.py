@@ -0,0 +1,68 @@
+"""
+Exports a DynamoDB table to NDJSON and imports it back, one item per line.
+Items are written in DynamoDB JSON ({"Item": {"teamId": {"S": "T1"}, ...}}), the same format as
+the table exports to S3, so numbers and sets (responders) keep their types.
+Export uses a parallel scan and import uses batch writes with retries. Imported items get
+imported_at (DynamoBulk.IMPORTED_AT) so the incidents stream consumer doesn't handle them as new incidents.
+
+Usage (from the root directory):
+    python -m scripts.dynamo_ndjson export <table> [--segments N] > items.ndjson
+    python -m scripts.dynamo_ndjson import <table> < items.ndjson
+
+Set IS_OFFLINE=true to use the local dynamodb
+"""
+import argparse
+import json
+import sys
+import time
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from utils.dynamo_bulk import DynamoBulk
+
+serializer = TypeSerializer()
+deserializer = TypeDeserializer()
+
+
+def export_table(table_name, output, total_segments=None) -> int:
+    exported = 0
+    for item in DynamoBulk.parallel_scan(table_name, total_segments=total_segments):
+        typed_item = {key: serializer.serialize(value) for key, value in item.items()}
+        output.write(json.dumps({"Item": typed_item}) + "\n")
+        exported += 1
+    return exported
+
+
+def import_table(table_name, lines) -> int:
+    imported_at = int(time.time())
+    return DynamoBulk.batch_write(
+        table_name,
+        put_items=(
+            {**item, DynamoBulk.IMPORTED_AT: imported_at} for item in read_items(lines)
+        ),
+    )
+
+
+def read_items(lines):
+    for line in lines:
+        if not line.strip():
+            continue
+        typed_item = json.loads(line)["Item"]
+        yield {
+            key: deserializer.deserialize(value) for key, value in typed_item.items()
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NDJSON import/export of a table")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("table")
+    parser.add_argument("--segments", type=int, default=None)
+    args = parser.parse_args()
+    if args.command == "export":
+        count = export_table(args.table, sys.stdout, args.segments)
+    else:
+        count = import_table(args.table, sys.stdin)
+    print(f"{args.command}ed {count} items", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
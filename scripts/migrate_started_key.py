@@ -0,0 +1,69 @@
+"""
+Online migration that adds startedKey, the sort key of the started index, to the incidents
+created before the index existed. It also sets teamStatus on incidents older than the status index.
+The table is scanned in parallel segments while the bot keeps running, each page is saved to the
+checkpoint file once updated, so running it again after an interruption continues where it stopped.
+
+Usage (from the root directory):
+    python -m scripts.migrate_started_key [--segments N] [--checkpoint FILE]
+
+Run it once teamId-startedKey-index is ACTIVE (see custom.database.incidentsIndexes in serverless.yml).
+Once it finishes, set INCIDENTS_STARTED_INDEX_READY=true so time windows are read from the started index
+"""
+import argparse
+import sys
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+from domain.incident import IncidentStatus
+from utils.dynamo import DynamoUtils
+from utils.dynamo_bulk import DynamoBulk, ScanCheckpoint
+
+
+def migrate_items(items):
+    for item in items:
+        try:
+            DynamoUtils.get_incidents_table().update_item(
+                Key={"teamId": item["teamId"], "incidentId": item["incidentId"]},
+                UpdateExpression="SET startedKey=:started_key, "
+                "teamStatus=if_not_exists(teamStatus, :team_status)",
+                # the incident may have been archived since it was scanned
+                ConditionExpression="attribute_exists(incidentId)",
+                ExpressionAttributeValues={
+                    ":started_key": DynamoUtils.build_started_key(
+                        item["started_datetime"], item["incidentId"]
+                    ),
+                    ":team_status": DynamoUtils.build_team_status(
+                        item["teamId"], IncidentStatus[item["status"]]
+                    ),
+                },
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+
+
+def migrate(total_segments=None, checkpoint_path="migrate_started_key.json") -> int:
+    return DynamoBulk.parallel_process(
+        DynamoUtils.INCIDENTS_TABLE,
+        migrate_items,
+        total_segments=total_segments,
+        checkpoint=ScanCheckpoint(checkpoint_path),
+        FilterExpression=Attr("startedKey").not_exists()
+        & Attr("started_datetime").exists()
+        & Attr("status").exists(),
+        ProjectionExpression="teamId, incidentId, started_datetime, #st",
+        ExpressionAttributeNames={"#st": "status"},
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Adds startedKey to old incidents")
+    parser.add_argument("--segments", type=int, default=None)
+    parser.add_argument("--checkpoint", default="migrate_started_key.json")
+    args = parser.parse_args()
+    migrated = migrate(args.segments, args.checkpoint)
+    print(f"migrated {migrated} incidents", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,16 @@
 """Service to deal with incidents"""
-from typing import List, cast
+from typing import List, Optional, cast
 import logging
 from domain.incident import Incident, IncidentStatus
 from domain.integrations.integration import Integration
 from services.ticket_service import TicketService
 from services.call_service import CallService
 from services.integrated_service import IntegratedService
+from services.user_service import UserService
 from utils.integration_enum import IntegrationType
-from utils.dynamo import DynamoUtils
+from utils.storage import Storage
+from utils.storage_backend import StorageUnavailableError
+from utils.date_time_utils import DateTimeUtils
 
 
 logger = logging.getLogger(__name__)
@@ -16,12 +19,27 @@ logger.setLevel(logging.INFO)
 
 class IncidentService:
     """
-    Class that handles incident actions
+    Class that handles incident actions.
+    Without integrated_services, each integration is looked up the first time it is used,
+    so actions that don't use a ticket or a call don't read any integration data
     """
 
-    def __init__(self, team_id, integrated_services: List[IntegratedService]):
+    def __init__(self, team_id, integrated_services: List[IntegratedService] = None):
         self.team_id = team_id
-        self.__set_integrated_services(integrated_services)
+        # integration type -> service, None if the team has no integration of that type
+        self.__integrated_services = {}
+        if integrated_services is not None:
+            self.__set_integrated_services(integrated_services)
+
+    @property
+    def ticket_service(self) -> Optional[TicketService]:
+        ticket_service = self.__get_integrated_service(IntegrationType.TICKET)
+        return cast(TicketService, ticket_service)
+
+    @property
+    def call_service(self) -> Optional[CallService]:
+        call_service = self.__get_integrated_service(IntegrationType.CALL)
+        return cast(CallService, call_service)
 
     def create_incident(self, incident_id, incident_name) -> Incident:
         """
@@ -42,30 +60,44 @@ class IncidentService:
         if call is not None:
             incident.set_call(call)
 
-        # Save incident
-        DynamoUtils.create_incident(incident)
+        # Save incident. Throttled calls are retried within the budget, after that the error
+        # is raised so the creation fails visibly instead of leaving a channel without incident
+        try:
+            Storage.get_backend().create_incident(incident)
+        except StorageUnavailableError as e:
+            logger.error(f"incident not saved {self.team_id} {incident_id} {e}")
+            raise
         return incident
 
     def get_call(self, incident_id) -> str:
         """Returns the call link for the given incident"""
-        incident: Incident = DynamoUtils.get_incident(self.team_id, incident_id)
+        incident: Incident = Storage.get_backend().get_incident(
+            self.team_id, incident_id
+        )
         if incident is not None and incident.has_call():
             return incident.call.get_link()
         return ""
 
     def get_ongoing_incidents(self) -> List[Incident]:
         """Returns all the incidents that are ongoing"""
-        return DynamoUtils.get_ongoing_incidents(self.team_id)
+        return Storage.get_backend().get_ongoing_incidents(self.team_id)
 
     def get_today_incidents(self) -> List[Incident]:
         """Returns all incidents from today that are ongoing"""
-        return DynamoUtils.get_today_incidents(self.team_id)
+        return Storage.get_backend().get_today_incidents(self.team_id)
+
+    def get_next_incident_number(self) -> int:
+        """Returns the next number for today's incidents. Each call gets a different number"""
+        today = DateTimeUtils.current_date().isoformat()
+        return Storage.get_backend().next_incident_sequence(self.team_id, today)
 
     # TODO - should also receive some text with the incident resolution and save in the DB
     def close_incident(self, incident_id):
         """Closes incident"""
         incident = Incident(self.team_id, incident_id)
-        return DynamoUtils.update_incident_status(incident, IncidentStatus.CLOSED)
+        return Storage.get_backend().update_incident_status(
+            incident, IncidentStatus.CLOSED
+        )
 
     def log_comment(self, incident_id: str, text: str) -> dict:
         """
@@ -73,7 +105,9 @@ class IncidentService:
         """
         try:
 
-            incident: Incident = DynamoUtils.get_incident(self.team_id, incident_id)
+            incident: Incident = Storage.get_backend().get_incident(
+                self.team_id, incident_id
+            )
             if incident is None:
                 return {
                     "status": "failure",
@@ -104,11 +138,12 @@ class IncidentService:
 
     def create_ticket(self) -> Integration:
         """Creates a ticket for the incident"""
-        if not hasattr(self, "ticket_service"):
+        ticket_service = self.ticket_service
+        if ticket_service is None:
             logger.error(f"no ticket integration for team {self.team_id}")
             return None
         logger.info("Creating ticket...")
-        ticket: Integration = self.ticket_service.create_ticket()
+        ticket: Integration = ticket_service.create_ticket()
         if ticket is not None:
             logger.info("Ticket created")
             return ticket
@@ -118,11 +153,12 @@ class IncidentService:
 
     def create_call(self) -> Integration:
         """Creates a call for the incident"""
-        if not hasattr(self, "call_service"):
+        call_service = self.call_service
+        if call_service is None:
             logger.error(f"no call integration for team {self.team_id}")
             return None
         logger.info(f"Creating call... {self.team_id}")
-        call: Integration = self.call_service.create_call()
+        call: Integration = call_service.create_call()
         if call is not None:
             logger.info(f"call created {self.team_id}")
             return call
@@ -130,12 +166,20 @@ class IncidentService:
             logger.error(f"call could not be created {self.team_id}")
             return None
 
+    def __get_integrated_service(
+        self, integration_type: IntegrationType
+    ) -> Optional[IntegratedService]:
+        """Returns the integrated service of the type, looking it up the first time"""
+        if integration_type not in self.__integrated_services:
+            self.__integrated_services[
+                integration_type
+            ] = UserService.get_integrated_service(self.team_id, integration_type)
+        return self.__integrated_services[integration_type]
+
     def __set_integrated_services(self, integrated_services: List[IntegratedService]):
-        """Sets in instance variables the integrated services being used"""
-        for integrated_service in integrated_services:
-            if integrated_service.get_type() == IntegrationType.CALL:
-                self.call_service: CallService = cast(CallService, integrated_service)
-            if integrated_service.get_type() == IntegrationType.TICKET:
-                self.ticket_service: TicketService = cast(
-                    TicketService, integrated_service
-                )
+        """Sets the integrated services being used, the team has no other integrations"""
+        self.__integrated_services = {
+            integration_type: None for integration_type in IntegrationType
+        }
+        for service in integrated_services:
+            self.__integrated_services[service.get_type()] = service
@@ -3,9 +3,10 @@ import json
 import logging
 from datetime import date
 import requests
-from utils.dynamo import DynamoUtils
+from utils.storage import Storage
 from domain.integrations.jira import Jira
 from services.oauth_services.jira_oauth_service import JiraOauthService
+from services.oauth_services.token_refresh_coordinator import TokenRefreshCoordinator
 from services.ticket_service import TicketService
 
 
@@ -23,7 +24,7 @@ class JiraApiService(TicketService):
 
     def __init__(self, team_id) -> None:
         self.team_id = team_id
-        self.jira: Jira = DynamoUtils.get_jira_data(team_id)
+        self.jira: Jira = Storage.get_backend().get_jira_data(team_id)
         if self.jira is None or not self.jira.is_valid():
             raise Exception("No ticket integration for team")
         self.BASE_URL = self.BASE_URL % self.jira.account_id
@@ -90,19 +91,16 @@ class JiraApiService(TicketService):
 
     def __get_access_token(self) -> str:
         """
-        Gets access token from self.token_data.access_token if not expired.
-        If access_token is expired, refreshes and saves the new token data
+        Gets access token from self.jira.token_data if not expired.
+        If it expired, the coordinator refreshes it once for all the callers and saves it
         """
-        if (
-            self.jira.token_data.expiry_date is not None
-            and self.jira.token_data.is_access_token_expired() is False
-        ):
-            return self.jira.token_data.access_token
-        else:
-            logger.info(f"Token expired, refreshing... {self.team_id}")
-            self.jira.token_data = JiraOauthService.refresh_access_token(
-                self.jira.token_data
-            )
-            DynamoUtils.save_jira_data(self.team_id, self.jira)
-            logger.info(f"Token refreshed and saved {self.team_id}")
-            return self.jira.token_data.access_token
+        return TokenRefreshCoordinator.get_access_token(
+            self.team_id,
+            "jira",
+            self.jira,
+            lambda: Storage.get_backend().get_jira_data(
+                self.team_id, consistent_read=True
+            ),
+            JiraOauthService.refresh_access_token,
+            lambda jira: Storage.get_backend().save_jira_data(self.team_id, jira),
+        )
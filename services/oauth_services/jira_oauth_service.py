@@ -61,7 +61,7 @@ class JiraOauthService:
         access_token = json_response.get("access_token")
         refresh_token = json_response.get("refresh_token")
         expires_in = json_response.get("expires_in")
-        expiry_date = DateTimeUtils.calculate_expiration_date_from_seconds(expires_in)
+        expiry_date = DateTimeUtils.calculate_expiration_epoch_from_seconds(expires_in)
         token_data = TokenData(access_token, refresh_token, expiry_date)
         return token_data
 
@@ -87,7 +87,7 @@ class JiraOauthService:
             token_data.refresh_token
         )  # jira doesn't return a new refresh token, need to keep the current one
         expires_in = json_response.get("expires_in")
-        expiry_date = DateTimeUtils.calculate_expiration_date_from_seconds(expires_in)
+        expiry_date = DateTimeUtils.calculate_expiration_epoch_from_seconds(expires_in)
         oauth_token_response = TokenData(access_token, refresh_token, expiry_date)
         token_data = TokenData(
             oauth_token_response.access_token, refresh_token, expiry_date
@@ -0,0 +1,112 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from typing import Callable
+from domain.integrations.integration import Integration
+from domain.token_data import TokenData
+from utils.storage import Storage
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class TokenRefreshCoordinator:
+    """
+    Makes sure only one caller refreshes the oauth token of a team app at a time.
+    Inside the process, callers wait on a lock per team and app. Across processes (lambdas),
+    the one that refreshes holds a lease written to the team record with a conditional write.
+    The others wait and read the token saved by the winner, so a rotated refresh token
+    (zoom rotates them) is never overwritten with a stale one
+    """
+
+    LEASE_SECONDS = float(os.environ.get("TOKEN_REFRESH_LEASE_SECONDS", "30"))
+    WAIT_SECONDS = float(os.environ.get("TOKEN_REFRESH_WAIT_SECONDS", "5"))
+    POLL_INTERVAL_SECONDS = 0.25
+
+    __locks = {}
+    __locks_lock = threading.Lock()
+
+    @classmethod
+    def get_access_token(
+        cls,
+        team_id,
+        app_name,
+        integration: Integration,
+        load: Callable[[], Integration],
+        refresh: Callable[[TokenData], TokenData],
+        save: Callable[[Integration], None],
+        min_validity_seconds=0,
+    ) -> str:
+        """
+        Returns the access token of the integration, refreshing it first if it expired
+        or expires in less than min_validity_seconds.
+        load reads the integration skipping caches, refresh calls the oauth server and save persists the new token data.
+        The integration is updated in place with the token data in use
+        """
+        if cls.is_usable(integration.token_data, min_validity_seconds):
+            return integration.token_data.access_token
+        with cls.__get_lock(team_id, app_name):
+            # another thread or lambda may have refreshed while this one was waiting
+            latest = load()
+            if latest is not None and cls.is_usable(
+                latest.token_data, min_validity_seconds
+            ):
+                integration.token_data = latest.token_data
+                return integration.token_data.access_token
+            if latest is not None:
+                integration.token_data = latest.token_data
+            deadline = time.monotonic() + cls.WAIT_SECONDS
+            while True:
+                owner = str(uuid.uuid4())
+                if Storage.get_backend().acquire_refresh_lease(
+                    team_id, app_name, owner, cls.LEASE_SECONDS, time.time()
+                ):
+                    try:
+                        # the previous lease holder may have refreshed since the last load,
+                        # its refresh token is the only valid one once it is rotated
+                        latest = load()
+                        if latest is not None:
+                            integration.token_data = latest.token_data
+                            if cls.is_usable(latest.token_data, min_validity_seconds):
+                                return integration.token_data.access_token
+                        return cls.__refresh(team_id, integration, refresh, save)
+                    finally:
+                        Storage.get_backend().release_refresh_lease(
+                            team_id, app_name, owner
+                        )
+                if time.monotonic() >= deadline:
+                    raise Exception(
+                        f"{app_name} token is being refreshed by another caller {team_id}"
+                    )
+                time.sleep(cls.POLL_INTERVAL_SECONDS)
+                latest = load()
+                if latest is not None:
+                    integration.token_data = latest.token_data
+                    if cls.is_usable(latest.token_data, min_validity_seconds):
+                        return integration.token_data.access_token
+
+    @staticmethod
+    def is_usable(token_data: TokenData, min_validity_seconds=0) -> bool:
+        return token_data.expiry_date is not None and not token_data.expires_within(
+            min_validity_seconds
+        )
+
+    @classmethod
+    def __refresh(cls, team_id, integration: Integration, refresh, save) -> str:
+        if integration.token_data.refresh_token is None:
+            raise Exception(f"No refresh token for team {team_id}")
+        logger.info(f"Token expired, refreshing... {team_id}")
+        token_data = refresh(integration.token_data)
+        if token_data is None:
+            raise Exception(f"Token could not be refreshed {team_id}")
+        integration.token_data = token_data
+        save(integration)
+        logger.info(f"Token refreshed and saved {team_id}")
+        return integration.token_data.access_token
+
+    @classmethod
+    def __get_lock(cls, team_id, app_name) -> threading.Lock:
+        with cls.__locks_lock:
+            return cls.__locks.setdefault((team_id, app_name), threading.Lock())
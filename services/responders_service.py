@@ -2,7 +2,7 @@
 Service that will deal with responders
 """
 from typing import List
-from utils.dynamo import DynamoUtils
+from utils.storage import Storage
 from domain.responders_list import RespondersList
 from domain.slack_responder import SlackResponder
 
@@ -17,7 +17,7 @@ class RespondersService:
 
     def get_oncall(self, team_id):
         """Gets current oncall"""
-        return DynamoUtils.get_oncall(team_id)
+        return Storage.get_backend().get_oncall(team_id)
 
     def get_responders(self):
         """Returns the list of responders that have been set"""
@@ -31,7 +31,7 @@ class RespondersService:
         An oncall is treated a responder
         """
         responders: List[SlackResponder] = RespondersList.list(self.team_id)
-        oncall = DynamoUtils.get_oncall(self.team_id)
+        oncall = Storage.get_backend().get_oncall(self.team_id)
         oncall_responder: SlackResponder = SlackResponder(oncall)
 
         if oncall_responder.id is not None and not any(
@@ -42,7 +42,7 @@ class RespondersService:
 
     def set_oncall(self, user_id):
         """Sets the oncall in the database"""
-        return DynamoUtils.save_oncall(self.team_id, user_id)
+        return Storage.get_backend().save_oncall(self.team_id, user_id)
 
     def set_responders(self, responders_list: List[str]):
         """Sets a list of responders in the database"""
@@ -0,0 +1,95 @@
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from domain.integrations.integration import Integration
+from services.oauth_services.jira_oauth_service import JiraOauthService
+from services.oauth_services.zoom_oauth_service import ZoomOauthService
+from services.oauth_services.token_refresh_coordinator import TokenRefreshCoordinator
+from utils.storage import Storage
+from utils.storage_backend import StorageBackend
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class TokenPreRefreshService:
+    """
+    Refreshes the jira and zoom tokens of all the teams before they expire, so requests
+    don't have to refresh them while creating tickets or calls.
+    Refreshes go through TokenRefreshCoordinator, a request refreshing the same token at
+    the same time is not a problem
+    """
+
+    WINDOW_SECONDS = int(os.environ.get("TOKEN_PRE_REFRESH_WINDOW_SECONDS", "900"))
+    MAX_WORKERS = int(os.environ.get("TOKEN_PRE_REFRESH_CONCURRENCY", "8"))
+
+    @classmethod
+    def refresh_expiring_tokens(cls, window_seconds=None, max_workers=None) -> dict:
+        """
+        Refreshes the tokens expiring in the next window_seconds, max_workers at a time.
+        Returns how many tokens were expiring, refreshed and failed
+        """
+        window_seconds = window_seconds or cls.WINDOW_SECONDS
+        expiring = list(cls.__find_expiring_tokens(window_seconds))
+        with ThreadPoolExecutor(max_workers=max_workers or cls.MAX_WORKERS) as executor:
+            results = list(
+                executor.map(
+                    lambda token: cls.__refresh(*token, window_seconds), expiring
+                )
+            )
+        refreshed = results.count(True)
+        return {
+            "expiring": len(expiring),
+            "refreshed": refreshed,
+            "failed": len(results) - refreshed,
+        }
+
+    @classmethod
+    def __find_expiring_tokens(cls, window_seconds):
+        """Yields (team_id, app_name, integration) for each valid token expiring within the window"""
+        known_apps = cls.__apps()
+        for team_id, apps in Storage.get_backend().iter_authorized_apps():
+            for app_name, app_data in apps.items():
+                if app_name not in known_apps:
+                    continue
+                integration: Integration = known_apps[app_name]["build"](app_data)
+                if integration.is_valid() and integration.token_data.expires_within(
+                    window_seconds
+                ):
+                    yield team_id, app_name, integration
+
+    @classmethod
+    def __refresh(cls, team_id, app_name, integration: Integration, window_seconds):
+        app = cls.__apps()[app_name]
+        try:
+            TokenRefreshCoordinator.get_access_token(
+                team_id,
+                app_name,
+                integration,
+                lambda: app["load"](team_id, consistent_read=True),
+                app["refresh"],
+                lambda refreshed: app["save"](team_id, refreshed),
+                min_validity_seconds=window_seconds,
+            )
+            return True
+        except Exception as e:
+            logger.error(f"{app_name} token could not be refreshed {team_id} {e}")
+            return False
+
+    @staticmethod
+    def __apps() -> dict:
+        backend = Storage.get_backend()
+        return {
+            "jira": {
+                "build": StorageBackend.build_jira,
+                "load": backend.get_jira_data,
+                "refresh": JiraOauthService.refresh_access_token,
+                "save": backend.save_jira_data,
+            },
+            "zoom": {
+                "build": StorageBackend.build_zoom,
+                "load": backend.get_zoom_data,
+                "refresh": ZoomOauthService.refresh_access_token,
+                "save": backend.save_zoom_data,
+            },
+        }
@@ -1,26 +1,47 @@
 """
 Actions related to Users
 """
-from typing import List
+from typing import List, Optional
 from services.integrated_service import IntegratedService
 from services.jira_api_service import JiraApiService
 from services.zoom_api_service import ZoomApiService
-from utils.dynamo import DynamoUtils
+from utils.integration_enum import IntegrationType
+from utils.storage import Storage
 
 
 class UserService:
     """
     Service to deal with users
     """
+
+    # authorized app -> integration type and the service for it
+    INTEGRATED_SERVICES = {
+        "jira": (IntegrationType.TICKET, JiraApiService),
+        "zoom": (IntegrationType.CALL, ZoomApiService),
+    }
+
     @staticmethod
     def get_integrated_services(user_id) -> List[IntegratedService]:
         """
         Get services the user has integrated with
         """
         integrated_services: List[IntegratedService] = []
-        apps = DynamoUtils.get_authorized_apps(user_id)
-        if "jira" in apps:
-            integrated_services.append(JiraApiService(user_id))
-        if "zoom" in apps:
-            integrated_services.append(ZoomApiService(user_id))
+        apps = Storage.get_backend().get_authorized_apps(user_id)
+        for app, (_, service) in UserService.INTEGRATED_SERVICES.items():
+            if app in apps:
+                integrated_services.append(service(user_id))
         return integrated_services
+
+    @staticmethod
+    def get_integrated_service(
+        user_id, integration_type: IntegrationType
+    ) -> Optional[IntegratedService]:
+        """
+        Get the service of the given type the user has integrated with, None if there is none.
+        Only that service is built, services of other types don't read their data
+        """
+        apps = Storage.get_backend().get_authorized_apps(user_id)
+        for app, (app_type, service) in UserService.INTEGRATED_SERVICES.items():
+            if app_type == integration_type and app in apps:
+                return service(user_id)
+        return None
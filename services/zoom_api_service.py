@@ -6,8 +6,9 @@ import logging
 import requests
 from domain.integrations.zoom import Zoom
 from domain.integrations.integration import Integration
-from utils.dynamo import DynamoUtils
+from utils.storage import Storage
 from services.oauth_services.zoom_oauth_service import ZoomOauthService
+from services.oauth_services.token_refresh_coordinator import TokenRefreshCoordinator
 from services.call_service import CallService
 
 
@@ -25,8 +26,8 @@ class ZoomApiService(CallService):
 
     def __init__(self, team_id):
         self.team_id = team_id
-        self.zoom: Zoom = DynamoUtils.get_zoom_data(team_id)
-        if not self.zoom.is_valid():
+        self.zoom: Zoom = Storage.get_backend().get_zoom_data(team_id)
+        if self.zoom is None or not self.zoom.is_valid():
             raise Exception("No call integration for team")
 
     def __create_request_header(self):
@@ -69,22 +70,16 @@ class ZoomApiService(CallService):
 
     def __get_access_token(self) -> str:
         """
-        Gets access token from self.token_data.access_token if not expired.
-        If access_token is expired, refreshes and saves the new token data
+        Gets access token from self.zoom.token_data if not expired.
+        If it expired, the coordinator refreshes it once for all the callers and saves it
         """
-        if (
-            self.zoom.token_data.expiry_date is not None
-            and self.zoom.token_data.is_access_token_expired() is False
-        ):
-            return self.zoom.token_data.access_token
-        else:
-            if self.zoom.token_data.refresh_token is not None:
-                logger.info("Token expired, refreshing...")
-                self.zoom.token_data = ZoomOauthService.refresh_access_token(
-                    self.zoom.token_data
-                )
-                DynamoUtils.save_zoom_data(self.team_id, self.zoom)
-                logger.info("Token refreshed and saved")
-                return self.zoom.token_data.access_token
-            else:
-                raise Exception()
+        return TokenRefreshCoordinator.get_access_token(
+            self.team_id,
+            "zoom",
+            self.zoom,
+            lambda: Storage.get_backend().get_zoom_data(
+                self.team_id, consistent_read=True
+            ),
+            ZoomOauthService.refresh_access_token,
+            lambda zoom: Storage.get_backend().save_zoom_data(self.team_id, zoom),
+        )
@@ -0,0 +1,72 @@
+import re
+from typing import List, Optional
+
+
+class ParsedCommand:
+    """A /sereno command: its name in the command table, its other words and its mentions"""
+
+    def __init__(
+        self,
+        name: Optional[str],
+        arguments: List[str],
+        user_ids: List[str],
+        channel_ids: List[str],
+    ):
+        self.name = name
+        self.arguments = arguments
+        self.user_ids = user_ids
+        self.channel_ids = channel_ids
+
+    def get_mentions(self) -> List[str]:
+        """Mentioned users followed by mentioned channels"""
+        return self.user_ids + self.channel_ids
+
+
+class CommandParser:
+    """
+    Parses the text of /sereno commands. The text is split in tokens once, mentions are
+    taken out and the leading keywords are looked up in COMMANDS, the longest match wins.
+    Mentions come as <@U123|name> or <@U123> (<#C123|name> for channels)
+    """
+
+    TOKEN_PATTERN = re.compile(r"<[^>]*>|[^\s<]+")
+    USER_MENTION_PATTERN = re.compile(r"<@([^|>]+)")
+    CHANNEL_MENTION_PATTERN = re.compile(r"<#([^|>]+)")
+
+    # leading keywords -> command name
+    COMMANDS = {
+        ("register",): "register",
+        ("responders",): "responders",
+        ("responders", "add"): "responders_add",
+        ("responders", "remove"): "responders_remove",
+        ("responders", "list"): "responders_list",
+        ("oncall",): "oncall",
+        ("set", "oncall"): "set_oncall",
+        ("oncall", "set"): "set_oncall",
+        ("help",): "help",
+        ("close", "incident"): "close_incident",
+    }
+    MAX_KEYWORDS = max(len(keywords) for keywords in COMMANDS)
+
+    @classmethod
+    def parse(cls, text: str) -> ParsedCommand:
+        words = []
+        user_ids = []
+        channel_ids = []
+        for token in cls.TOKEN_PATTERN.findall(text or ""):
+            if token.startswith("<"):
+                user = cls.USER_MENTION_PATTERN.match(token)
+                if user is not None:
+                    user_ids.append(user.group(1))
+                    continue
+                channel = cls.CHANNEL_MENTION_PATTERN.match(token)
+                if channel is not None:
+                    channel_ids.append(channel.group(1))
+                    continue
+            words.append(token.lower())
+
+        for length in range(min(cls.MAX_KEYWORDS, len(words)), 0, -1):
+            name = cls.COMMANDS.get(tuple(words[:length]))
+            if name is not None:
+                return ParsedCommand(name, words[length:], user_ids, channel_ids)
+        return ParsedCommand(None, words, user_ids, channel_ids)
@@ -0,0 +1,53 @@
+import logging
+import threading
+from typing import Optional
+from slack_handlers.intent_matcher import MENTION_INTENTS, MESSAGE_INTENTS
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class EventRouter:
+    """
+    Decides at the front door whether a message or mention event would do anything once dispatched.
+    It uses the intent matchers of functions/message.py and functions/mention.py, so an event
+    is dispatched only if its handler would find an intent in it.
+    Events with a subtype (edits, joins, bot messages...) are never handled.
+    Dropped events are counted per event type
+    """
+
+    MATCHERS = {
+        "message": MESSAGE_INTENTS,
+        "mention": MENTION_INTENTS,
+    }
+
+    __dropped = {}
+    __lock = threading.Lock()
+
+    @classmethod
+    def route(cls, event_type, event: dict) -> Optional[str]:
+        """
+        Returns the intent of the event, None if no handler would react to it.
+        Event types without a matcher are always dispatched
+        """
+        matcher = cls.MATCHERS.get(event_type)
+        if matcher is None:
+            return event_type
+        if event.get("subtype") is not None:
+            return cls.__drop(event_type)
+        intent = matcher.match(event.get("text"))
+        if intent is None:
+            return cls.__drop(event_type)
+        return intent.name
+
+    @classmethod
+    def get_dropped_counts(cls) -> dict:
+        """Number of dropped events per event type since the process started"""
+        with cls.__lock:
+            return dict(cls.__dropped)
+
+    @classmethod
+    def __drop(cls, event_type):
+        with cls.__lock:
+            cls.__dropped[event_type] = cls.__dropped.get(event_type, 0) + 1
+        return None
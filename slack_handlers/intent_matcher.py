@@ -0,0 +1,179 @@
+import re
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union
+
+USER_MENTION_PATTERN = re.compile(r"<@[^|>]+(?:\|[^>]*)?>")
+NEW_INCIDENT_PHRASES_PATTERN = re.compile(r"new incident|create incident")
+
+
+class Intent:
+    """What a message asks for and the arguments taken from its text"""
+
+    def __init__(self, name, arguments: Dict[str, str]):
+        self.name = name
+        self.arguments = arguments
+
+
+class IntentRule:
+    """
+    An intent and the phrases that select it. Every requirement has to be in the text, a requirement
+    is a phrase or a tuple of alternative phrases. Phrases are literal, at_start only looks at the
+    beginning of the text. extract_arguments builds the arguments of the intent from the text
+    """
+
+    def __init__(
+        self,
+        name,
+        requirements: List[Union[str, Tuple[str, ...]]],
+        extract_arguments: Callable[[str], Dict[str, str]] = None,
+        ignore_case=False,
+        at_start=False,
+    ):
+        self.name = name
+        self.requirements = [
+            (requirement,) if isinstance(requirement, str) else requirement
+            for requirement in requirements
+        ]
+        self.extract_arguments = extract_arguments
+        self.ignore_case = ignore_case
+        self.at_start = at_start
+
+
+class IntentMatcher:
+    """
+    Classifies a text with a table of rules, the first rule in the given order with all its
+    requirements in the text is the intent.
+    The phrases of all the rules are compiled into one regex, longest first, and the text is
+    scanned once to collect the phrases it has. Each search starts one character after the
+    previous match, so overlapping phrases are found, and a match also counts the phrases
+    inside it (e.g. "incident" inside "new incident"). The regex has no groups, they keep the
+    regex engine from skipping ahead to the first characters of the phrases; the phrases
+    of a match are looked up by the matched text instead
+    """
+
+    def __init__(self, rules: List[IntentRule]):
+        self.rules = rules
+        # a phrase with the flags of its rule
+        tokens = sorted(
+            {
+                (phrase, rule.ignore_case, rule.at_start)
+                for rule in rules
+                for alternatives in rule.requirements
+                for phrase in alternatives
+            },
+            key=lambda token: (-len(token[0]), token),
+        )
+        token_ids = {token: token_id for token_id, token in enumerate(tokens)}
+        self.__tokens = tokens
+        self.__pattern = re.compile(
+            "|".join(self.__token_pattern(token) for token in tokens)
+        )
+        self.__requirements = [
+            [
+                {
+                    token_ids[(phrase, rule.ignore_case, rule.at_start)]
+                    for phrase in alternatives
+                }
+                for alternatives in rule.requirements
+            ]
+            for rule in rules
+        ]
+        # tokens that may be in a match, by the lowercase matched text. They are checked on
+        # the match, the case or the position of the text can rule some of them out
+        self.__candidates = {
+            phrase.lower(): [
+                candidate_id
+                for candidate_id, candidate in enumerate(tokens)
+                if candidate[0].lower() in phrase.lower()
+            ]
+            for phrase, _ignore_case, _at_start in tokens
+        }
+
+    def match(self, text: str) -> Optional[Intent]:
+        if not isinstance(text, str):
+            return None
+        found = self.__find_tokens(text)
+        if len(found) == 0:
+            return None
+        for rule, requirements in zip(self.rules, self.__requirements):
+            for alternatives in requirements:
+                if alternatives.isdisjoint(found):
+                    break
+            else:
+                arguments = (
+                    rule.extract_arguments(text) if rule.extract_arguments else {}
+                )
+                return Intent(rule.name, arguments)
+        return None
+
+    def __find_tokens(self, text: str) -> Set[int]:
+        found = set()
+        match = self.__pattern.search(text)
+        while match is not None:
+            for candidate_id in self.__candidates[match.group().lower()]:
+                if self.__is_inside(self.__tokens[candidate_id], match):
+                    found.add(candidate_id)
+            match = self.__pattern.search(text, match.start() + 1)
+        return found
+
+    @staticmethod
+    def __token_pattern(token) -> str:
+        phrase, ignore_case, at_start = token
+        pattern = re.escape(phrase)
+        if ignore_case:
+            pattern = f"(?i:{pattern})"
+        if at_start:
+            # \A only matches at the beginning of the text, wherever the search starts
+            pattern = rf"\A{pattern}"
+        return pattern
+
+    @staticmethod
+    def __is_inside(token, match) -> bool:
+        phrase, ignore_case, at_start = token
+        matched = match.group()
+        if ignore_case:
+            phrase, matched = phrase.lower(), matched.lower()
+        if at_start:
+            return match.start() == 0 and matched.startswith(phrase)
+        return phrase in matched
+
+
+def sanitise_incident_name(text) -> str:
+    """Incident name from the text of a mention, without mentions and the command words"""
+    name = USER_MENTION_PATTERN.sub("", text)
+    name = NEW_INCIDENT_PHRASES_PATTERN.sub("", name)
+    return " ".join(name.split())
+
+
+def extract_log_text(text) -> str:
+    return text.split(":", 1)[1].strip()
+
+
+# In the priority order of the mention handler
+MENTION_INTENTS = IntentMatcher(
+    [
+        IntentRule("alive", ["alive"]),
+        IntentRule("create_ticket", ["create ticket"]),
+        IntentRule("create_call", ["create call"]),
+        IntentRule("get_call", ["get call"]),
+        IntentRule(
+            "new_incident",
+            [("new incident", "create incident")],
+            lambda text: {"incident_name": sanitise_incident_name(text)},
+        ),
+        IntentRule("oncall", [("who is oncall", "who’s oncall")]),
+        IntentRule("ongoing_incidents", ["ongoing", "incident"]),
+    ]
+)
+
+MESSAGE_INTENTS = IntentMatcher(
+    [
+        IntentRule("easter_egg", ["parca"]),
+        IntentRule(
+            "log",
+            ["log:"],
+            lambda text: {"text_to_log": extract_log_text(text)},
+            ignore_case=True,
+            at_start=True,
+        ),
+    ]
+)
@@ -1,4 +1,3 @@
-from slack_sdk import WebClient
 from slack_message_formatters.register_command.jira import Jira
 from slack_message_formatters.register_command.zoom import Zoom
 from slack_message_formatters.close_incident_formatter import CloseIncidentFormatter
@@ -6,7 +5,8 @@ from slack_message_formatters.register_command.register_command_formatter import
     RegisterCommandFormatter,
 )
 from slack_message_formatters.responders_list_formatter import RespondersListFormatter
-from utils.dynamo import DynamoUtils
+from utils.storage import Storage
+from utils.slack_clients import SlackClients
 from services.responders_service import RespondersService
 
 
@@ -58,8 +58,8 @@ class SlackCommandsHandler:
 
     def show_close_incident_modal(self, team_id, channel_id, trigger_id):
         """Show a slack modal with an input to add incident resolution text"""
-        slack_access_token = DynamoUtils.get_slack_access_token(team_id)
-        client = WebClient(token=slack_access_token)
+        slack_access_token = Storage.get_backend().get_slack_access_token(team_id)
+        client = SlackClients.get_client(slack_access_token)
         formatter = CloseIncidentFormatter()
         client.views_open(
             trigger_id=trigger_id, view=formatter.format(channel_id).get("view")
@@ -18,8 +18,7 @@ from slack_message_formatters.new_incident_integrations_links import (
 )
 from services.incident_service import IncidentService
 from services.responders_service import RespondersService
-from services.user_service import UserService
-from services.integrated_service import IntegratedService
+from utils.storage_backend import StorageUnavailableError
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -29,14 +28,15 @@ class SlackEventsHandler:
     """
     Class to handle events from slack
     """
+
+    MAX_CHANNEL_NAME_ATTEMPTS = 5
+
     def __init__(self, client, team_id):
         self.slack_client = client
         self.team_id = team_id
         self.incident_name = ""
-        integrated_services: List[
-            IntegratedService
-        ] = UserService.get_integrated_services(team_id)
-        self.incident_service = IncidentService(team_id, integrated_services)
+        # integrations are looked up by the incident service when a ticket or a call is used
+        self.incident_service = IncidentService(team_id)
         self.responders_service = RespondersService(team_id)
 
     def handle_new_incident_creation(self, channel, incident_name):
@@ -63,7 +63,7 @@ class SlackEventsHandler:
         )
         try:
             self.__create_new_incident(incident_name, channel)
-        except Exception as e:  # TODO - if it's name taken, we should somehow recover and create the channel anyway!!
+        except Exception as e:
             logger.error(f"Could not create incident - {e}")
             self.slack_client.chat_postMessage(
                 channel=channel,
@@ -123,8 +123,7 @@ class SlackEventsHandler:
 
     def __create_new_incident(self, incident_name, calling_channel) -> dict:
         # Create channel
-        channel_name = self.__build_channel_name(incident_name)
-        response = self.__create_channel(channel_name, calling_channel)
+        response = self.__create_incident_channel(incident_name, calling_channel)
         if response.get("status") != "ok":
             raise Exception("Error creating channel")
         channel_id = response.get("channel_id")
@@ -163,11 +162,36 @@ class SlackEventsHandler:
             self.__notify_responders(channel_id, incident, integrations, oncall)
             logger.info(f"Creating incident done... {self.team_id}")
             return {"status": "ok"}
+        except StorageUnavailableError as e:
+            # the channel is there but the incident isn't saved, commands in it won't work
+            logger.error(f"incident could not be saved {self.team_id} {e}")
+            self.slack_client.chat_postMessage(
+                channel=channel_id,
+                text="The incident could not be saved, please create it again",
+            )
+            raise
         except Exception as e:
             logger.error(f"incident could not be created {self.team_id} {e}")
             return {"status": "failed"}
 
-    def __build_channel_name(self, incident_name):
+    def __create_incident_channel(self, incident_name, calling_channel) -> dict:
+        """
+        Creates the incident channel. If the name is already taken, it tries again with the next name
+        """
+        for attempt in range(self.MAX_CHANNEL_NAME_ATTEMPTS):
+            channel_name = self.__build_channel_name(incident_name, attempt)
+            response = self.__create_channel(channel_name, calling_channel)
+            if response.get("status") != "name_taken":
+                return response
+            logger.info(f"channel name {channel_name} taken {self.team_id}")
+        self.__handle_channel_creation_error(calling_channel)
+        return {"status": "failure"}
+
+    def __build_channel_name(self, incident_name, attempt=0):
+        """
+        Named incidents use the name and a suffix after the first attempt.
+        Unnamed incidents get a new number from today's counter on every attempt
+        """
         today = date.today()
         today_format = today.strftime("%d-%m-%y")
         incident_name = (
@@ -176,10 +200,11 @@ class SlackEventsHandler:
         channel_name = ""
         if incident_name != "":
             channel_name = f"i-{incident_name[:14]}-{today_format}"
+            if attempt > 0:
+                channel_name = f"{channel_name}_{str(attempt + 1)}"
         else:
-            today_incidents = self.incident_service.get_today_incidents()
-            number_of_incidents = len(today_incidents)
-            channel_name = f"i-sereno-{today_format}_{str(number_of_incidents + 1)}"
+            incident_number = self.incident_service.get_next_incident_number()
+            channel_name = f"i-sereno-{today_format}_{str(incident_number)}"
         return channel_name
 
     def __create_channel(self, channel_name, calling_channel) -> dict:
@@ -199,6 +224,8 @@ class SlackEventsHandler:
             self.slack_client.chat_postMessage(channel=calling_channel, text=message)
             return {"status": "ok", "channel_id": channel_id}
         except SlackApiError as e:
+            if e.response.get("error") == "name_taken":
+                return {"status": "name_taken"}
             self.__handle_channel_creation_error(calling_channel, e)
             return {"status": "failure"}
 
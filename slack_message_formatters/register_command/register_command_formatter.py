@@ -2,7 +2,7 @@ from typing import List
 from slack_message_formatters.register_command.integrated_service import (
     IntegratedServiceFormatter,
 )
-from utils.dynamo import DynamoUtils
+from utils.storage import Storage
 
 """
 Class whose responsibility is to build and format the response to slackbot command /register_command
@@ -17,7 +17,7 @@ class RegisterCommandFormatter:
 
     def format(self, team_id, user_id):
         services_section = []
-        authorized_apps = DynamoUtils.get_authorized_apps(team_id)
+        authorized_apps = Storage.get_backend().get_authorized_apps(team_id)
         for service in self.services:
             services_section.append(
                 service.build_oauth_entry(team_id, user_id, authorized_apps)
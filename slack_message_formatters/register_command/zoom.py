@@ -41,7 +41,7 @@ class Zoom(IntegratedServiceFormatter):
         access_token = json_response.get("access_token")
         refresh_token = json_response.get("refresh_token")
         expires_in = json_response.get("expires_in")
-        expiry_date = DateTimeUtils.calculate_expiration_date_from_seconds(expires_in)
+        expiry_date = DateTimeUtils.calculate_expiration_epoch_from_seconds(expires_in)
         token_data = TokenData(access_token, refresh_token, expiry_date)
         return token_data
 
@@ -75,7 +75,7 @@ class Zoom(IntegratedServiceFormatter):
             access_token = json_response.get("access_token")
             refresh_token = json_response.get("refresh_token")
             expires_in = json_response.get("expires_in")
-            expiry_date = DateTimeUtils.calculate_expiration_date_from_seconds(
+            expiry_date = DateTimeUtils.calculate_expiration_epoch_from_seconds(
                 expires_in
             )
             oauth_token_response = TokenData(access_token, refresh_token, expiry_date)
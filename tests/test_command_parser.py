@@ -0,0 +1,38 @@
+# test_command_parser.py
+
+import os
+for name in ['JIRA_CLIENT_ID', 'JIRA_CLIENT_SECRET', 'JIRA_REDIRECT_URL', 'ZOOM_CLIENT_ID', 'ZOOM_CLIENT_SECRET', 'ZOOM_REDIRECT_URI']:
+  os.environ.setdefault(name, 'test')
+
+from functions import commands
+from slack_handlers.command_parser import CommandParser
+from utils.memory_storage import MemoryStorage
+from utils.slack_clients import SlackClients
+from utils.storage import Storage
+
+class FakeClient:
+  def __init__(self):
+    self.replies = []
+
+  def chat_postEphemeral(self, **kwargs):
+    self.replies.append(kwargs.get('text'))
+
+def test_commands_are_looked_up_by_their_leading_keywords():
+  command = CommandParser.parse('responders add <@U1|lisandro> <#C1|incidents> <@U2>')
+  assert 'responders_add' == command.name
+  assert ['U1', 'U2', 'C1'] == command.get_mentions()
+  assert 'set_oncall' == CommandParser.parse('Set Oncall <@U3>').name
+  assert 'set_oncall' == CommandParser.parse('oncall set <@U3>').name
+  assert 'responders' == CommandParser.parse('responders lsit').name
+  # only leading keywords count, words later in the text don't pick a command
+  assert None == CommandParser.parse('please register the responders').name
+  assert None == CommandParser.parse('').name
+
+def test_responders_add_without_mentions_adds_nothing(monkeypatch):
+  storage = MemoryStorage()
+  Storage.set_backend(storage)
+  client = FakeClient()
+  monkeypatch.setattr(SlackClients, 'get_client', classmethod(lambda cls, token: client))
+  commands.command_handler({'team_id': 'T1', 'user_id': 'U1', 'channel_id': 'C1', 'text': 'responders add'}, None)
+  assert ['List of responders cannot be empty!'] == client.replies
+  assert set() == storage.get_responders('T1')
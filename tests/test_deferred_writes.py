@@ -0,0 +1,50 @@
+# test_deferred_writes.py
+
+import os
+os.environ.setdefault('USERS_TABLE', 'users-table')
+os.environ.setdefault('INCIDENTS_TABLE', 'incidents-table')
+
+from domain.incident import Incident, IncidentStatus
+from functions import queue_consumer
+from utils.dynamo import DynamoUtils
+from utils.event_queue import EventQueues, SqliteQueue
+from utils.storage_backend import StorageUnavailableError
+
+def throttled_transaction(transact_items):
+  raise StorageUnavailableError('transact_write_items throttled 5 times')
+
+def test_throttled_incident_is_saved_and_its_summary_applied_from_the_queue(tmp_path, monkeypatch):
+  event_queue = SqliteQueue(str(tmp_path / 'events.db'))
+  monkeypatch.setattr(EventQueues, '_EventQueues__queue', event_queue)
+  monkeypatch.setattr(DynamoUtils, 'DERIVED_WRITES_FROM_STREAM', False)
+  monkeypatch.setattr(DynamoUtils, '_DynamoUtils__ensure_open_incidents_summary', lambda team_id: None)
+  monkeypatch.setattr(DynamoUtils, '_DynamoUtils__transact_write_items', throttled_transaction)
+  saved = []
+  monkeypatch.setattr(DynamoUtils, '_DynamoUtils__put_incident', lambda incident: saved.append(incident) or {})
+  incident = Incident('T1', 'inc-1', 'db down')
+  assert {} == DynamoUtils.create_incident(incident)
+  assert [incident] == saved
+  assert 1 == event_queue.count()
+
+  monkeypatch.setattr(queue_consumer, 'load_team', lambda team_id: None)
+  monkeypatch.setattr(DynamoUtils, 'get_incident',
+                      lambda team_id, incident_id, consistent_read=False: incident)
+  updates = []
+  monkeypatch.setattr(DynamoUtils, 'update_open_incidents',
+                      lambda team_id, opened, closed_ids: updates.append((team_id, opened, closed_ids)))
+  assert 1 == queue_consumer.consume_batch(event_queue)
+  assert [('T1', [incident], [])] == updates
+  assert 0 == event_queue.count()
+
+def test_deferred_write_removes_incidents_that_are_no_longer_ongoing(monkeypatch):
+  from functions.deferred_writes import apply_deferred_write
+  closed = Incident('T1', 'inc-1', 'db down')
+  closed.status = IncidentStatus.CLOSED
+  incidents = {'inc-1': closed, 'inc-2': None}
+  monkeypatch.setattr(DynamoUtils, 'get_incident',
+                      lambda team_id, incident_id, consistent_read=False: incidents[incident_id])
+  updates = []
+  monkeypatch.setattr(DynamoUtils, 'update_open_incidents',
+                      lambda team_id, opened, closed_ids: updates.append((team_id, opened, closed_ids)))
+  apply_deferred_write({'team': 'T1', 'write': 'open_incidents', 'incident_ids': ['inc-1', 'inc-2']}, None)
+  assert [('T1', [], ['inc-1', 'inc-2'])] == updates
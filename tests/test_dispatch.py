@@ -0,0 +1,20 @@
+# test_dispatch.py
+
+from functions import dispatch
+from functions.dispatch import ThreadPoolDispatcher
+
+handled = []
+
+def recording_handler(event, context):
+  handled.append((event, context))
+  return event
+
+def test_thread_pool_runs_the_handler_with_a_copy_of_the_event(monkeypatch):
+  monkeypatch.setitem(dispatch.HANDLERS, 'test', (__name__, 'recording_handler'))
+  dispatcher = ThreadPoolDispatcher(2)
+  event = {'team': 'T1', 'text': 'new incident'}
+  future = dispatcher.dispatch('test', event)
+  dispatcher.shutdown()
+  assert event == future.result()
+  assert [(event, None)] == handled
+  assert handled[0][0] is not event
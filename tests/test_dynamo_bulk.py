@@ -0,0 +1,96 @@
+# test_dynamo_bulk.py
+
+import os
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+
+import pytest
+from botocore.stub import Stubber
+from utils.aws import AwsUtils
+from utils.dynamo_bulk import DynamoBulk, ScanCheckpoint
+
+def test_batch_write_chunks_and_retries_unprocessed_items(monkeypatch):
+  monkeypatch.setattr(DynamoBulk, 'BASE_BACKOFF_SECONDS', 0)
+  items = [{'teamId': f'T{i}'} for i in range(30)]
+  unprocessed = {'users-table': [{'PutRequest': {'Item': {'teamId': {'S': 'T0'}}}}]}
+  with Stubber(AwsUtils.get_dynamodb_resource().meta.client) as stubber:
+    stubber.add_response('batch_write_item', {'UnprocessedItems': unprocessed})
+    stubber.add_response('batch_write_item', {'UnprocessedItems': {}})
+    stubber.add_response('batch_write_item', {})
+    assert 30 == DynamoBulk.batch_write('users-table', put_items=items)
+    stubber.assert_no_pending_responses()
+
+def test_batch_get_retries_unprocessed_keys(monkeypatch):
+  monkeypatch.setattr(DynamoBulk, 'BASE_BACKOFF_SECONDS', 0)
+  unprocessed = {'users-table': {'Keys': [{'teamId': {'S': 'T2'}}]}}
+  with Stubber(AwsUtils.get_dynamodb_resource().meta.client) as stubber:
+    stubber.add_response('batch_get_item', {
+      'Responses': {'users-table': [{'teamId': {'S': 'T1'}}]}, 'UnprocessedKeys': unprocessed})
+    stubber.add_response('batch_get_item', {
+      'Responses': {'users-table': [{'teamId': {'S': 'T2'}}]}})
+    items = list(DynamoBulk.batch_get('users-table', [{'teamId': 'T1'}, {'teamId': 'T2'}]))
+  assert ['T1', 'T2'] == [item['teamId'] for item in items]
+
+class PagedTable:
+  """Table whose segments have the given pages, scans are recorded"""
+  def __init__(self, pages_by_segment):
+    self.pages_by_segment = pages_by_segment
+    self.scans = []
+
+  def scan(self, Segment, TotalSegments, ExclusiveStartKey=None, **kwargs):
+    self.scans.append((Segment, ExclusiveStartKey))
+    pages = self.pages_by_segment[Segment]
+    page = 0 if ExclusiveStartKey is None else int(ExclusiveStartKey['page']) + 1
+    response = {'Items': pages[page]}
+    if page + 1 < len(pages):
+      response['LastEvaluatedKey'] = {'page': page}
+    return response
+
+def test_parallel_scan_yields_the_pages_of_every_segment(monkeypatch):
+  table = PagedTable({
+    0: [[{'teamId': 'T1'}], [{'teamId': 'T2'}]],
+    1: [[], [{'teamId': 'T3'}], [{'teamId': 'T4'}, {'teamId': 'T5'}]],
+  })
+  monkeypatch.setattr(AwsUtils, 'get_dynamodb_table', lambda table_name: table)
+  items = list(DynamoBulk.parallel_scan('users-table', total_segments=2))
+  assert ['T1', 'T2', 'T3', 'T4', 'T5'] == sorted(item['teamId'] for item in items)
+
+def test_parallel_scan_stops_reading_when_the_caller_stops(monkeypatch):
+  table = PagedTable({0: [[{'teamId': f'T{page}'}] for page in range(100)]})
+  monkeypatch.setattr(AwsUtils, 'get_dynamodb_table', lambda table_name: table)
+  items = DynamoBulk.parallel_scan('users-table', total_segments=1)
+  assert {'teamId': 'T0'} == next(items)
+  items.close()
+  # the segment can only read ahead the pages that fit in the queue
+  assert len(table.scans) <= DynamoBulk.SCAN_QUEUED_PAGES + 2
+
+def test_parallel_scan_raises_the_errors_of_a_segment(monkeypatch):
+  table = PagedTable({0: [[{'teamId': 'T1'}]]})
+  monkeypatch.setattr(AwsUtils, 'get_dynamodb_table', lambda table_name: table)
+  with pytest.raises(KeyError):
+    list(DynamoBulk.parallel_scan('users-table', total_segments=2))
+
+def test_interrupted_parallel_process_resumes_from_the_checkpoint(monkeypatch, tmp_path):
+  table = PagedTable({
+    0: [[{'teamId': 'T1'}], [{'teamId': 'T2'}]],
+    1: [[{'teamId': 'T3'}], [{'teamId': 'T4'}], [{'teamId': 'T5'}]],
+  })
+  monkeypatch.setattr(AwsUtils, 'get_dynamodb_table', lambda table_name: table)
+  checkpoint_path = str(tmp_path / 'checkpoint.json')
+  processed = []
+  def interrupted_at_T4(items):
+    if items[0]['teamId'] == 'T4':
+      raise Exception('interrupted')
+    processed.extend(item['teamId'] for item in items)
+  with pytest.raises(Exception):
+    DynamoBulk.parallel_process('users-table', interrupted_at_T4, total_segments=2,
+                                checkpoint=ScanCheckpoint(checkpoint_path))
+  assert ['T1', 'T2', 'T3'] == sorted(processed)
+  table.scans = []
+  processed.clear()
+  # a new run skips the finished segment 0 and reads segment 1 from the page after T3
+  assert 2 == DynamoBulk.parallel_process('users-table', lambda items: processed.extend(
+    item['teamId'] for item in items), total_segments=2, checkpoint=ScanCheckpoint(checkpoint_path))
+  assert [(1, {'page': 0}), (1, {'page': 1})] == table.scans
+  assert ['T4', 'T5'] == processed
@@ -0,0 +1,50 @@
+# test_dynamo_ndjson.py
+
+import io
+import json
+from decimal import Decimal
+from scripts.dynamo_ndjson import export_table, import_table
+from utils.aws import AwsUtils
+
+class ScannedTable:
+  def __init__(self, items):
+    self.items = items
+
+  def scan(self, Segment, TotalSegments, **kwargs):
+    return {'Items': self.items if Segment == 0 else []}
+
+class BatchWriter:
+  """Resource that records each written chunk with the number of lines read when it was written"""
+  def __init__(self, lines_read):
+    self.lines_read = lines_read
+    self.chunks = []
+
+  def batch_write_item(self, RequestItems):
+    self.chunks.append((len(self.lines_read), RequestItems['users-table']))
+    return {}
+
+def test_export_keeps_dynamo_types(monkeypatch):
+  items = [{'teamId': 'T1', 'version': Decimal(3), 'responders': {'U1'}}]
+  monkeypatch.setattr(AwsUtils, 'get_dynamodb_table', lambda table_name: ScannedTable(items))
+  output = io.StringIO()
+  assert 1 == export_table('users-table', output, 2)
+  expected = {'Item': {'teamId': {'S': 'T1'}, 'version': {'N': '3'}, 'responders': {'SS': ['U1']}}}
+  assert [expected] == [json.loads(line) for line in output.getvalue().splitlines()]
+
+def test_import_writes_while_reading(monkeypatch):
+  lines_read = []
+  def lines():
+    for i in range(30):
+      lines_read.append(i)
+      yield json.dumps({'Item': {'teamId': {'S': f'T{i}'}, 'version': {'N': '1'}}}) + '\n'
+    yield '\n'
+  resource = BatchWriter(lines_read)
+  monkeypatch.setattr(AwsUtils, 'get_dynamodb_resource', lambda: resource)
+  assert 30 == import_table('users-table', lines())
+  # the first chunk is written before the rest of the file is read
+  assert [25, 30] == [read for read, _chunk in resource.chunks]
+  item = resource.chunks[0][1][0]['PutRequest']['Item']
+  # marked so the incidents stream consumer skips the imported items
+  assert 'imported_at' in item
+  del item['imported_at']
+  assert {'teamId': 'T0', 'version': Decimal(1)} == item
@@ -0,0 +1,44 @@
+# test_dynamo_throttle.py
+
+import os
+os.environ.setdefault('USERS_TABLE', 'users-table')
+os.environ.setdefault('INCIDENTS_TABLE', 'incidents-table')
+
+import pytest
+from botocore.exceptions import ClientError
+from utils.dynamo import DynamoUtils
+from utils.dynamo_throttle import DynamoThrottle
+from utils.storage_backend import StorageUnavailableError
+
+def throttled_operation(failures):
+  calls = []
+  def operation(**kwargs):
+    calls.append(kwargs)
+    if len(calls) <= failures:
+      raise ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'GetItem')
+    return {'Item': kwargs['Key']}
+  return operation, calls
+
+def test_retries_throttled_calls(monkeypatch):
+  monkeypatch.setattr(DynamoThrottle, 'BASE_BACKOFF_SECONDS', 0)
+  operation, calls = throttled_operation(2)
+  throttles = DynamoThrottle.get_throttle_counts().get('get_item', 0)
+  assert {'Item': {'teamId': 'T1'}} == DynamoThrottle.call('get_item', operation, Key={'teamId': 'T1'})
+  assert 3 == len(calls)
+  assert throttles + 2 == DynamoThrottle.get_throttle_counts()['get_item']
+
+def test_raises_once_the_budget_is_spent(monkeypatch):
+  monkeypatch.setattr(DynamoThrottle, 'BUDGET_SECONDS', 0)
+  operation, _calls = throttled_operation(1)
+  with pytest.raises(StorageUnavailableError):
+    DynamoThrottle.call('get_item', operation, Key={'teamId': 'T1'})
+
+def test_incident_reads_raise_when_storage_is_unavailable(monkeypatch):
+  def unavailable(*args, **kwargs):
+    raise StorageUnavailableError('get_item throttled 3 times')
+  monkeypatch.setattr(DynamoUtils, 'get_team_record', unavailable)
+  monkeypatch.setattr(DynamoUtils, 'get_incidents_started_between', unavailable)
+  with pytest.raises(StorageUnavailableError):
+    DynamoUtils.get_ongoing_incidents('T1')
+  with pytest.raises(StorageUnavailableError):
+    DynamoUtils.get_today_incidents('T1')
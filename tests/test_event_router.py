@@ -0,0 +1,19 @@
+# test_event_router.py
+
+from slack_handlers.event_router import EventRouter
+
+def test_messages_matching_no_handler_are_dropped():
+  dropped = EventRouter.get_dropped_counts().get('message', 0)
+  assert 'log' == EventRouter.route('message', {'text': 'LOG: restarted the db'})
+  assert 'easter_egg' == EventRouter.route('message', {'text': 'ask parca'})
+  assert None == EventRouter.route('message', {'text': 'lunch? log: no'})
+  assert None == EventRouter.route('message', {'text': 'log: edited', 'subtype': 'message_changed'})
+  assert None == EventRouter.route('message', {'subtype': 'channel_join'})
+  assert dropped + 3 == EventRouter.get_dropped_counts()['message']
+
+def test_mentions_are_routed_like_the_mention_handler():
+  assert 'new_incident' == EventRouter.route('mention', {'text': '<@U1> new incident db down'})
+  assert 'oncall' == EventRouter.route('mention', {'text': '<@U1> who’s oncall?'})
+  assert 'ongoing_incidents' == EventRouter.route('mention', {'text': '<@U1> any incidents\nongoing?'})
+  assert None == EventRouter.route('mention', {'text': '<@U1> thanks!'})
+  assert 'command' == EventRouter.route('command', {})
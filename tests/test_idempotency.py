@@ -0,0 +1,38 @@
+# test_idempotency.py
+
+from utils.idempotency import Idempotency
+from utils.memory_storage import MemoryStorage
+from utils.storage import Storage
+
+class FailingStorage(MemoryStorage):
+  def claim_idempotency_key(self, key, ttl_seconds, now):
+    raise Exception('throttled')
+
+def test_retries_of_an_event_are_duplicates():
+  Storage.set_backend(MemoryStorage())
+  Idempotency.clear()
+  key = Idempotency.event_key('Ev1')
+  assert False == Idempotency.is_duplicate(key)
+  assert True == Idempotency.is_duplicate(key, '1')
+  # another process only sees the claim in the storage
+  Idempotency.clear()
+  assert True == Idempotency.is_duplicate(key, '2')
+  assert False == Idempotency.is_duplicate(Idempotency.event_key('Ev2'))
+  assert False == Idempotency.is_duplicate(Idempotency.trigger_key(None))
+
+def test_events_are_handled_when_the_storage_fails():
+  Storage.set_backend(FailingStorage())
+  Idempotency.clear()
+  key = Idempotency.trigger_key('trigger-1')
+  assert False == Idempotency.is_duplicate(key)
+  assert False == Idempotency.is_duplicate(key)
+
+def test_released_key_can_be_claimed_again():
+  Storage.set_backend(MemoryStorage())
+  Idempotency.clear()
+  key = Idempotency.event_key('Ev3')
+  assert False == Idempotency.is_duplicate(key)
+  # the event could not be dispatched, slack's retry has to be handled
+  Idempotency.release(key)
+  assert False == Idempotency.is_duplicate(key, '1')
+  assert True == Idempotency.is_duplicate(key, '2')
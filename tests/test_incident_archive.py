@@ -0,0 +1,92 @@
+# test_incident_archive.py
+
+import os
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('USERS_TABLE', 'users-table')
+os.environ.setdefault('INCIDENTS_TABLE', 'incidents-table')
+os.environ.setdefault('INCIDENTS_ARCHIVE_TABLE', 'incidents-archive-table')
+
+import json
+from botocore.stub import ANY, Stubber
+from utils.aws import AwsUtils
+from utils.incident_archive import IncidentArchive
+
+LONG_AGO = '2020-01-01 10:00:00'
+RECENTLY = '2999-01-01 10:00:00'
+
+def incident_item(incident_id, started_datetime, closed_at=None):
+  item = {'teamId': {'S': 'T1'}, 'incidentId': {'S': incident_id}, 'status': {'S': 'CLOSED'},
+          'started_datetime': {'S': started_datetime}}
+  if closed_at is not None:
+    item['closed_at'] = {'S': closed_at}
+  return item
+
+def incident_key(incident_id):
+  return {'teamId': {'S': 'T1'}, 'incidentId': {'S': incident_id}}
+
+def archive_request(*items):
+  return {'RequestItems': {'incidents-archive-table': [
+    {'PutRequest': {'Item': {'teamId': 'T1', 'status': 'CLOSED', **item}}} for item in items]}}
+
+CHECKPOINT_KEY = {'teamId': 'checkpoint#', 'incidentId': 'archive'}
+
+def checkpoint_put(segments):
+  return {'TableName': 'incidents-archive-table', 'Item': {
+    **CHECKPOINT_KEY, 'checkpoint': json.dumps({'total_segments': 1, 'segments': {'0': segments}})}}
+
+def test_incidents_closed_before_the_cutoff_are_archived_page_by_page(monkeypatch):
+  monkeypatch.setattr(IncidentArchive, 'ARCHIVE_PAGE_INTERVAL_SECONDS', 0)
+  # the incidents table is reached through DynamoUtils, whose client doesn't retry
+  with Stubber(AwsUtils.get_dynamodb_resource().meta.client) as stubber, \
+      Stubber(AwsUtils.get_dynamodb_resource(retries=False).meta.client) as incidents_stubber:
+    stubber.add_response('get_item', {}, {
+      'TableName': 'incidents-archive-table', 'Key': CHECKPOINT_KEY, 'ConsistentRead': True})
+    stubber.add_response('scan', {
+      'Items': [
+        incident_item('closed-long-ago', LONG_AGO, LONG_AGO),
+        incident_item('closed-recently', LONG_AGO, RECENTLY),
+        # closed before closed_at existed, the start date is used
+        incident_item('old-without-closed-at', LONG_AGO),
+        incident_item('new-without-closed-at', RECENTLY),
+      ],
+      'LastEvaluatedKey': incident_key('new-without-closed-at')})
+    stubber.add_response('batch_write_item', {}, archive_request(
+      {'incidentId': 'closed-long-ago', 'started_datetime': LONG_AGO, 'closed_at': LONG_AGO},
+      {'incidentId': 'old-without-closed-at', 'started_datetime': LONG_AGO}))
+    incidents_stubber.add_response('delete_item', {}, {
+      'TableName': 'incidents-table', 'Key': {'teamId': 'T1', 'incidentId': 'closed-long-ago'},
+      'ConditionExpression': ANY})
+    incidents_stubber.add_response('delete_item', {}, {
+      'TableName': 'incidents-table', 'Key': {'teamId': 'T1', 'incidentId': 'old-without-closed-at'},
+      'ConditionExpression': ANY})
+    stubber.add_response('put_item', {}, checkpoint_put(
+      {'last_key': incident_key('new-without-closed-at')}))
+    stubber.add_response('scan', {'Items': [incident_item('reopened', LONG_AGO, LONG_AGO)]})
+    stubber.add_response('batch_write_item', {}, archive_request(
+      {'incidentId': 'reopened', 'started_datetime': LONG_AGO, 'closed_at': LONG_AGO}))
+    # reopened after the scan, the archived copy is deleted instead
+    incidents_stubber.add_client_error('delete_item', 'ConditionalCheckFailedException')
+    stubber.add_response('delete_item', {}, {
+      'TableName': 'incidents-archive-table', 'Key': {'teamId': 'T1', 'incidentId': 'reopened'}})
+    stubber.add_response('put_item', {}, checkpoint_put({'done': True}))
+    # the scan is complete, the next run starts over
+    stubber.add_response('delete_item', {}, {'TableName': 'incidents-archive-table', 'Key': CHECKPOINT_KEY})
+    assert 2 == IncidentArchive.archive_closed_incidents(older_than_days=30)
+    stubber.assert_no_pending_responses()
+    incidents_stubber.assert_no_pending_responses()
+
+def test_archival_out_of_time_continues_from_the_saved_checkpoint(monkeypatch):
+  monkeypatch.setattr(IncidentArchive, 'ARCHIVE_PAGE_INTERVAL_SECONDS', 0)
+  with Stubber(AwsUtils.get_dynamodb_resource().meta.client) as stubber:
+    stubber.add_response('get_item', {'Item': {**{name: {'S': value} for name, value in CHECKPOINT_KEY.items()},
+      'checkpoint': {'S': json.dumps({'total_segments': 1, 'segments': {'0': {'last_key': incident_key('inc-9')}}})}}})
+    stubber.add_response('scan', {'Items': [], 'LastEvaluatedKey': incident_key('inc-19')}, {
+      'TableName': 'incidents-table', 'Segment': 0, 'TotalSegments': 1, 'Limit': 25,
+      'FilterExpression': ANY, 'ExclusiveStartKey': {'teamId': 'T1', 'incidentId': 'inc-9'}})
+    stubber.add_response('put_item', {}, checkpoint_put({'last_key': incident_key('inc-19')}))
+    # after the first page only the stop margin is left
+    remaining_millis = iter([60000, 9000]).__next__
+    assert 0 == IncidentArchive.archive_closed_incidents(older_than_days=30, remaining_millis=remaining_millis)
+    stubber.assert_no_pending_responses()
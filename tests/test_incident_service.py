@@ -0,0 +1,43 @@
+# test_incident_service.py
+
+import os
+os.environ.setdefault('JIRA_CLIENT_ID', 'jira-client')
+os.environ.setdefault('JIRA_REDIRECT_URL', 'http://localhost/jira')
+os.environ.setdefault('ZOOM_REDIRECT_URI', 'http://localhost/zoom')
+from domain.integrations.zoom import Zoom
+from domain.token_data import TokenData
+from services.zoom_api_service import ZoomApiService
+from slack_handlers.slack_events_handler import SlackEventsHandler
+from utils.memory_storage import MemoryStorage
+from utils.storage import Storage
+
+class CountingStorage(MemoryStorage):
+  def __init__(self):
+    super().__init__()
+    self.reads = []
+
+  def get_authorized_apps(self, team_id, consistent_read=False):
+    self.reads.append('apps')
+    return super().get_authorized_apps(team_id, consistent_read)
+
+  def get_jira_data(self, team_id, consistent_read=False):
+    self.reads.append('jira')
+    return super().get_jira_data(team_id, consistent_read)
+
+  def get_zoom_data(self, team_id, consistent_read=False):
+    self.reads.append('zoom')
+    return super().get_zoom_data(team_id, consistent_read)
+
+def test_integrations_are_read_when_used():
+  storage = CountingStorage()
+  Storage.set_backend(storage)
+  storage.save_oncall('T1', 'U1')
+  storage.save_zoom_data('T1', Zoom(TokenData('access', 'refresh', '2999-01-01 10:00:00')))
+  slack_events_handler = SlackEventsHandler(None, 'T1')
+  assert 'U1' == slack_events_handler.get_oncall('T1')
+  assert [] == storage.reads
+  incident_service = slack_events_handler.incident_service
+  assert isinstance(incident_service.call_service, ZoomApiService)
+  assert None == incident_service.ticket_service
+  assert None == incident_service.create_ticket()
+  assert ['zoom'] == [read for read in storage.reads if read != 'apps']
@@ -0,0 +1,110 @@
+# test_incident_stream.py
+
+import os
+os.environ.setdefault('USERS_TABLE', 'users-table')
+os.environ.setdefault('INCIDENTS_TABLE', 'incidents-table')
+
+from botocore.exceptions import ClientError
+from domain.incident import Incident
+from domain.team_record import TeamRecord
+from utils.dynamo import DynamoUtils
+from utils.incident_stream import InMemoryIncidentStream, OpenIncidentsHandler
+
+def incident_item(team_id, incident_id, status):
+  return {'teamId': team_id, 'incidentId': incident_id, 'status': status, 'name': incident_id,
+          'started_datetime': '2021-03-01 10:00:00'}
+
+class RecordingHandler:
+  handled = []
+
+  @classmethod
+  def handle(cls, team_id, changes):
+    cls.handled.append((team_id, [change.get_incident_id() for change in changes]))
+
+class FailingHandler:
+  @classmethod
+  def handle(cls, team_id, changes):
+    if team_id == 'T2':
+      raise Exception('throttled')
+
+def test_changes_are_grouped_by_team_and_counters_skipped():
+  stream = InMemoryIncidentStream()
+  stream.put(None, incident_item('T1', 'inc-1', 'ONGOING'))
+  stream.put(None, incident_item('T2', 'inc-2', 'ONGOING'))
+  stream.put(None, {'teamId': 'T1', 'incidentId': 'counter#2021-03-01', 'sequence': 1})
+  stream.put(incident_item('T1', 'inc-1', 'ONGOING'), incident_item('T1', 'inc-1', 'CLOSED'))
+  RecordingHandler.handled = []
+  assert [] == stream.deliver(handlers=[RecordingHandler])
+  assert [('T1', ['inc-1', 'inc-1']), ('T2', ['inc-2'])] == RecordingHandler.handled
+  assert 0 == stream.pending()
+
+def test_failed_team_is_reported_from_its_first_record():
+  stream = InMemoryIncidentStream()
+  stream.put(None, incident_item('T1', 'inc-1', 'ONGOING'))
+  stream.put(None, incident_item('T2', 'inc-2', 'ONGOING'))
+  stream.put(None, incident_item('T2', 'inc-3', 'ONGOING'))
+  failures = stream.deliver(handlers=[FailingHandler])
+  assert [{'itemIdentifier': '2'}, {'itemIdentifier': '2'}] == failures
+  assert 2 == stream.pending()
+
+def test_open_incidents_follow_the_last_change():
+  stream = InMemoryIncidentStream()
+  stream.put(None, incident_item('T1', 'inc-1', 'ONGOING'))
+  stream.put(None, incident_item('T1', 'inc-2', 'ONGOING'))
+  stream.put(incident_item('T1', 'inc-2', 'ONGOING'), incident_item('T1', 'inc-2', 'CLOSED'))
+  stream.put(incident_item('T1', 'inc-3', 'ONGOING'), incident_item('T1', 'inc-3', 'RESOLVED'))
+  stream.put(incident_item('T1', 'inc-4', 'CLOSED'), None)
+  changes = []
+  class CollectingHandler:
+    @classmethod
+    def handle(cls, team_id, team_changes):
+      changes.extend(team_changes)
+  stream.deliver(handlers=[CollectingHandler])
+  opened, closed_ids = OpenIncidentsHandler.collect(changes)
+  assert ['inc-1'] == [incident.incident_id for incident in opened]
+  assert ['inc-2', 'inc-3'] == closed_ids
+
+def deliver_created_incident(monkeypatch, derived_writes_from_stream):
+  """Creates an incident and delivers its stream record, returns the team item writes"""
+  writes = []
+  def transact_write_items(transact_items):
+    writes.extend(item['Update']['TableName'] for item in transact_items if 'Update' in item)
+  monkeypatch.setattr(DynamoUtils, 'DERIVED_WRITES_FROM_STREAM', derived_writes_from_stream)
+  monkeypatch.setattr(DynamoUtils, '_DynamoUtils__transact_write_items', transact_write_items)
+  monkeypatch.setattr(DynamoUtils, '_DynamoUtils__ensure_open_incidents_summary', lambda team_id: None)
+  monkeypatch.setattr(DynamoUtils, '_DynamoUtils__put_incident', lambda incident: {})
+  monkeypatch.setattr(DynamoUtils, 'update_open_incidents',
+                      lambda team_id, opened, closed_ids: writes.append('users-table'))
+  DynamoUtils.create_incident(Incident('T1', 'inc-1', 'db down'))
+  stream = InMemoryIncidentStream()
+  stream.put(None, incident_item('T1', 'inc-1', 'ONGOING'))
+  assert [] == stream.deliver()
+  return sorted(writes)
+
+def test_team_item_is_written_once_in_transaction_mode(monkeypatch):
+  assert ['users-table'] == deliver_created_incident(monkeypatch, False)
+
+def test_team_item_is_written_once_in_stream_mode(monkeypatch):
+  assert ['users-table'] == deliver_created_incident(monkeypatch, True)
+
+def test_bulk_imports_are_skipped_but_later_changes_are_not():
+  imported = dict(incident_item('T1', 'inc-1', 'ONGOING'), imported_at=1614592800)
+  stream = InMemoryIncidentStream()
+  stream.put(None, imported)
+  # imported again over the existing item
+  stream.put(imported, dict(imported, imported_at=1614596400))
+  stream.put(dict(imported, imported_at=1614596400), dict(imported, status='CLOSED', imported_at=1614596400))
+  RecordingHandler.handled = []
+  assert [] == stream.deliver(handlers=[RecordingHandler])
+  assert [('T1', ['inc-1'])] == RecordingHandler.handled
+
+class MissingTeamTable:
+  def update_item(self, **kwargs):
+    assert 'attribute_exists(teamId)' == kwargs['ConditionExpression']
+    raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'UpdateItem')
+
+def test_open_incidents_summary_is_not_created_without_a_team_item(monkeypatch):
+  monkeypatch.setattr(DynamoUtils, 'get_team_record', lambda team_id, consistent_read=False: TeamRecord(team_id, {}))
+  monkeypatch.setattr(DynamoUtils, '_DynamoUtils__query_incidents_by_status', lambda team_id, status: [])
+  monkeypatch.setattr(DynamoUtils, 'get_users_table', lambda: MissingTeamTable())
+  assert [] == DynamoUtils.get_ongoing_incidents('T1')
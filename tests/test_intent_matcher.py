@@ -0,0 +1,30 @@
+# test_intent_matcher.py
+
+from slack_handlers.intent_matcher import IntentMatcher, IntentRule, MENTION_INTENTS, MESSAGE_INTENTS
+
+def test_mentions_take_the_first_intent_in_priority_order():
+  assert 'alive' == MENTION_INTENTS.match('<@U1> create incident, are you alive?').name
+  assert 'new_incident' == MENTION_INTENTS.match('<@U1> ongoing new incident').name
+  assert 'ongoing_incidents' == MENTION_INTENTS.match('<@U1> any incidents\nongoing?').name
+  assert None == MENTION_INTENTS.match('<@U1> thanks!')
+  assert None == MENTION_INTENTS.match(None)
+
+def test_new_incident_name_is_sanitised():
+  intent = MENTION_INTENTS.match('<@U1> new incident payments <@U2|maria> down')
+  expected = {'incident_name': 'payments down'}
+  assert expected == intent.arguments
+
+def test_log_messages():
+  intent = MESSAGE_INTENTS.match('Log: restarted the db')
+  assert 'log' == intent.name
+  assert {'text_to_log': 'restarted the db'} == intent.arguments
+  assert None == MESSAGE_INTENTS.match('did you log: it?')
+
+def test_phrases_inside_or_overlapping_other_phrases_are_found():
+  matcher = IntentMatcher([
+    IntentRule('urgent_incident', ['new incident', 'urgent']),
+    IntentRule('incident', ['incident']),
+    IntentRule('call_ongoing', ['call on', 'ongoing'])])
+  assert 'incident' == matcher.match('new incident').name
+  # ongoing starts inside call on
+  assert 'call_ongoing' == matcher.match('call ongoing').name
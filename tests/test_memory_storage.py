@@ -0,0 +1,49 @@
+# test_memory_storage.py
+
+from domain.incident import Incident, IncidentStatus
+from utils.memory_storage import MemoryStorage
+
+def test_team_data():
+  storage = MemoryStorage()
+  storage.save_slack_access_token('T1', 'xoxb')
+  storage.save_oncall('T1', 'U1')
+  response = storage.save_responders('T1', ['U2', 'C1'])
+  assert {'U2', 'C1'} == response['Attributes']['responders']
+  response = storage.remove_responders('T1', ['U2', 'C1'])
+  assert None == response['Attributes'].get('responders')
+  assert 'xoxb' == storage.get_slack_access_token('T1')
+  assert 'U1' == storage.get_oncall('T1')
+  assert {} == storage.get_authorized_apps('T1')
+  assert None == storage.get_jira_data('T1')
+
+def test_incidents_by_status():
+  storage = MemoryStorage()
+  storage.create_incident(Incident('T1', 'C1', 'db down'))
+  storage.create_incident(Incident('T1', 'C2'))
+  storage.create_incident(Incident('T2', 'C3'))
+  assert None == storage.create_incident(Incident('T1', 'C1'))
+  storage.update_incident_status(Incident('T1', 'C1'), IncidentStatus.CLOSED)
+  assert ['C2'] == [i.incident_id for i in storage.get_ongoing_incidents('T1')]
+  assert 2 == len(storage.get_today_incidents('T1'))
+  assert 'db down' == storage.get_incident('T1', 'C1').name
+  assert None != storage.get_incident('T1', 'C1').closed_at
+  assert None == storage.update_incident_status(Incident('T1', 'C9'), IncidentStatus.CLOSED)
+
+def test_incident_sequence():
+  storage = MemoryStorage()
+  assert 1 == storage.next_incident_sequence('T1', '2021-01-01')
+  assert 2 == storage.next_incident_sequence('T1', '2021-01-01')
+  assert 1 == storage.next_incident_sequence('T1', '2021-01-02')
+
+def test_incidents_started_between():
+  storage = MemoryStorage()
+  for incident_id, started, status in [('C1', '2021-01-01 09:00:00', IncidentStatus.CLOSED),
+                                       ('C2', '2021-01-02 10:00:00', IncidentStatus.ONGOING),
+                                       ('C3', '2021-01-03 23:59:59', IncidentStatus.MITIGATED),
+                                       ('C4', '2021-01-04 00:00:00', IncidentStatus.ONGOING)]:
+    incident = Incident('T1', incident_id)
+    incident.started_datetime = started
+    incident.status = status
+    storage.create_incident(incident)
+  incidents = storage.get_incidents_started_between('T1', '2021-01-02 00:00:00', '2021-01-03 23:59:59')
+  assert ['C2', 'C3'] == [i.incident_id for i in incidents]
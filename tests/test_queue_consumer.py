@@ -0,0 +1,44 @@
+# test_queue_consumer.py
+
+import json
+from functions import dispatch, queue_consumer
+from functions.dispatch import QueueDispatcher
+from utils.event_queue import SqliteQueue
+from utils.memory_storage import MemoryStorage
+from utils.storage import Storage
+
+handled = []
+
+def recording_handler(event, context):
+  if event.get('fail'):
+    raise Exception('slack is down')
+  handled.append(event['text'])
+
+def test_events_are_grouped_by_team_and_failures_retried(tmp_path, monkeypatch):
+  monkeypatch.setitem(dispatch.HANDLERS, 'mention', (__name__, 'recording_handler'))
+  Storage.set_backend(MemoryStorage())
+  event_queue = SqliteQueue(str(tmp_path / 'events.db'))
+  dispatcher = QueueDispatcher(event_queue)
+  dispatcher.dispatch('mention', {'team': 'T1', 'text': 'first'})
+  dispatcher.dispatch('mention', {'team': 'T2', 'text': 'second'})
+  dispatcher.dispatch('mention', {'team': 'T1', 'text': 'third'})
+  dispatcher.dispatch('mention', {'team': 'T2', 'text': 'broken', 'fail': True})
+  handled.clear()
+  assert 4 == queue_consumer.consume_batch(event_queue, batch_size=10)
+  assert ['first', 'third', 'second'] == handled
+  # the failed message is hidden until its retry
+  assert 1 == event_queue.count()
+  assert [] == event_queue.receive_messages(10, 60)
+
+def test_lambda_handler_reports_failed_messages(monkeypatch):
+  monkeypatch.setitem(dispatch.HANDLERS, 'mention', (__name__, 'recording_handler'))
+  monkeypatch.setattr(queue_consumer, 'retry_later', lambda event_queue, messages: None)
+  Storage.set_backend(MemoryStorage())
+  records = [
+    {'messageId': 'm1', 'receiptHandle': 'r1', 'attributes': {'ApproximateReceiveCount': '1'},
+     'body': json.dumps({'route': 'mention', 'event': {'team': 'T1', 'text': 'ok'}})},
+    {'messageId': 'm2', 'receiptHandle': 'r2', 'attributes': {'ApproximateReceiveCount': '2'},
+     'body': json.dumps({'route': 'mention', 'event': {'team': 'T1', 'text': 'ko', 'fail': True}})},
+  ]
+  expected = {'batchItemFailures': [{'itemIdentifier': 'm2'}]}
+  assert expected == queue_consumer.queue_consumer_handler({'Records': records}, None)
@@ -0,0 +1,48 @@
+# test_sqlite_storage.py
+
+from concurrent.futures import ThreadPoolExecutor
+from domain.incident import Incident, IncidentStatus
+from domain.integrations.zoom import Zoom
+from domain.token_data import TokenData
+from utils.sqlite_storage import SqliteStorage
+
+def test_team_data(tmp_path):
+  storage = SqliteStorage(str(tmp_path / 'sereno.db'))
+  storage.save_slack_access_token('T1', 'xoxb')
+  storage.save_oncall('T1', 'U1')
+  response = storage.save_responders('T1', ['U2', 'C1'])
+  assert {'U2', 'C1'} == response['Attributes']['responders']
+  response = storage.remove_responders('T1', ['U2', 'C1'])
+  assert None == response['Attributes'].get('responders')
+  storage.save_zoom_data('T1', Zoom(TokenData('access', 'refresh', '2021-01-01 10:00:00')))
+  assert 'xoxb' == storage.get_slack_access_token('T1')
+  assert 'U1' == storage.get_oncall('T1')
+  assert 'refresh' == storage.get_zoom_data('T1').token_data.refresh_token
+  assert None == storage.get_jira_data('T1')
+
+def test_incidents_by_status(tmp_path):
+  storage = SqliteStorage(str(tmp_path / 'sereno.db'))
+  storage.create_incident(Incident('T1', 'C1', 'db down'))
+  storage.create_incident(Incident('T1', 'C2'))
+  storage.create_incident(Incident('T2', 'C3'))
+  assert None == storage.create_incident(Incident('T1', 'C1'))
+  storage.update_incident_status(Incident('T1', 'C1'), IncidentStatus.CLOSED)
+  assert ['C2'] == [i.incident_id for i in storage.get_ongoing_incidents('T1')]
+  assert 2 == len(storage.get_today_incidents('T1'))
+  assert 'db down' == storage.get_incident('T1', 'C1').name
+  assert None != storage.get_incident('T1', 'C1').closed_at
+  assert None == storage.update_incident_status(Incident('T1', 'C9'), IncidentStatus.CLOSED)
+
+def test_concurrent_incident_sequence(tmp_path):
+  storage = SqliteStorage(str(tmp_path / 'sereno.db'))
+  with ThreadPoolExecutor(max_workers=4) as executor:
+    sequences = list(executor.map(lambda _: storage.next_incident_sequence('T1', '2021-01-01'), range(20)))
+  assert list(range(1, 21)) == sorted(sequences)
+
+def test_idempotency_keys_expire(tmp_path):
+  storage = SqliteStorage(str(tmp_path / 'sereno.db'))
+  assert True == storage.claim_idempotency_key('event:Ev1', 60, 1000)
+  assert False == storage.claim_idempotency_key('event:Ev1', 60, 1030)
+  assert True == storage.claim_idempotency_key('event:Ev1', 60, 1061)
+  storage.release_idempotency_key('event:Ev1')
+  assert True == storage.claim_idempotency_key('event:Ev1', 60, 1062)
@@ -0,0 +1,32 @@
+# test_team_record.py
+
+from domain.team_record import TeamRecord
+
+def test_team_record_accessors():
+  team_record = TeamRecord('T1', {'teamId': 'T1', 'access_token': 'xoxb', 'apps': {'jira': {}}, 'oncall': 'U1'})
+  assert 'xoxb' == team_record.get_slack_access_token()
+  assert {'jira': {}} == team_record.get_authorized_apps()
+  assert 'U1' == team_record.get_oncall()
+  assert [] == team_record.get_responders()
+
+def test_team_record_writes_update_loaded_copy():
+  team_record = TeamRecord('T1', {'teamId': 'T1'})
+  team_record.set_slack_access_token('xoxb')
+  team_record.set_app('zoom', {'access_token': 'zoom-token'})
+  team_record.set_oncall('U2')
+  team_record.set_responders(['U1', 'C1'])
+  assert 'xoxb' == team_record.get_slack_access_token()
+  assert 'zoom-token' == team_record.get_authorized_apps()['zoom']['access_token']
+  assert 'U2' == team_record.get_oncall()
+  assert {'U1', 'C1'} == team_record.get_responders()
+  team_record.set_responders(None)
+  assert [] == team_record.get_responders()
+
+def test_team_record_open_incidents():
+  team_record = TeamRecord('T1', {'teamId': 'T1'})
+  assert False == team_record.has_open_incidents_summary()
+  team_record.set_open_incident('C1', {'name': 'db down'})
+  team_record.set_open_incident('C2', {'name': ''})
+  team_record.remove_open_incident('C1')
+  assert True == team_record.has_open_incidents_summary()
+  assert {'C2': {'name': ''}} == team_record.get_open_incidents()
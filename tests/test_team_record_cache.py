@@ -0,0 +1,32 @@
+# test_team_record_cache.py
+
+from domain.team_record import TeamRecord
+from utils.team_record_cache import TeamRecordCache
+
+class FakeClock:
+  def __init__(self):
+    self.now = 0
+
+  def __call__(self):
+    return self.now
+
+def test_team_record_is_fresh_until_ttl():
+  clock = FakeClock()
+  cache = TeamRecordCache(30, 300, clock)
+  cache.put(TeamRecord('T1', {'teamId': 'T1'}))
+  assert True == cache.is_fresh('T1')
+  clock.now = 31
+  assert False == cache.is_fresh('T1')
+  assert True == cache.can_serve_stale('T1')
+  cache.mark_validated('T1')
+  assert True == cache.is_fresh('T1')
+
+def test_team_record_stale_limit_and_invalidate():
+  clock = FakeClock()
+  cache = TeamRecordCache(30, 300, clock)
+  cache.put(TeamRecord('T1', {'teamId': 'T1'}))
+  clock.now = 301
+  assert False == cache.can_serve_stale('T1')
+  cache.invalidate('T1')
+  assert None == cache.get('T1')
+  assert False == cache.is_fresh('T1')
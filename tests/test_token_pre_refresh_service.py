@@ -0,0 +1,36 @@
+# test_token_pre_refresh_service.py
+
+import os
+os.environ.setdefault('JIRA_CLIENT_ID', 'jira-client')
+os.environ.setdefault('JIRA_REDIRECT_URL', 'http://localhost/jira')
+os.environ.setdefault('ZOOM_REDIRECT_URI', 'http://localhost/zoom')
+
+from domain.integrations.jira import Jira
+from domain.integrations.zoom import Zoom
+from domain.token_data import TokenData
+from services.oauth_services.zoom_oauth_service import ZoomOauthService
+from services.token_pre_refresh_service import TokenPreRefreshService
+from utils.date_time_utils import DateTimeUtils
+from utils.memory_storage import MemoryStorage
+from utils.storage import Storage
+
+def test_legacy_expiry_date_is_converted_to_epoch():
+  token_data = TokenData('access', 'refresh', '2021-01-01 10:00:00')
+  assert DateTimeUtils.convert_string_datetime_to_epoch('2021-01-01 10:00:00') == token_data.expiry_date
+  assert True == token_data.is_access_token_expired()
+
+def test_refreshes_only_expiring_tokens(monkeypatch):
+  now = int(DateTimeUtils.current_epoch())
+  storage = MemoryStorage()
+  Storage.set_backend(storage)
+  storage.save_zoom_data('T1', Zoom(TokenData('old', 'refresh-1', now + 60)))
+  storage.save_zoom_data('T2', Zoom(TokenData('valid', 'refresh-2', now + 3600)))
+  storage.save_jira_data('T3', Jira(TokenData('', '', None), 'account'))
+  monkeypatch.setattr(ZoomOauthService, 'refresh_access_token',
+    lambda token_data: TokenData('new', 'refresh-3', now + 3600))
+
+  result = TokenPreRefreshService.refresh_expiring_tokens(window_seconds=600, max_workers=2)
+
+  assert {'expiring': 1, 'refreshed': 1, 'failed': 0} == result
+  assert 'new' == storage.get_zoom_data('T1').token_data.access_token
+  assert 'valid' == storage.get_zoom_data('T2').token_data.access_token
@@ -0,0 +1,74 @@
+# test_token_refresh_coordinator.py
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from domain.integrations.zoom import Zoom
+from domain.token_data import TokenData
+from services.oauth_services.token_refresh_coordinator import TokenRefreshCoordinator
+from utils.memory_storage import MemoryStorage
+from utils.storage import Storage
+
+EXPIRED = '2021-01-01 10:00:00'
+NOT_EXPIRED = '2999-01-01 10:00:00'
+
+def test_single_refresh_for_concurrent_callers():
+  storage = MemoryStorage()
+  Storage.set_backend(storage)
+  storage.save_zoom_data('T1', Zoom(TokenData('old', 'refresh-1', EXPIRED)))
+  refreshes = []
+  refresh_lock = threading.Lock()
+
+  def refresh(token_data):
+    with refresh_lock:
+      refreshes.append(token_data.refresh_token)
+    return TokenData('new', 'refresh-2', NOT_EXPIRED)
+
+  def get_access_token(_):
+    return TokenRefreshCoordinator.get_access_token(
+      'T1', 'zoom', storage.get_zoom_data('T1'),
+      lambda: storage.get_zoom_data('T1', consistent_read=True),
+      refresh,
+      lambda zoom: storage.save_zoom_data('T1', zoom))
+
+  with ThreadPoolExecutor(max_workers=8) as executor:
+    tokens = list(executor.map(get_access_token, range(8)))
+  assert ['new'] * 8 == tokens
+  assert ['refresh-1'] == refreshes
+  assert 'refresh-2' == storage.get_zoom_data('T1').token_data.refresh_token
+
+def test_lease_is_exclusive_until_it_expires():
+  storage = MemoryStorage()
+  assert True == storage.acquire_refresh_lease('T1', 'jira', 'a', 30, 1000)
+  assert False == storage.acquire_refresh_lease('T1', 'jira', 'b', 30, 1010)
+  assert True == storage.acquire_refresh_lease('T1', 'jira', 'b', 30, 1031)
+  storage.release_refresh_lease('T1', 'jira', 'a')
+  assert False == storage.acquire_refresh_lease('T1', 'jira', 'c', 30, 1040)
+  storage.release_refresh_lease('T1', 'jira', 'b')
+  assert True == storage.acquire_refresh_lease('T1', 'jira', 'c', 30, 1040)
+
+def test_token_refreshed_by_another_lambda_before_the_lease_is_not_refreshed_again():
+  storage = MemoryStorage()
+  Storage.set_backend(storage)
+  storage.save_zoom_data('T1', Zoom(TokenData('old', 'refresh-1', EXPIRED)))
+  loads = []
+
+  def load():
+    zoom = storage.get_zoom_data('T1', consistent_read=True)
+    if len(loads) == 0:
+      # another lambda takes the lease, refreshes and releases it right after this read
+      assert True == storage.acquire_refresh_lease('T1', 'zoom', 'other', 30, time.time())
+      storage.save_zoom_data('T1', Zoom(TokenData('new', 'refresh-2', NOT_EXPIRED)))
+      storage.release_refresh_lease('T1', 'zoom', 'other')
+    loads.append(zoom.token_data.refresh_token)
+    return zoom
+
+  def refresh(token_data):
+    raise Exception(f'invalid_grant {token_data.refresh_token}')
+
+  zoom = storage.get_zoom_data('T1')
+  token = TokenRefreshCoordinator.get_access_token(
+    'T1', 'zoom', zoom, load, refresh, lambda zoom: storage.save_zoom_data('T1', zoom))
+  assert 'new' == token
+  assert ['refresh-1', 'refresh-2'] == loads
+  assert 'refresh-2' == zoom.token_data.refresh_token
@@ -1,36 +1,107 @@
 import os
+import threading
 import boto3
+from botocore.config import Config
 
 
 class AwsUtils:
-    """Utils class to deal with various aws actions"""
+    """
+    Utils class to deal with various aws actions.
+    Sessions, clients and resources are created once per thread and service and then reused,
+    so every request doesn't pay for resolving credentials and endpoints and for new connections.
+    boto3 sessions and resources are not thread safe, that's why they are kept per thread.
+    With retries=False calls are attempted once, for callers that retry on their own
+    (DynamoThrottle) and have to stay within their time budget
+    """
 
-    @staticmethod
-    def get_dynamodb_client():
-        IS_OFFLINE = os.environ.get("IS_OFFLINE")
+    __local = threading.local()
 
-        if IS_OFFLINE:
-            dynamo_client = boto3.client(
-                "dynamodb",
-                region_name="localhost",
-                endpoint_url="http://localhost:8000",
+    @classmethod
+    def get_client(cls, service_name, retries=True):
+        clients = cls.__get_thread_cache("clients")
+        if (service_name, retries) not in clients:
+            clients[(service_name, retries)] = cls.__get_session().client(
+                service_name,
+                config=cls.__build_config(retries),
+                **cls.__endpoint(service_name)
             )
-        else:
-            dynamo_client = boto3.client("dynamodb")
+        return clients[(service_name, retries)]
 
-        return dynamo_client
+    @classmethod
+    def get_resource(cls, service_name, retries=True):
+        resources = cls.__get_thread_cache("resources")
+        if (service_name, retries) not in resources:
+            resources[(service_name, retries)] = cls.__get_session().resource(
+                service_name,
+                config=cls.__build_config(retries),
+                **cls.__endpoint(service_name)
+            )
+        return resources[(service_name, retries)]
 
-    @staticmethod
-    def get_dynamodb_resource():
-        IS_OFFLINE = os.environ.get("IS_OFFLINE")
+    @classmethod
+    def get_dynamodb_client(cls, retries=True):
+        return cls.get_client("dynamodb", retries)
+
+    @classmethod
+    def get_dynamodb_resource(cls, retries=True):
+        return cls.get_resource("dynamodb", retries)
 
-        if IS_OFFLINE:
-            dynamo_resource = boto3.resource(
-                "dynamodb",
-                region_name="localhost",
-                endpoint_url="http://localhost:8000",
+    @classmethod
+    def get_dynamodb_table(cls, table_name, retries=True):
+        tables = cls.__get_thread_cache("tables")
+        if (table_name, retries) not in tables:
+            tables[(table_name, retries)] = cls.get_dynamodb_resource(retries).Table(
+                table_name
             )
-        else:
-            dynamo_resource = boto3.resource("dynamodb")
+        return tables[(table_name, retries)]
+
+    @classmethod
+    def __get_session(cls):
+        session = getattr(cls.__local, "session", None)
+        if session is None:
+            session = boto3.session.Session()
+            cls.__local.session = session
+        return session
+
+    @classmethod
+    def __get_thread_cache(cls, name) -> dict:
+        cache = getattr(cls.__local, name, None)
+        if cache is None:
+            cache = {}
+            setattr(cls.__local, name, cache)
+        return cache
+
+    @staticmethod
+    def __build_config(retries=True) -> Config:
+        """
+        The defaults fit the 3 seconds slack waits for an answer: at most 2 attempts of
+        0.5s to connect and 1s to read, standard retry mode adds a short backoff between them.
+        Functions that don't answer slack (queue consumer, archiver, streams) set longer
+        timeouts and more attempts with the AWS_* environment variables
+        """
+        config = {
+            "max_pool_connections": int(
+                os.environ.get("AWS_MAX_POOL_CONNECTIONS", "25")
+            ),
+            "connect_timeout": float(os.environ.get("AWS_CONNECT_TIMEOUT", "0.5")),
+            "read_timeout": float(os.environ.get("AWS_READ_TIMEOUT", "1")),
+            "retries": {
+                "mode": "standard",
+                # attempts including the first one
+                "total_max_attempts": (
+                    int(os.environ.get("AWS_MAX_ATTEMPTS", "2")) if retries else 1
+                ),
+            },
+        }
+        # tcp_keepalive is only available in newer botocore versions
+        if "tcp_keepalive" in Config.OPTION_DEFAULTS:
+            config["tcp_keepalive"] = True
+        return Config(**config)
+
+    @staticmethod
+    def __endpoint(service_name) -> dict:
+        IS_OFFLINE = os.environ.get("IS_OFFLINE")
 
-        return dynamo_resource
+        if IS_OFFLINE and service_name == "dynamodb":
+            return {"region_name": "localhost", "endpoint_url": "http://localhost:8000"}
+        return {}
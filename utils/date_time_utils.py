@@ -1,3 +1,4 @@
+import time
 import datetime as dt
 
 
@@ -9,18 +10,39 @@ class DateTimeUtils:
     datetime_format = "%Y-%m-%d %H:%M:%S"
 
     @classmethod
-    def calculate_expiration_date_from_seconds(cls, expires_in) -> str:
+    def calculate_expiration_epoch_from_seconds(cls, expires_in) -> int:
         """
-        Calculates an expiry date from an expires_in argument in seconds
+        Calculates an expiry time (epoch seconds) from an expires_in argument in seconds
         """
-        expiration_date = dt.datetime.now() + dt.timedelta(seconds=expires_in)
-        expiration_date_formatted = expiration_date.strftime(cls.datetime_format)
-        return expiration_date_formatted
+        return int(time.time()) + int(expires_in)
+
+    @classmethod
+    def current_epoch(cls) -> float:
+        return time.time()
+
+    @classmethod
+    def convert_string_datetime_to_epoch(cls, date: str) -> int:
+        """Converts a local date time string (datetime_format) to epoch seconds"""
+        return int(time.mktime(time.strptime(date, cls.datetime_format)))
 
     @classmethod
     def current_datetime_as_string(cls):
         return dt.datetime.now().strftime(cls.datetime_format)
 
+    @classmethod
+    def start_of_today_as_string(cls):
+        """Midnight of today, it sorts before any date time of today"""
+        return dt.datetime.combine(dt.date.today(), dt.time.min).strftime(
+            cls.datetime_format
+        )
+
+    @classmethod
+    def end_of_today_as_string(cls):
+        """Last second of today, it sorts after any date time of today"""
+        return dt.datetime.combine(dt.date.today(), dt.time.max).strftime(
+            cls.datetime_format
+        )
+
     @classmethod
     def current_date(cls):
         return dt.date.today()
@@ -0,0 +1,35 @@
+import json
+import logging
+from typing import List
+from utils.event_queue import EventQueues
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class DeferredWrites:
+    """
+    Writes that can wait when dynamo is throttled. They are sent to the events queue and
+    applied by the queue consumer (functions/deferred_writes.py), which retries them with backoff.
+    A deferred write only names what changed, the consumer reads the current state before writing
+    """
+
+    ROUTE = "deferred_write"
+    OPEN_INCIDENTS = "open_incidents"
+
+    @classmethod
+    def defer_open_incidents(cls, team_id, incident_ids: List[str]):
+        """The open incidents of the team are brought in line with the status of the incidents"""
+        cls.__send(
+            {"team": team_id, "write": cls.OPEN_INCIDENTS, "incident_ids": incident_ids}
+        )
+
+    @classmethod
+    def __send(cls, event: dict):
+        try:
+            EventQueues.get_queue().send_message(
+                json.dumps({"route": cls.ROUTE, "event": event})
+            )
+        except Exception as e:
+            # the incident itself is saved, only the summary of the team is behind
+            logger.error(f"could not defer {event['write']} of {event['team']} {e}")
@@ -1,282 +1,952 @@
 import os
+import math
+import time
 import logging
-from typing import List
+from typing import Iterator, List, Tuple
 from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import BotoCoreError, ClientError
 from utils.aws import AwsUtils
+from utils.dynamo_bulk import DynamoBulk
+from utils.dynamo_throttle import DynamoThrottle, ThrottledTable
+from utils.storage_backend import StorageBackend, StorageUnavailableError
+from utils.date_time_utils import DateTimeUtils
+from utils.deferred_writes import DeferredWrites
+from utils.team_record_cache import TeamRecordCache
 from domain.incident import Incident
 from domain.integrations.jira import Jira
 from domain.integrations.zoom import Zoom
-from domain.token_data import TokenData
+from domain.team_record import TeamRecord
 from domain.incident import IncidentStatus
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
-class DynamoUtils:
+class DynamoUtils(StorageBackend):
     """Utils class to handle DynamoDB operations"""
 
     USERS_TABLE = os.environ["USERS_TABLE"]
     INCIDENTS_TABLE = os.environ["INCIDENTS_TABLE"]
-    DYNAMO_RESOURCE = AwsUtils.get_dynamodb_resource()
+    # Claimed idempotency keys, expired ones are removed by the table TTL
+    IDEMPOTENCY_TABLE = os.environ.get("IDEMPOTENCY_TABLE")
+    TEAM_STATUS_INDEX = "teamStatus-started-index"
+    TEAM_STARTED_INDEX = "teamId-startedKey-index"
+    # The started index only has every incident once scripts/migrate_started_key.py has run,
+    # until then time windows are read from the status index
+    STARTED_INDEX_READY = (
+        os.environ.get("INCIDENTS_STARTED_INDEX_READY", "false").lower() == "true"
+    )
+    # Counters live in the team partition of the incidents table, next to the incidents
+    COUNTER_PREFIX = "counter#"
+    COUNTER_EXPIRY_SECONDS = 2 * 24 * 60 * 60
+    # With "stream", creating and updating incidents only writes the incident, the open incidents
+    # of the team are updated by the incidents stream consumer (functions/incident_stream.py)
+    DERIVED_WRITES_FROM_STREAM = (
+        os.environ.get("INCIDENT_DERIVED_WRITES", "transaction").lower() == "stream"
+    )
+    USERS_SCAN_SEGMENTS = int(os.environ.get("USERS_SCAN_SEGMENTS", "4"))
+    __serializer = TypeSerializer()
 
-    users_table = DYNAMO_RESOURCE.Table(USERS_TABLE)
-    incidents_table = DYNAMO_RESOURCE.Table(INCIDENTS_TABLE)
+    # Team records are kept while the container is warm. After TEAM_RECORD_CACHE_TTL seconds
+    # the version is checked before using them again. If dynamo fails, they can still be used
+    # for up to TEAM_RECORD_MAX_STALE seconds
+    __team_records = TeamRecordCache(
+        float(os.environ.get("TEAM_RECORD_CACHE_TTL", "30")),
+        float(os.environ.get("TEAM_RECORD_MAX_STALE", "300")),
+    )
+
+    # AWS resources come from AwsUtils, they are created the first time they are used
+    # and then kept per thread, so importing this module doesn't create any of them.
+    # Table operations and transactions go through DynamoThrottle, which does the retries,
+    # botocore attempts each call once
+    @classmethod
+    def get_dynamo_resource(cls):
+        return AwsUtils.get_dynamodb_resource(retries=False)
+
+    @classmethod
+    def get_users_table(cls):
+        return ThrottledTable(AwsUtils.get_dynamodb_table(cls.USERS_TABLE, retries=False))
+
+    @classmethod
+    def get_incidents_table(cls):
+        return ThrottledTable(
+            AwsUtils.get_dynamodb_table(cls.INCIDENTS_TABLE, retries=False)
+        )
+
+    @classmethod
+    def get_idempotency_table(cls):
+        return ThrottledTable(
+            AwsUtils.get_dynamodb_table(cls.IDEMPOTENCY_TABLE, retries=False)
+        )
+
+    @classmethod
+    def __transact_write_items(cls, transact_items: List[dict]):
+        return DynamoThrottle.call(
+            "transact_write_items",
+            cls.get_dynamo_resource().meta.client.transact_write_items,
+            TransactItems=transact_items,
+        )
+
+    @classmethod
+    def clear_team_records(cls):
+        """Forgets all the team records cached in this container"""
+        cls.__team_records.clear()
+
+    @classmethod
+    def get_team_record(cls, team_id, consistent_read=False) -> TeamRecord:
+        """
+        Returns the users table item for the team.
+        A cached record is used as is while it's fresh. Once the ttl is over, only the version
+        is read and the item is read again only if the version changed.
+        consistent_read always reads the whole item with a strongly consistent read
+        """
+        if consistent_read:
+            return cls.__read_team_record(team_id, consistent_read=True)
+        team_record = cls.__team_records.get(team_id)
+        if team_record is not None and cls.__team_records.is_fresh(team_id):
+            return team_record
+        try:
+            if (
+                team_record is not None
+                and cls.__get_team_version(team_id) == team_record.get_version()
+            ):
+                cls.__team_records.mark_validated(team_id)
+                return team_record
+            return cls.__read_team_record(team_id)
+        except (BotoCoreError, ClientError, StorageUnavailableError) as e:
+            if team_record is not None and cls.__team_records.can_serve_stale(team_id):
+                logger.warning(f"get_team_record serving stale record {team_id} {e}")
+                return team_record
+            raise
+
+    @classmethod
+    def __read_team_record(cls, team_id, consistent_read=False) -> TeamRecord:
+        response = cls.get_users_table().get_item(
+            Key={"teamId": team_id}, ConsistentRead=consistent_read
+        )
+        if "Item" not in response:
+            # the team didn't install the app, nothing to cache
+            return TeamRecord(team_id, {})
+        team_record = TeamRecord(team_id, response["Item"])
+        cls.__team_records.put(team_record)
+        return team_record
+
+    @classmethod
+    def __get_team_version(cls, team_id):
+        """Reads only the version attribute of the team item"""
+        response = cls.get_users_table().get_item(
+            Key={"teamId": team_id},
+            ProjectionExpression="#version",
+            ExpressionAttributeNames={"#version": "version"},
+        )
+        item = response.get("Item")
+        if item is None:
+            return None
+        return item.get("version", 0)
+
+    @classmethod
+    def __apply_team_update(cls, team_id, response: dict, apply_change):
+        """
+        Applies a change that was written to the team item to the cached record.
+        Every write bumps the version by one, if the new version is not the next one,
+        somebody else wrote the item in between and the cached record is dropped
+        """
+        team_record = cls.__team_records.get(team_id)
+        if team_record is None:
+            return
+        new_version = (response.get("Attributes") or {}).get("version")
+        if new_version is None or new_version != team_record.get_version() + 1:
+            cls.__team_records.invalidate(team_id)
+            return
+        apply_change(team_record)
+        team_record.set_version(new_version)
+
+    @classmethod
+    def __apply_transacted_team_update(cls, team_id, apply_change):
+        """
+        Transactions don't return the new version, the cached record takes the next one.
+        If somebody else wrote in between, the version check will not match and the record is read again
+        """
+        team_record = cls.__team_records.get(team_id)
+        if team_record is None:
+            return
+        apply_change(team_record)
+        team_record.set_version(team_record.get_version() + 1)
 
     @classmethod
     def save_jira_data(cls, team_id, jira: Jira):
-        response = cls.users_table.update_item(
+        new_app = {
+            "id": jira.account_id,
+            "access_token": jira.token_data.access_token,
+            "refresh_token": jira.token_data.refresh_token,
+            "expiry_date": jira.token_data.expiry_date,
+        }
+        response = cls.get_users_table().update_item(
             Key={
                 "teamId": team_id,
             },
-            UpdateExpression="set apps.jira = :new_app",
-            ExpressionAttributeValues={
-                ":new_app": {
-                    "id": jira.account_id,
-                    "access_token": jira.token_data.access_token,
-                    "refresh_token": jira.token_data.refresh_token,
-                    "expiry_date": jira.token_data.expiry_date,
-                }
-            },
+            UpdateExpression="set apps.jira = :new_app ADD #version :one",
+            ExpressionAttributeValues={":new_app": new_app, ":one": 1},
+            ExpressionAttributeNames={"#version": "version"},
+            ReturnValues="UPDATED_NEW",
+        )
+        cls.__apply_team_update(
+            team_id, response, lambda team_record: team_record.set_app("jira", new_app)
         )
         return response
 
     @classmethod
     def save_zoom_data(cls, team_id, zoom: Zoom):
-        response = cls.users_table.update_item(
+        new_app = {
+            "access_token": zoom.token_data.access_token,
+            "refresh_token": zoom.token_data.refresh_token,
+            "expiry_date": zoom.token_data.expiry_date,
+        }
+        response = cls.get_users_table().update_item(
             Key={
                 "teamId": team_id,
             },
-            UpdateExpression="set apps.zoom = :new_app",
-            ExpressionAttributeValues={
-                ":new_app": {
-                    "access_token": zoom.token_data.access_token,
-                    "refresh_token": zoom.token_data.refresh_token,
-                    "expiry_date": zoom.token_data.expiry_date,
-                }
-            },
+            UpdateExpression="set apps.zoom = :new_app ADD #version :one",
+            ExpressionAttributeValues={":new_app": new_app, ":one": 1},
+            ExpressionAttributeNames={"#version": "version"},
+            ReturnValues="UPDATED_NEW",
+        )
+        cls.__apply_team_update(
+            team_id, response, lambda team_record: team_record.set_app("zoom", new_app)
         )
         return response
 
+    @classmethod
+    def iter_authorized_apps(cls) -> Iterator[Tuple[str, dict]]:
+        for item in DynamoBulk.parallel_scan(
+            cls.USERS_TABLE,
+            total_segments=cls.USERS_SCAN_SEGMENTS,
+            ProjectionExpression="#team_id, #apps",
+            ExpressionAttributeNames={"#team_id": "teamId", "#apps": "apps"},
+        ):
+            if item.get("apps"):
+                yield item["teamId"], item["apps"]
+
+    @classmethod
+    def acquire_refresh_lease(
+        cls, team_id, app_name, owner, lease_seconds, now: float
+    ) -> bool:
+        """
+        Conditional write of the lease on the team item, it only succeeds if there is no lease
+        or the current one expired. The version is not bumped, the lease is not part of the cached record
+        """
+        try:
+            cls.get_users_table().update_item(
+                Key={"teamId": team_id},
+                UpdateExpression="SET #lease = :lease",
+                ConditionExpression="attribute_exists(teamId) AND "
+                "(attribute_not_exists(#lease) OR #lease.expires_at < :now)",
+                ExpressionAttributeNames={"#lease": cls.__lease_attribute(app_name)},
+                ExpressionAttributeValues={
+                    ":lease": {
+                        "owner": owner,
+                        "expires_at": int(math.ceil(now + lease_seconds)),
+                    },
+                    ":now": int(now),
+                },
+            )
+            return True
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False
+            raise
+
+    @classmethod
+    def release_idempotency_key(cls, key):
+        cls.get_idempotency_table().delete_item(Key={"idempotencyKey": key})
+
+    @classmethod
+    def release_refresh_lease(cls, team_id, app_name, owner):
+        try:
+            cls.get_users_table().update_item(
+                Key={"teamId": team_id},
+                UpdateExpression="REMOVE #lease",
+                ConditionExpression="#lease.#owner = :owner",
+                ExpressionAttributeNames={
+                    "#lease": cls.__lease_attribute(app_name),
+                    "#owner": "owner",
+                },
+                ExpressionAttributeValues={":owner": owner},
+            )
+        except ClientError as e:
+            # the lease expired and somebody else took it, nothing to release
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+
+    @classmethod
+    def claim_idempotency_key(cls, key, ttl_seconds, now: float) -> bool:
+        """
+        Conditional put of the key. TTL deletes expired items some time after they expire,
+        so an item that is still there but expired can be claimed again
+        """
+        try:
+            cls.get_idempotency_table().put_item(
+                Item={
+                    "idempotencyKey": key,
+                    "expires_at": int(math.ceil(now + ttl_seconds)),
+                },
+                ConditionExpression="attribute_not_exists(idempotencyKey) OR expires_at < :now",
+                ExpressionAttributeValues={":now": int(now)},
+            )
+            return True
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False
+            raise
+
+    @staticmethod
+    def __lease_attribute(app_name) -> str:
+        return f"{app_name}_refresh_lease"
+
     @classmethod
     def save_slack_access_token(cls, team_id, access_token):
-        response = cls.users_table.update_item(
+        response = cls.get_users_table().update_item(
             Key={
                 "teamId": team_id,
             },
-            UpdateExpression="SET access_token=:access_token, apps=if_not_exists(apps, :apps)",
-            ExpressionAttributeValues={":access_token": access_token, ":apps": {}},
+            UpdateExpression="SET access_token=:access_token, apps=if_not_exists(apps, :apps), "
+            "open_incidents=if_not_exists(open_incidents, :open_incidents) ADD #version :one",
+            ExpressionAttributeValues={
+                ":access_token": access_token,
+                ":apps": {},
+                ":open_incidents": {},
+                ":one": 1,
+            },
+            ExpressionAttributeNames={"#version": "version"},
+            ReturnValues="UPDATED_NEW",
+        )
+        cls.__apply_team_update(
+            team_id,
+            response,
+            lambda team_record: team_record.set_slack_access_token(access_token),
         )
         return response
 
     @classmethod
     def save_responders(cls, team_id, responders):
-        response = cls.users_table.update_item(
+        response = cls.get_users_table().update_item(
             Key={
                 "teamId": team_id,
             },
-            UpdateExpression="ADD responders :responders",
-            ExpressionAttributeValues={":responders": set(responders)},
+            UpdateExpression="ADD responders :responders, #version :one",
+            ExpressionAttributeValues={":responders": set(responders), ":one": 1},
+            ExpressionAttributeNames={"#version": "version"},
             ReturnValues="UPDATED_NEW",
         )
+        cls.__apply_team_update(team_id, response, cls.__responders_updater(response))
         return response
 
     @classmethod
     def save_oncall(cls, team_id, user_id):
-        response = cls.users_table.update_item(
+        response = cls.get_users_table().update_item(
             Key={
                 "teamId": team_id,
             },
-            UpdateExpression="SET oncall=:oncall",
-            ExpressionAttributeValues={":oncall": user_id},
+            UpdateExpression="SET oncall=:oncall ADD #version :one",
+            ExpressionAttributeValues={":oncall": user_id, ":one": 1},
+            ExpressionAttributeNames={"#version": "version"},
+            ReturnValues="UPDATED_NEW",
+        )
+        cls.__apply_team_update(
+            team_id, response, lambda team_record: team_record.set_oncall(user_id)
         )
         return response
 
     @classmethod
     def get_oncall(cls, team_id):
         try:
-            response = cls.users_table.get_item(Key={"teamId": team_id})
-            item = response["Item"]
-            return item.get("oncall")
+            return cls.get_team_record(team_id).get_oncall()
         except Exception as e:
             logger.error(f"Get_oncall {team_id} {e}")
-            return "there was an error"
+            raise
 
     @classmethod
     def remove_responders(cls, team_id, responders):
-        response = cls.users_table.update_item(
+        response = cls.get_users_table().update_item(
             Key={
                 "teamId": team_id,
             },
-            UpdateExpression="DELETE responders :responders",
-            ExpressionAttributeValues={":responders": set(responders)},
+            UpdateExpression="DELETE responders :responders ADD #version :one",
+            ExpressionAttributeValues={":responders": set(responders), ":one": 1},
+            ExpressionAttributeNames={"#version": "version"},
             ReturnValues="UPDATED_NEW",
         )
+        cls.__apply_team_update(team_id, response, cls.__responders_updater(response))
         return response
 
+    @classmethod
+    def __responders_updater(cls, response: dict):
+        """Returns a change that sets in a team record the responders returned by an update"""
+        attributes = response.get("Attributes") or {}
+        return lambda team_record: team_record.set_responders(
+            attributes.get("responders")
+        )
+
     @classmethod
     def create_incident(cls, incident: Incident):
-        response = cls.incidents_table.put_item(
-            Item={
-                "teamId": incident.team_id,
-                "name": incident.name,
-                "incidentId": incident.incident_id,
-                "callLink": incident.call.get_link()
-                if incident.call is not None
-                else "",
-                "ticketLink": incident.ticket.get_link()
-                if incident.ticket is not None
-                else "",
-                "status": incident.status.name,
-                "started_datetime": incident.started_datetime,
-            }
+        """
+        Saves the incident and adds it to the open incidents of the team in one transaction.
+        When derived writes come from the stream, only the incident is saved.
+        If the transaction is throttled, the incident is saved alone and the open incidents
+        update is deferred. Returns None if there is already an incident for the channel
+        """
+        if cls.DERIVED_WRITES_FROM_STREAM:
+            return cls.__put_incident(incident)
+        incident_summary = cls.__build_incident_summary(incident)
+        try:
+            cls.__ensure_open_incidents_summary(incident.team_id)
+            response = cls.__transact_write_items(
+                [
+                    {
+                        "Put": {
+                            "TableName": cls.INCIDENTS_TABLE,
+                            "Item": cls.__serialize(
+                                cls.__build_incident_item(incident, incident_summary)
+                            ),
+                            "ConditionExpression": "attribute_not_exists(incidentId)",
+                        }
+                    },
+                    {
+                        "Update": {
+                            "TableName": cls.USERS_TABLE,
+                            "Key": cls.__serialize({"teamId": incident.team_id}),
+                            "UpdateExpression": "SET open_incidents.#incident_id=:summary ADD #version :one",
+                            "ExpressionAttributeNames": {
+                                "#incident_id": incident.incident_id,
+                                "#version": "version",
+                            },
+                            "ExpressionAttributeValues": cls.__serialize(
+                                {":summary": incident_summary, ":one": 1}
+                            ),
+                        }
+                    },
+                ]
+            )
+        except StorageUnavailableError as e:
+            logger.warning(f"deferring open incidents of {incident.team_id} {e}")
+            response = cls.__put_incident(incident)
+            if response is not None:
+                DeferredWrites.defer_open_incidents(
+                    incident.team_id, [incident.incident_id]
+                )
+            return response
+        except cls.get_dynamo_resource().meta.client.exceptions.TransactionCanceledException as e:
+            reasons = e.response.get("CancellationReasons", [])
+            if len(reasons) > 0 and reasons[0].get("Code") == "ConditionalCheckFailed":
+                logger.error(
+                    f"incident already exists {incident.team_id} {incident.incident_id}"
+                )
+                return None
+            raise
+        cls.__apply_transacted_team_update(
+            incident.team_id,
+            lambda team_record: team_record.set_open_incident(
+                incident.incident_id, incident_summary
+            ),
         )
         return response
 
+    @classmethod
+    def __put_incident(cls, incident: Incident):
+        try:
+            return cls.get_incidents_table().put_item(
+                Item=cls.__build_incident_item(
+                    incident, cls.__build_incident_summary(incident)
+                ),
+                ConditionExpression="attribute_not_exists(incidentId)",
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            logger.error(
+                f"incident already exists {incident.team_id} {incident.incident_id}"
+            )
+            return None
+
+    @classmethod
+    def __build_incident_item(cls, incident: Incident, incident_summary: dict) -> dict:
+        return {
+            "teamId": incident.team_id,
+            "incidentId": incident.incident_id,
+            "status": incident.status.name,
+            "teamStatus": cls.build_team_status(incident.team_id, incident.status),
+            "startedKey": cls.build_started_key(
+                incident.started_datetime, incident.incident_id
+            ),
+            **incident_summary,
+        }
+
+    @classmethod
+    def __build_incident_summary(cls, incident: Incident) -> dict:
+        """Attributes of the incident kept in the open incidents of the team"""
+        return {
+            "name": incident.name,
+            "callLink": incident.call.get_link() if incident.call is not None else "",
+            "ticketLink": (
+                incident.ticket.get_link() if incident.ticket is not None else ""
+            ),
+            "started_datetime": incident.started_datetime,
+        }
+
+    @classmethod
+    def __ensure_open_incidents_summary(cls, team_id):
+        """
+        Open incidents are saved in a map of the team item, the map has to exist before adding entries to it.
+        Teams created before the map existed get one built from the ongoing incidents in the status index.
+        Nothing is written for a team without an item, the update would create a partial one
+        """
+        if cls.get_team_record(team_id).has_open_incidents_summary():
+            return
+        ongoing_incidents = cls.__query_incidents_by_status(
+            team_id, IncidentStatus.ONGOING
+        )
+        open_incidents = {
+            incident.incident_id: cls.__build_incident_summary(incident)
+            for incident in ongoing_incidents
+        }
+        try:
+            response = cls.get_users_table().update_item(
+                Key={"teamId": team_id},
+                UpdateExpression="SET open_incidents=if_not_exists(open_incidents, :open_incidents) ADD #version :one",
+                ConditionExpression="attribute_exists(teamId)",
+                ExpressionAttributeValues={
+                    ":open_incidents": open_incidents,
+                    ":one": 1,
+                },
+                ExpressionAttributeNames={"#version": "version"},
+                ReturnValues="UPDATED_NEW",
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            logger.warning(f"no team item to keep the open incidents of {team_id}")
+            return
+        cls.__apply_team_update(
+            team_id,
+            response,
+            lambda team_record: team_record.set_open_incidents(
+                response["Attributes"].get("open_incidents", {})
+            ),
+        )
+
+    @classmethod
+    def __serialize(cls, values: dict) -> dict:
+        """Converts values to the dynamo format used by the low level client"""
+        return {key: cls.__serializer.serialize(value) for key, value in values.items()}
+
     @classmethod
     def update_incident_status(
         cls, incident: Incident, incident_status: IncidentStatus
     ):
-        try:
-            response = cls.incidents_table.update_item(
-                Key={"teamId": incident.team_id, "incidentId": incident.incident_id},
-                UpdateExpression="SET #st=:incident_status",
-                ConditionExpression="attribute_exists(teamId) and attribute_exists(incidentId)",
-                ExpressionAttributeValues={":incident_status": incident_status.name},
-                ExpressionAttributeNames={"#st": "status"},
+        """
+        Updates the incident status. An incident that is no longer ongoing is removed
+        from the open incidents of the team in the same transaction.
+        Closing sets closed_at, the archiver moves incidents closed long ago to the archive table.
+        When derived writes come from the stream, only the incident is updated.
+        If the transaction is throttled, the incident is updated alone and the open incidents
+        update is deferred
+        """
+        update_values = {
+            ":incident_status": incident_status.name,
+            ":team_status": cls.build_team_status(incident.team_id, incident_status),
+        }
+        if incident_status == IncidentStatus.CLOSED:
+            update_expression = "SET #st=:incident_status, teamStatus=:team_status, closed_at=:closed_at"
+            update_values[":closed_at"] = DateTimeUtils.current_datetime_as_string()
+        else:
+            update_expression = (
+                "SET #st=:incident_status, teamStatus=:team_status REMOVE closed_at"
+            )
+        incident_key = {"teamId": incident.team_id, "incidentId": incident.incident_id}
+        condition = "attribute_exists(teamId) and attribute_exists(incidentId)"
+
+        def update_incident():
+            try:
+                return cls.get_incidents_table().update_item(
+                    Key=incident_key,
+                    UpdateExpression=update_expression,
+                    ConditionExpression=condition,
+                    ExpressionAttributeValues=update_values,
+                    ExpressionAttributeNames={"#st": "status"},
+                )
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+                logger.error(
+                    f"trying to close a non existent incident {incident.team_id}"
+                )
+                return None
+
+        if cls.DERIVED_WRITES_FROM_STREAM:
+            return update_incident()
+        incident_update = {
+            "TableName": cls.INCIDENTS_TABLE,
+            "Key": cls.__serialize(incident_key),
+            "UpdateExpression": update_expression,
+            "ConditionExpression": condition,
+            "ExpressionAttributeValues": cls.__serialize(update_values),
+            "ExpressionAttributeNames": {"#st": "status"},
+        }
+        transact_items = [{"Update": incident_update}]
+        if incident_status != IncidentStatus.ONGOING:
+            transact_items.append(
+                {
+                    "Update": {
+                        "TableName": cls.USERS_TABLE,
+                        "Key": cls.__serialize({"teamId": incident.team_id}),
+                        "UpdateExpression": "REMOVE open_incidents.#incident_id ADD #version :one",
+                        "ExpressionAttributeNames": {
+                            "#incident_id": incident.incident_id,
+                            "#version": "version",
+                        },
+                        "ExpressionAttributeValues": cls.__serialize({":one": 1}),
+                    }
+                }
             )
+        try:
+            if incident_status != IncidentStatus.ONGOING:
+                cls.__ensure_open_incidents_summary(incident.team_id)
+            response = cls.__transact_write_items(transact_items)
+        except StorageUnavailableError as e:
+            if incident_status == IncidentStatus.ONGOING:
+                raise
+            logger.warning(f"deferring open incidents of {incident.team_id} {e}")
+            response = update_incident()
+            if response is not None:
+                DeferredWrites.defer_open_incidents(
+                    incident.team_id, [incident.incident_id]
+                )
             return response
-        except cls.DYNAMO_RESOURCE.meta.client.exceptions.ConditionalCheckFailedException as e:
-            logger.error(f"trying to close a non existent incident {incident.team_id}")
-            return None
+        except cls.get_dynamo_resource().meta.client.exceptions.TransactionCanceledException as e:
+            reasons = e.response.get("CancellationReasons", [])
+            if len(reasons) > 0 and reasons[0].get("Code") == "ConditionalCheckFailed":
+                logger.error(
+                    f"trying to close a non existent incident {incident.team_id}"
+                )
+                return None
+            raise
+        if incident_status != IncidentStatus.ONGOING:
+            cls.__apply_transacted_team_update(
+                incident.team_id,
+                lambda team_record: team_record.remove_open_incident(
+                    incident.incident_id
+                ),
+            )
+        return response
 
     @classmethod
-    def get_incident(cls, team_id: str, incident_id: str) -> Incident:
-        response = cls.incidents_table.query(
-            KeyConditionExpression="teamId = :teamId and incidentId = :incidentId",
-            ExpressionAttributeValues={":teamId": team_id, ":incidentId": incident_id},
+    def get_incident(
+        cls, team_id: str, incident_id: str, consistent_read=False
+    ) -> Incident:
+        """
+        Returns the incident with a single GetItem.
+        consistent_read makes sure a write made just before is seen
+        """
+        response = cls.get_incidents_table().get_item(
+            Key={"teamId": team_id, "incidentId": incident_id},
+            ConsistentRead=consistent_read,
         )
-        items = response["Items"]
-        if len(items) == 1:
-            incident_item = items[0]
-            incident = Incident(team_id, incident_id, incident_item.get("name"))
-            zoom = Zoom(None)
-            zoom.link = incident_item.get("callLink")
-            incident.set_call(zoom)
-            jira = Jira(None, "")
-            jira.link = incident_item.get("ticketLink")
-            incident.set_ticket(jira)
-            incident.started_datetime = incident_item.get("started_datetime")
-            return incident
-        else:
+        incident_item = response.get("Item")
+        if incident_item is None:
             return None
+        return cls.build_incident(incident_item)
+
+    @classmethod
+    def iter_incidents(
+        cls,
+        key_condition,
+        index_name=None,
+        filter_condition=None,
+        attributes: List[str] = None,
+        max_results=None,
+        page_size=None,
+    ) -> Iterator[Incident]:
+        """
+        Yields the incidents matching key_condition, one page at a time, following LastEvaluatedKey.
+        Parameters:
+            key_condition: boto3 Key condition, e.g. Key("teamId").eq(team_id)
+            index_name: index to query instead of the table
+            filter_condition: boto3 Attr condition applied by dynamo before returning the items
+            attributes: when set, only these attributes are read
+            max_results: stops querying once this many incidents have been yielded
+            page_size: max number of items evaluated by each query
+        The next page is only queried when the caller asks for more incidents,
+        so breaking out of the loop stops reading the partition.
+        """
+        query_kwargs = {"KeyConditionExpression": key_condition}
+        if index_name is not None:
+            query_kwargs["IndexName"] = index_name
+        if filter_condition is not None:
+            query_kwargs["FilterExpression"] = filter_condition
+        if attributes:
+            placeholders = {f"#p{i}": name for i, name in enumerate(attributes)}
+            query_kwargs["ProjectionExpression"] = ", ".join(placeholders)
+            query_kwargs["ExpressionAttributeNames"] = placeholders
+        if page_size is not None:
+            query_kwargs["Limit"] = page_size
+
+        yielded = 0
+        while True:
+            response = cls.get_incidents_table().query(**query_kwargs)
+            for item in response["Items"]:
+                if cls.is_counter_item(item):
+                    continue
+                yield cls.build_incident(item)
+                yielded += 1
+                if max_results is not None and yielded >= max_results:
+                    return
+            if "LastEvaluatedKey" not in response:
+                return
+            query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    @classmethod
+    def iter_team_incidents(
+        cls, team_id, filter_condition=None, max_results=None
+    ) -> Iterator[Incident]:
+        """Yields every incident of the team, see iter_incidents"""
+        return cls.iter_incidents(
+            Key("teamId").eq(team_id),
+            filter_condition=filter_condition,
+            max_results=max_results,
+        )
+
+    @classmethod
+    def next_incident_sequence(cls, team_id, day: str) -> int:
+        """
+        Atomically increases the team counter for the given day and returns the new value.
+        Concurrent callers always get different numbers. Counters expire after a couple of days
+        """
+        response = cls.get_incidents_table().update_item(
+            Key=cls.__counter_key(team_id, day),
+            UpdateExpression="ADD #sequence :one SET expires_at=if_not_exists(expires_at, :expires_at)",
+            ExpressionAttributeNames={"#sequence": "sequence"},
+            ExpressionAttributeValues={
+                ":one": 1,
+                ":expires_at": cls.__counter_expiry(),
+            },
+            ReturnValues="UPDATED_NEW",
+        )
+        return int(response["Attributes"]["sequence"])
+
+    @classmethod
+    def update_open_incidents(
+        cls, team_id, opened: List[Incident], closed_ids: List[str]
+    ):
+        """
+        Adds the opened incidents to the open incidents of the team and removes the closed ones
+        in a single update. Both are idempotent, applying the same changes again is harmless.
+        An incident can't be in both lists
+        """
+        if len(opened) == 0 and len(closed_ids) == 0:
+            return
+        cls.__ensure_open_incidents_summary(team_id)
+        summaries = {
+            incident.incident_id: cls.__build_incident_summary(incident)
+            for incident in opened
+        }
+        attribute_names = {"#version": "version"}
+        attribute_values = {":one": 1}
+        set_actions = []
+        for i, (incident_id, summary) in enumerate(summaries.items()):
+            attribute_names[f"#opened{i}"] = incident_id
+            attribute_values[f":opened{i}"] = summary
+            set_actions.append(f"open_incidents.#opened{i}=:opened{i}")
+        remove_actions = []
+        for i, incident_id in enumerate(closed_ids):
+            attribute_names[f"#closed{i}"] = incident_id
+            remove_actions.append(f"open_incidents.#closed{i}")
+        update_expression = "ADD #version :one"
+        if len(set_actions) > 0:
+            update_expression += " SET " + ", ".join(set_actions)
+        if len(remove_actions) > 0:
+            update_expression += " REMOVE " + ", ".join(remove_actions)
+
+        def apply_change(team_record: TeamRecord):
+            for incident_id, summary in summaries.items():
+                team_record.set_open_incident(incident_id, summary)
+            for incident_id in closed_ids:
+                team_record.remove_open_incident(incident_id)
+
+        response = cls.get_users_table().update_item(
+            Key={"teamId": team_id},
+            UpdateExpression=update_expression,
+            ExpressionAttributeNames=attribute_names,
+            ExpressionAttributeValues=attribute_values,
+            ReturnValues="UPDATED_NEW",
+        )
+        cls.__apply_team_update(team_id, response, apply_change)
+
+    @classmethod
+    def __counter_key(cls, team_id, day: str) -> dict:
+        """
+        Key of the team counters for the given day. The counter item has a sequence attribute
+        to number channels
+        """
+        return {"teamId": team_id, "incidentId": f"{cls.COUNTER_PREFIX}{day}"}
+
+    @classmethod
+    def __counter_expiry(cls) -> int:
+        return int(time.time()) + cls.COUNTER_EXPIRY_SECONDS
+
+    @classmethod
+    def is_counter_item(cls, item: dict) -> bool:
+        return item.get("incidentId", "").startswith(cls.COUNTER_PREFIX)
 
     @classmethod
     def get_ongoing_incidents(cls, team_id) -> List[Incident]:
-        try:
-            response = cls.incidents_table.query(
-                KeyConditionExpression=Key("teamId").eq(team_id)
+        """
+        Returns the ongoing incidents from the open incidents kept in the team item,
+        so it costs at most one GetItem
+        """
+        cls.__ensure_open_incidents_summary(team_id)
+        open_incidents = cls.get_team_record(team_id).get_open_incidents()
+        return [
+            cls.build_incident(
+                {
+                    **incident_summary,
+                    "teamId": team_id,
+                    "incidentId": incident_id,
+                    "status": IncidentStatus.ONGOING.name,
+                }
             )
-            incidents = response["Items"]
-            ongoing_incidents = cls.__filter_ongoing_incidents(incidents)
-            return ongoing_incidents
-        except Exception as e:
-            logger.error(f"get_ongoing_incidents {team_id} {e}")
-            return []
+            for incident_id, incident_summary in open_incidents.items()
+        ]
 
     @classmethod
     def get_today_incidents(cls, team_id) -> List[Incident]:
-        try:
-            response = cls.incidents_table.query(
-                KeyConditionExpression=Key("teamId").eq(team_id)
-            )
-            incidents = response["Items"]
-            today_incidents = cls.__filter_today_incidents(incidents)
-            return today_incidents
-        except Exception as e:
-            logger.error(f"get_today_incidents {team_id} {e}")
-            return []
+        """Returns the incidents started today, in any status, reading only rows since midnight"""
+        return cls.get_incidents_started_between(
+            team_id,
+            DateTimeUtils.start_of_today_as_string(),
+            DateTimeUtils.end_of_today_as_string(),
+        )
 
     @classmethod
-    def __filter_ongoing_incidents(cls, incidents: List) -> List:
-        ongoing_incidents = []
-        for incident_dict in incidents:
-            if incident_dict.get("status") == IncidentStatus.ONGOING.name:
-                incident = Incident.build_from_dict(incident_dict)
-                ongoing_incidents.append(incident)
-        return ongoing_incidents
+    def get_incidents_started_between(
+        cls, team_id, started_from: str, started_to: str
+    ) -> List[Incident]:
+        """
+        Returns the incidents started between the two date times (inclusive), sorted by start.
+        It is a single range query on the started index, it reads only the incidents in the window
+        """
+        if not cls.STARTED_INDEX_READY:
+            incidents = []
+            for incident_status in IncidentStatus:
+                incidents.extend(
+                    cls.__query_incidents_by_status(
+                        team_id, incident_status, started_from, started_to
+                    )
+                )
+            return sorted(incidents, key=lambda incident: incident.started_datetime)
+        # keys are "<started_datetime>#<incident id>", "~" sorts after "#" and after any id
+        key_condition = Key("teamId").eq(team_id) & Key("startedKey").between(
+            started_from, f"{started_to}~"
+        )
+        return list(
+            cls.iter_incidents(key_condition, index_name=cls.TEAM_STARTED_INDEX)
+        )
+
+    @classmethod
+    def __query_incidents_by_status(
+        cls,
+        team_id,
+        incident_status: IncidentStatus,
+        started_from=None,
+        started_to=None,
+    ) -> List[Incident]:
+        """
+        Queries the status index. Rows are sorted by started_datetime, so started_from
+        and started_to read only the incidents started in that window
+        """
+        key_condition = Key("teamStatus").eq(
+            cls.build_team_status(team_id, incident_status)
+        )
+        if started_from is not None and started_to is not None:
+            key_condition = key_condition & Key("started_datetime").between(
+                started_from, started_to
+            )
+        elif started_from is not None:
+            key_condition = key_condition & Key("started_datetime").gte(started_from)
+        return list(cls.iter_incidents(key_condition, index_name=cls.TEAM_STATUS_INDEX))
+
+    @staticmethod
+    def build_started_key(started_datetime, incident_id) -> str:
+        """
+        Sort key of the started index. The date time goes first so key ranges are time windows,
+        the incident id keeps keys of incidents started in the same second apart
+        """
+        return f"{started_datetime}#{incident_id}"
+
+    @staticmethod
+    def build_team_status(team_id, incident_status: IncidentStatus) -> str:
+        """Partition key of the status index, it groups the incidents of a team by status"""
+        return f"{team_id}#{incident_status.name}"
 
     @classmethod
-    def __filter_today_incidents(cls, incidents: List) -> List:
-        today_incidents = []
-        for incident_dict in incidents:
-            incident = Incident.build_from_dict(incident_dict)
-            if incident.is_from_today():
-                today_incidents.append(incident)
-        return today_incidents
+    def backfill_team_status(cls) -> int:
+        """
+        Sets the status index key on incidents created before the index existed.
+        It has to be run once after deploying the index, returns the number of updated incidents
+        """
+        updated = 0
+        for item in DynamoBulk.parallel_scan(
+            cls.INCIDENTS_TABLE,
+            FilterExpression="attribute_not_exists(teamStatus) and attribute_exists(#st)",
+            ProjectionExpression="teamId, incidentId, #st",
+            ExpressionAttributeNames={"#st": "status"},
+        ):
+            cls.get_incidents_table().update_item(
+                Key={"teamId": item["teamId"], "incidentId": item["incidentId"]},
+                UpdateExpression="SET teamStatus=:team_status",
+                ExpressionAttributeValues={
+                    ":team_status": f"{item['teamId']}#{item.get('status')}"
+                },
+            )
+            updated += 1
+        return updated
 
     @classmethod
-    def get_authorized_apps(cls, team_id):
+    def get_authorized_apps(cls, team_id, consistent_read=False):
         try:
-            response = cls.users_table.get_item(Key={"teamId": team_id})
-            item = response["Item"]
-            apps = item["apps"]
-            return apps
+            return cls.get_team_record(
+                team_id, consistent_read=consistent_read
+            ).get_authorized_apps()
         except Exception as e:
             logger.error(f"get_authorized_apps {team_id} {e}")
-            return "there was an error"
+            raise
 
     @classmethod
     def get_slack_access_token(cls, team_id):
         try:
-            response = cls.users_table.get_item(Key={"teamId": team_id})
-            item = response["Item"]
-            return item.get("access_token")
+            return cls.get_team_record(team_id).get_slack_access_token()
         except Exception as e:
             logger.error(f"get_slack_access_token {team_id} {e}")
-            return "there was an error"
+            raise
 
     @classmethod
-    def get_zoom_data(cls, team_id) -> Zoom:
-        try:
-            apps: dict = cls.get_authorized_apps(team_id)
-            zoom_dict: dict = apps["zoom"]
-            token_data = TokenData(
-                zoom_dict.get("access_token"),
-                zoom_dict.get("refresh_token"),
-                zoom_dict.get("expiry_date"),
-            )
-            zoom = Zoom(token_data)
-            return zoom
-        except Exception as e:
-            logger.error(f"Get_zoom_data {team_id} {e}")
+    def get_zoom_data(cls, team_id, consistent_read=False) -> Zoom:
+        apps: dict = cls.get_authorized_apps(team_id, consistent_read=consistent_read)
+        if "zoom" not in apps:
             return None
+        return cls.build_zoom(apps["zoom"])
 
     @classmethod
-    def get_jira_data(cls, team_id) -> Jira:
-        try:
-            apps: dict = cls.get_authorized_apps(team_id)
-            jira_dict: dict = apps["jira"]
-            token_data = TokenData(
-                jira_dict.get("access_token"),
-                jira_dict.get("refresh_token"),
-                jira_dict.get("expiry_date"),
-            )
-            account_id = jira_dict.get("id")
-            jira = Jira(token_data, account_id)
-            return jira
-        except Exception as e:
-            logger.error(f"Get_jira_token_data {team_id} {e}")
+    def get_jira_data(cls, team_id, consistent_read=False) -> Jira:
+        apps: dict = cls.get_authorized_apps(team_id, consistent_read=consistent_read)
+        if "jira" not in apps:
             return None
+        return cls.build_jira(apps["jira"])
 
     @classmethod
     def get_responders(cls, team_id):
         try:
-            response = cls.users_table.get_item(Key={"teamId": team_id})
-            item = response["Item"]
-            if "responders" not in item:
-                return []
-            return item["responders"]
+            return cls.get_team_record(team_id).get_responders()
         except Exception as e:
             logger.error(f"Get_responders {team_id} {e}")
-            return []
+            raise
@@ -0,0 +1,393 @@
+import os
+import json
+import time
+import random
+import logging
+import queue
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from utils.aws import AwsUtils
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class DynamoBulk:
+    """
+    Bulk operations for migrations, backfills and reports over a whole table.
+    Scans run one worker per segment. Batch reads and writes are split in chunks of the API limits
+    and the keys or items dynamo leaves unprocessed (throttling) are retried with backoff
+    """
+
+    # set by bulk imports on the items they write, so stream consumers can tell them apart
+    IMPORTED_AT = "imported_at"
+    SCAN_SEGMENTS = int(os.environ.get("DYNAMO_SCAN_SEGMENTS", "4"))
+    SCAN_QUEUED_PAGES = 2
+    # put in the queue of a parallel scan by a segment that read all its pages
+    __SEGMENT_DONE = object()
+    BATCH_GET_LIMIT = 100
+    BATCH_WRITE_LIMIT = 25
+    MAX_ATTEMPTS = int(os.environ.get("DYNAMO_BATCH_MAX_ATTEMPTS", "8"))
+    BASE_BACKOFF_SECONDS = 0.05
+    MAX_BACKOFF_SECONDS = 5
+
+    @classmethod
+    def parallel_scan(
+        cls, table_name, total_segments=None, **scan_kwargs
+    ) -> Iterator[dict]:
+        """
+        Scans the table with one worker per segment, each one reads its own segment page by page.
+        Pages go through a bounded queue and their items are yielded as they arrive, in no particular
+        order, so at most SCAN_QUEUED_PAGES pages per segment are held in memory
+        """
+        total_segments = total_segments or cls.SCAN_SEGMENTS
+        pages = queue.Queue(maxsize=total_segments * cls.SCAN_QUEUED_PAGES)
+        stopped = threading.Event()
+        with ThreadPoolExecutor(max_workers=total_segments) as executor:
+            for segment in range(total_segments):
+                executor.submit(
+                    cls.__scan_segment,
+                    table_name,
+                    segment,
+                    total_segments,
+                    scan_kwargs,
+                    pages,
+                    stopped,
+                )
+            try:
+                finished = 0
+                while finished < total_segments:
+                    page = pages.get()
+                    if page is cls.__SEGMENT_DONE:
+                        finished += 1
+                    elif isinstance(page, Exception):
+                        raise page
+                    else:
+                        yield from page
+            finally:
+                # the caller may stop early, workers waiting on a full queue give up
+                stopped.set()
+
+    @classmethod
+    def parallel_process(
+        cls,
+        table_name,
+        process_items: Callable[[List[dict]], None],
+        total_segments=None,
+        checkpoint: "ScanCheckpoint" = None,
+        page_interval_seconds=0,
+        time_left: Callable[[], float] = None,
+        **scan_kwargs,
+    ) -> int:
+        """
+        Runs process_items with the items of every page of a parallel scan, for migrations and backfills.
+        With a checkpoint, each segment saves the key of the last processed page and an interrupted
+        run starts again from there. page_interval_seconds is the minimum time between the pages
+        of a segment, with Limit in scan_kwargs it caps the read rate of jobs sharing the table
+        with the app. time_left returns the seconds the job can still run (e.g. from the lambda context),
+        a segment stops before a page when less time is left than its longest page took, the checkpoint
+        lets the next run continue. A single segment runs in the calling thread.
+        Returns the number of processed items
+        """
+        total_segments = total_segments or cls.SCAN_SEGMENTS
+        if checkpoint is not None:
+            checkpoint.start(total_segments)
+        if total_segments == 1:
+            return cls.__process_segment(
+                table_name,
+                0,
+                1,
+                process_items,
+                checkpoint,
+                page_interval_seconds,
+                time_left,
+                scan_kwargs,
+            )
+        with ThreadPoolExecutor(max_workers=total_segments) as executor:
+            futures = [
+                executor.submit(
+                    cls.__process_segment,
+                    table_name,
+                    segment,
+                    total_segments,
+                    process_items,
+                    checkpoint,
+                    page_interval_seconds,
+                    time_left,
+                    scan_kwargs,
+                )
+                for segment in range(total_segments)
+            ]
+            return sum(future.result() for future in futures)
+
+    @classmethod
+    def batch_get(
+        cls, table_name, keys: Iterable[dict], **request_kwargs
+    ) -> Iterator[dict]:
+        """
+        Reads the items of the keys, 100 keys per BatchGetItem.
+        request_kwargs go with the keys (ProjectionExpression, ConsistentRead, etc).
+        Missing items are skipped, the order of the keys is not kept
+        """
+        for chunk in cls.__chunks(keys, cls.BATCH_GET_LIMIT):
+            request = {table_name: {"Keys": chunk, **request_kwargs}}
+            attempt = 0
+            while request:
+                response = cls.__get_resource().batch_get_item(RequestItems=request)
+                yield from response.get("Responses", {}).get(table_name, [])
+                request = response.get("UnprocessedKeys") or {}
+                attempt = cls.__backoff(attempt, request, "batch_get")
+
+    @classmethod
+    def batch_write(
+        cls,
+        table_name,
+        put_items: Iterable[dict] = (),
+        delete_keys: Iterable[dict] = (),
+    ) -> int:
+        """
+        Puts the items and deletes the keys, 25 requests per BatchWriteItem.
+        A chunk can't have the same key twice, callers have to remove duplicates.
+        Returns the number of written requests
+        """
+        requests = itertools.chain(
+            ({"PutRequest": {"Item": item}} for item in put_items),
+            ({"DeleteRequest": {"Key": key}} for key in delete_keys),
+        )
+        written = 0
+        for chunk in cls.__chunks(requests, cls.BATCH_WRITE_LIMIT):
+            request = {table_name: chunk}
+            attempt = 0
+            while request:
+                response = cls.__get_resource().batch_write_item(RequestItems=request)
+                request = response.get("UnprocessedItems") or {}
+                attempt = cls.__backoff(attempt, request, "batch_write")
+            written += len(chunk)
+        return written
+
+    @classmethod
+    def __scan_segment(
+        cls,
+        table_name,
+        segment,
+        total_segments,
+        scan_kwargs: dict,
+        pages: queue.Queue,
+        stopped: threading.Event,
+    ):
+        """Puts the items of each page in the queue, then __SEGMENT_DONE or the error"""
+        try:
+            # tables are per thread, each worker gets its own
+            table = AwsUtils.get_dynamodb_table(table_name)
+            scan_kwargs = dict(
+                scan_kwargs, Segment=segment, TotalSegments=total_segments
+            )
+            while True:
+                response = table.scan(**scan_kwargs)
+                if not cls.__put_page(pages, response.get("Items", []), stopped):
+                    return
+                if "LastEvaluatedKey" not in response:
+                    break
+                scan_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        except Exception as e:
+            cls.__put_page(pages, e, stopped)
+            return
+        cls.__put_page(pages, cls.__SEGMENT_DONE, stopped)
+
+    @staticmethod
+    def __put_page(pages: queue.Queue, page, stopped: threading.Event) -> bool:
+        """Waits for room in the queue, returns False if the scan was stopped meanwhile"""
+        while not stopped.is_set():
+            try:
+                pages.put(page, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @classmethod
+    def __process_segment(
+        cls,
+        table_name,
+        segment,
+        total_segments,
+        process_items,
+        checkpoint: "ScanCheckpoint",
+        page_interval_seconds,
+        time_left: Callable[[], float],
+        scan_kwargs: dict,
+    ) -> int:
+        table = AwsUtils.get_dynamodb_table(table_name)
+        scan_kwargs = dict(scan_kwargs, Segment=segment, TotalSegments=total_segments)
+        if checkpoint is not None:
+            if checkpoint.is_done(segment):
+                return 0
+            start_key = checkpoint.get_start_key(segment)
+            if start_key is not None:
+                scan_kwargs["ExclusiveStartKey"] = start_key
+        processed = 0
+        longest_page = 0
+        while True:
+            if time_left is not None and time_left() < longest_page:
+                logger.info(f"segment {segment} stopped, out of time")
+                return processed
+            page_started = time.monotonic()
+            response = table.scan(**scan_kwargs)
+            items = response.get("Items", [])
+            process_items(items)
+            processed += len(items)
+            last_key = response.get("LastEvaluatedKey")
+            if checkpoint is not None:
+                checkpoint.save(segment, last_key)
+            if last_key is None:
+                return processed
+            scan_kwargs["ExclusiveStartKey"] = last_key
+            elapsed = time.monotonic() - page_started
+            if elapsed < page_interval_seconds:
+                time.sleep(page_interval_seconds - elapsed)
+            longest_page = max(longest_page, time.monotonic() - page_started)
+
+    @classmethod
+    def __backoff(cls, attempt, unprocessed: dict, operation) -> int:
+        """Waits before retrying the unprocessed requests, exponential backoff with full jitter"""
+        if not unprocessed:
+            return 0
+        attempt += 1
+        if attempt >= cls.MAX_ATTEMPTS:
+            raise Exception(
+                f"{operation} left requests unprocessed after {attempt} attempts"
+            )
+        delay = min(cls.MAX_BACKOFF_SECONDS, cls.BASE_BACKOFF_SECONDS * 2**attempt)
+        logger.warning(f"{operation} unprocessed requests, retry {attempt}")
+        time.sleep(random.uniform(0, delay))
+        return attempt
+
+    @staticmethod
+    def __chunks(values: Iterable, size) -> Iterator[list]:
+        """Takes size values at a time, values are never read ahead of the chunk being used"""
+        values = iter(values)
+        while True:
+            chunk = list(itertools.islice(values, size))
+            if not chunk:
+                return
+            yield chunk
+
+    @staticmethod
+    def __get_resource():
+        # the resource (not the client) converts python values to dynamo types and back
+        return AwsUtils.get_dynamodb_resource()
+
+
+class ScanCheckpoint:
+    """
+    Progress of a parallel scan saved to a json file: the last evaluated key of each segment,
+    or None once the segment is finished. Keys are saved in dynamo json so numbers keep their type
+    """
+
+    __serializer = TypeSerializer()
+    __deserializer = TypeDeserializer()
+
+    def __init__(self, path):
+        self.path = path
+        self.__lock = threading.Lock()
+        self.__segments = {}
+        self.__total_segments = None
+        saved = self.read()
+        if saved is not None:
+            self.__total_segments = saved["total_segments"]
+            self.__segments = saved["segments"]
+
+    def start(self, total_segments):
+        if self.__total_segments not in (None, total_segments):
+            raise Exception(
+                f"checkpoint {self.path} was saved with {self.__total_segments} segments"
+            )
+        self.__total_segments = total_segments
+
+    def is_done(self, segment) -> bool:
+        saved = self.__segments.get(str(segment))
+        return saved is not None and saved.get("done", False)
+
+    def is_complete(self) -> bool:
+        """True once every segment is finished"""
+        return self.__total_segments is not None and all(
+            self.is_done(segment) for segment in range(self.__total_segments)
+        )
+
+    def get_start_key(self, segment):
+        saved = self.__segments.get(str(segment))
+        if saved is None or saved.get("last_key") is None:
+            return None
+        return {
+            name: self.__deserializer.deserialize(value)
+            for name, value in saved["last_key"].items()
+        }
+
+    def save(self, segment, last_key):
+        with self.__lock:
+            if last_key is None:
+                self.__segments[str(segment)] = {"done": True}
+            else:
+                self.__segments[str(segment)] = {
+                    "last_key": {
+                        name: self.__serializer.serialize(value)
+                        for name, value in last_key.items()
+                    }
+                }
+            self.write(
+                {"total_segments": self.__total_segments, "segments": self.__segments}
+            )
+
+    def clear(self):
+        """Forgets the progress, the next scan starts from the beginning"""
+        with self.__lock:
+            self.__segments = {}
+            self.__total_segments = None
+            self.delete()
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as checkpoint_file:
+            return json.load(checkpoint_file)
+
+    def write(self, saved: dict):
+        # written to a temporary file first, a crash never leaves a half written checkpoint
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w") as checkpoint_file:
+            json.dump(saved, checkpoint_file)
+        os.replace(temporary_path, self.path)
+
+    def delete(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ItemScanCheckpoint(ScanCheckpoint):
+    """
+    ScanCheckpoint saved in an item of a table, for jobs without a durable file system (lambda).
+    The path names the item in errors
+    """
+
+    def __init__(self, table_name, key: dict):
+        self.table_name = table_name
+        self.key = key
+        super().__init__(f"{table_name} {key}")
+
+    def read(self):
+        item = self.__get_table().get_item(Key=self.key, ConsistentRead=True).get("Item")
+        if item is None:
+            return None
+        return json.loads(item["checkpoint"])
+
+    def write(self, saved: dict):
+        self.__get_table().put_item(Item={**self.key, "checkpoint": json.dumps(saved)})
+
+    def delete(self):
+        self.__get_table().delete_item(Key=self.key)
+
+    def __get_table(self):
+        return AwsUtils.get_dynamodb_table(self.table_name)
@@ -0,0 +1,91 @@
+import os
+import time
+import random
+import logging
+import functools
+import threading
+from botocore.exceptions import ClientError
+from utils.storage_backend import StorageUnavailableError
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class DynamoThrottle:
+    """
+    Retries dynamo calls rejected for throughput with jittered exponential backoff as long as
+    the time budget allows it. The clients it wraps don't retry in botocore (AwsUtils retries=False),
+    otherwise a single call could outlast the budget. Slack expects an answer in 3 seconds,
+    so once the budget is spent StorageUnavailableError is raised and callers decide what to do
+    (serve a cached record, defer the write, etc). Throttles are counted per operation
+    """
+
+    THROTTLE_CODES = {
+        "ProvisionedThroughputExceededException",
+        "ThrottlingException",
+        "RequestLimitExceeded",
+    }
+    # reasons of a cancelled transaction
+    THROTTLE_REASONS = {"ThrottlingError", "ProvisionedThroughputExceeded"}
+    BUDGET_SECONDS = float(os.environ.get("DYNAMO_THROTTLE_BUDGET_SECONDS", "1"))
+    BASE_BACKOFF_SECONDS = 0.025
+    MAX_BACKOFF_SECONDS = 0.5
+
+    __throttles = {}
+    __lock = threading.Lock()
+
+    @classmethod
+    def call(cls, operation_name, operation, *args, **kwargs):
+        deadline = time.monotonic() + cls.BUDGET_SECONDS
+        attempt = 0
+        while True:
+            try:
+                return operation(*args, **kwargs)
+            except ClientError as e:
+                if not cls.is_throttle_error(e):
+                    raise
+                cls.__count_throttle(operation_name)
+                attempt += 1
+                delay = random.uniform(
+                    0,
+                    min(cls.MAX_BACKOFF_SECONDS, cls.BASE_BACKOFF_SECONDS * 2**attempt),
+                )
+                if time.monotonic() + delay > deadline:
+                    raise StorageUnavailableError(
+                        f"{operation_name} throttled {attempt} times"
+                    ) from e
+                logger.warning(f"{operation_name} throttled, retry {attempt}")
+                time.sleep(delay)
+
+    @classmethod
+    def is_throttle_error(cls, error: ClientError) -> bool:
+        if error.response.get("Error", {}).get("Code") in cls.THROTTLE_CODES:
+            return True
+        reasons = error.response.get("CancellationReasons", [])
+        return any(reason.get("Code") in cls.THROTTLE_REASONS for reason in reasons)
+
+    @classmethod
+    def get_throttle_counts(cls) -> dict:
+        """Number of throttled calls per operation since the container started"""
+        with cls.__lock:
+            return dict(cls.__throttles)
+
+    @classmethod
+    def __count_throttle(cls, operation_name):
+        with cls.__lock:
+            cls.__throttles[operation_name] = cls.__throttles.get(operation_name, 0) + 1
+
+
+class ThrottledTable:
+    """Wraps a boto3 Table so its item operations go through DynamoThrottle"""
+
+    OPERATIONS = {"get_item", "put_item", "update_item", "delete_item", "query", "scan"}
+
+    def __init__(self, table):
+        self.__table = table
+
+    def __getattr__(self, name):
+        attribute = getattr(self.__table, name)
+        if name in self.OPERATIONS:
+            return functools.partial(DynamoThrottle.call, name, attribute)
+        return attribute
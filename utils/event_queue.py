@@ -0,0 +1,220 @@
+import os
+import time
+import uuid
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import List
+
+SQLITE_QUEUE_SCHEMA = """CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    message_id TEXT NOT NULL,
+    body TEXT NOT NULL,
+    visible_at REAL NOT NULL,
+    receive_count INTEGER NOT NULL DEFAULT 0,
+    receipt_handle TEXT
+)"""
+INSERT_MESSAGE = "INSERT INTO messages (message_id, body, visible_at) VALUES (?, ?, ?)"
+SELECT_VISIBLE_MESSAGES = (
+    "SELECT id, message_id, body, receive_count FROM messages "
+    "WHERE visible_at <= ? ORDER BY id LIMIT ?"
+)
+RECEIVE_MESSAGE = (
+    "UPDATE messages SET visible_at = ?, receive_count = receive_count + 1, "
+    "receipt_handle = ? WHERE id = ?"
+)
+DELETE_MESSAGE = "DELETE FROM messages WHERE receipt_handle = ?"
+CHANGE_VISIBILITY = "UPDATE messages SET visible_at = ? WHERE receipt_handle = ?"
+COUNT_MESSAGES = "SELECT COUNT(*) FROM messages"
+
+
+class QueueMessage:
+    """A received message, the receipt handle identifies this receive to delete it or change its visibility"""
+
+    def __init__(self, message_id, receipt_handle, body: str, receive_count: int):
+        self.message_id = message_id
+        self.receipt_handle = receipt_handle
+        self.body = body
+        self.receive_count = receive_count
+
+
+class EventQueue(ABC):
+    """
+    Subset of the SQS interface the event dispatch uses. Received messages are hidden
+    for the visibility timeout and come back if they are not deleted before it ends
+    """
+
+    @abstractmethod
+    def send_message(self, body: str):
+        pass
+
+    @abstractmethod
+    def receive_messages(
+        self, max_messages: int, visibility_timeout: int, wait_seconds: int = 0
+    ) -> List[QueueMessage]:
+        pass
+
+    @abstractmethod
+    def delete_message(self, receipt_handle):
+        pass
+
+    @abstractmethod
+    def change_message_visibility(self, receipt_handle, visibility_timeout: int):
+        pass
+
+
+class SqsQueue(EventQueue):
+    """EventQueue backed by an SQS queue"""
+
+    def __init__(self, queue_url):
+        self.queue_url = queue_url
+
+    def send_message(self, body: str):
+        return self.__client().send_message(QueueUrl=self.queue_url, MessageBody=body)
+
+    def receive_messages(
+        self, max_messages: int, visibility_timeout: int, wait_seconds: int = 0
+    ) -> List[QueueMessage]:
+        response = self.__client().receive_message(
+            QueueUrl=self.queue_url,
+            # SQS returns at most 10 messages per call
+            MaxNumberOfMessages=min(max_messages, 10),
+            VisibilityTimeout=visibility_timeout,
+            WaitTimeSeconds=wait_seconds,
+            AttributeNames=["ApproximateReceiveCount"],
+        )
+        return [
+            QueueMessage(
+                message["MessageId"],
+                message["ReceiptHandle"],
+                message["Body"],
+                int(message["Attributes"]["ApproximateReceiveCount"]),
+            )
+            for message in response.get("Messages", [])
+        ]
+
+    def delete_message(self, receipt_handle):
+        self.__client().delete_message(
+            QueueUrl=self.queue_url, ReceiptHandle=receipt_handle
+        )
+
+    def change_message_visibility(self, receipt_handle, visibility_timeout: int):
+        self.__client().change_message_visibility(
+            QueueUrl=self.queue_url,
+            ReceiptHandle=receipt_handle,
+            VisibilityTimeout=visibility_timeout,
+        )
+
+    @staticmethod
+    def __client():
+        # imported here so the sqlite queue doesn't load boto3
+        from utils.aws import AwsUtils
+
+        return AwsUtils.get_client("sqs")
+
+
+class SqliteQueue(EventQueue):
+    """
+    Local stand-in for SQS backed by a SQLite file, so the flask process can enqueue
+    and a worker process consume. Receiving takes the write lock, a message is never
+    given to two consumers while it's hidden
+    """
+
+    POLL_INTERVAL_SECONDS = 0.2
+
+    def __init__(self, database_path: str):
+        self.database_path = database_path
+        self.__lock = threading.Lock()
+        # isolation_level=None leaves transactions to the explicit BEGIN IMMEDIATE
+        self.__connection = sqlite3.connect(
+            database_path, isolation_level=None, check_same_thread=False
+        )
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute("PRAGMA busy_timeout=5000")
+        self.__connection.execute(SQLITE_QUEUE_SCHEMA)
+
+    def send_message(self, body: str):
+        message_id = str(uuid.uuid4())
+        with self.__lock:
+            self.__connection.execute(INSERT_MESSAGE, (message_id, body, time.time()))
+        return {"MessageId": message_id}
+
+    def receive_messages(
+        self, max_messages: int, visibility_timeout: int, wait_seconds: int = 0
+    ) -> List[QueueMessage]:
+        deadline = time.monotonic() + wait_seconds
+        while True:
+            messages = self.__receive(max_messages, visibility_timeout)
+            if len(messages) > 0 or time.monotonic() >= deadline:
+                return messages
+            time.sleep(self.POLL_INTERVAL_SECONDS)
+
+    def delete_message(self, receipt_handle):
+        with self.__lock:
+            self.__connection.execute(DELETE_MESSAGE, (receipt_handle,))
+
+    def change_message_visibility(self, receipt_handle, visibility_timeout: int):
+        with self.__lock:
+            self.__connection.execute(
+                CHANGE_VISIBILITY, (time.time() + visibility_timeout, receipt_handle)
+            )
+
+    def count(self) -> int:
+        """Messages in the queue, visible or not"""
+        with self.__lock:
+            return self.__connection.execute(COUNT_MESSAGES).fetchone()[0]
+
+    def __receive(self, max_messages, visibility_timeout) -> List[QueueMessage]:
+        now = time.time()
+        with self.__lock:
+            self.__connection.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.__connection.execute(
+                    SELECT_VISIBLE_MESSAGES, (now, max_messages)
+                ).fetchall()
+                messages = []
+                for row_id, message_id, body, receive_count in rows:
+                    receipt_handle = str(uuid.uuid4())
+                    self.__connection.execute(
+                        RECEIVE_MESSAGE,
+                        (now + visibility_timeout, receipt_handle, row_id),
+                    )
+                    messages.append(
+                        QueueMessage(
+                            message_id, receipt_handle, body, receive_count + 1
+                        )
+                    )
+            except Exception:
+                self.__connection.execute("ROLLBACK")
+                raise
+            self.__connection.execute("COMMIT")
+        return messages
+
+
+class EventQueues:
+    """
+    Gives access to the events queue. With EVENT_QUEUE_URL it's that SQS queue,
+    otherwise a SqliteQueue in EVENT_QUEUE_PATH (events.db by default)
+    """
+
+    __queue: EventQueue = None
+    __lock = threading.Lock()
+
+    @classmethod
+    def get_queue(cls) -> EventQueue:
+        if cls.__queue is None:
+            with cls.__lock:
+                if cls.__queue is None:
+                    queue_url = os.environ.get("EVENT_QUEUE_URL")
+                    if queue_url:
+                        cls.__queue = SqsQueue(queue_url)
+                    else:
+                        cls.__queue = SqliteQueue(
+                            os.environ.get("EVENT_QUEUE_PATH", "events.db")
+                        )
+        return cls.__queue
+
+    @classmethod
+    def set_queue(cls, event_queue: EventQueue):
+        """Replaces the queue, e.g. to use a temporary SqliteQueue in tests"""
+        cls.__queue = event_queue
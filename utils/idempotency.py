@@ -0,0 +1,94 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from utils.storage import Storage
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class Idempotency:
+    """
+    Recognizes slack events delivered more than once. Slack retries an event when the ack takes
+    more than 3 seconds, the retry has the same event_id (trigger_id for commands and interactions).
+    The first delivery claims the key in the storage backend for KEY_TTL_SECONDS, so every process
+    sees it. Keys are also remembered in a LRU, retries reaching the same process don't cost a storage call.
+    If the storage fails the event is handled, a duplicate is better than a lost event.
+    For the same reason, the key is released if the event could not be dispatched
+    """
+
+    KEY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", "3600"))
+    MAX_RECENT_KEYS = 1024
+
+    # key -> expires_at
+    __recent_keys = OrderedDict()
+    __lock = threading.Lock()
+
+    @classmethod
+    def event_key(cls, event_id):
+        return f"event:{event_id}" if event_id else None
+
+    @classmethod
+    def trigger_key(cls, trigger_id):
+        return f"trigger:{trigger_id}" if trigger_id else None
+
+    @classmethod
+    def is_duplicate(cls, key, retry_num=None) -> bool:
+        """Claims the key, returns True if it was already claimed. Events without a key are never duplicates"""
+        if key is None:
+            return False
+        now = time.time()
+        if cls.__seen_recently(key, now):
+            logger.info(f"dropping duplicate {key} retry {retry_num}")
+            return True
+        try:
+            claimed = Storage.get_backend().claim_idempotency_key(
+                key, cls.KEY_TTL_SECONDS, now
+            )
+        except Exception as e:
+            logger.warning(f"could not claim {key}, handling it anyway {e}")
+            return False
+        cls.__remember(key, now + cls.KEY_TTL_SECONDS)
+        if not claimed:
+            logger.info(f"dropping duplicate {key} retry {retry_num}")
+        return not claimed
+
+    @classmethod
+    def release(cls, key):
+        """Forgets the claim of the key, the next delivery of the event is handled"""
+        if key is None:
+            return
+        with cls.__lock:
+            cls.__recent_keys.pop(key, None)
+        try:
+            Storage.get_backend().release_idempotency_key(key)
+        except Exception as e:
+            logger.error(f"could not release {key}, its retries will be dropped {e}")
+
+    @classmethod
+    def clear(cls):
+        """Forgets the keys remembered by this process"""
+        with cls.__lock:
+            cls.__recent_keys.clear()
+
+    @classmethod
+    def __seen_recently(cls, key, now) -> bool:
+        with cls.__lock:
+            expires_at = cls.__recent_keys.get(key)
+            if expires_at is None:
+                return False
+            if expires_at < now:
+                del cls.__recent_keys[key]
+                return False
+            cls.__recent_keys.move_to_end(key)
+            return True
+
+    @classmethod
+    def __remember(cls, key, expires_at):
+        with cls.__lock:
+            cls.__recent_keys[key] = expires_at
+            cls.__recent_keys.move_to_end(key)
+            if len(cls.__recent_keys) > cls.MAX_RECENT_KEYS:
+                cls.__recent_keys.popitem(last=False)
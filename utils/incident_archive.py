@@ -0,0 +1,174 @@
+import os
+import logging
+import datetime as dt
+from typing import Callable, List
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+from domain.incident import Incident, IncidentStatus
+from utils.aws import AwsUtils
+from utils.date_time_utils import DateTimeUtils
+from utils.dynamo import DynamoUtils
+from utils.dynamo_bulk import DynamoBulk, ItemScanCheckpoint
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class IncidentArchive:
+    """
+    Moves incidents closed more than ARCHIVE_AFTER_DAYS ago from the incidents table to the
+    archive table, so team partitions only keep recent and open incidents.
+    Archived incidents keep only the attributes reports need and can be queried by team and start date
+    """
+
+    ARCHIVE_TABLE = os.environ.get("INCIDENTS_ARCHIVE_TABLE")
+    ARCHIVE_AFTER_DAYS = int(os.environ.get("INCIDENT_ARCHIVE_AFTER_DAYS", "30"))
+    # the incidents table has little read capacity, the scan reads a small page at a time
+    ARCHIVE_SCAN_SEGMENTS = int(os.environ.get("INCIDENT_ARCHIVE_SCAN_SEGMENTS", "1"))
+    ARCHIVE_PAGE_SIZE = int(os.environ.get("INCIDENT_ARCHIVE_PAGE_SIZE", "25"))
+    ARCHIVE_PAGE_INTERVAL_SECONDS = float(
+        os.environ.get("INCIDENT_ARCHIVE_PAGE_INTERVAL_SECONDS", "2")
+    )
+    # time kept after the last page, on top of the longest page, to save the checkpoint and return
+    ARCHIVE_STOP_MARGIN_SECONDS = float(
+        os.environ.get("INCIDENT_ARCHIVE_STOP_MARGIN_SECONDS", "10")
+    )
+    # progress of an unfinished run, kept in the archive table out of the way of the team partitions
+    CHECKPOINT_KEY = {"teamId": "checkpoint#", "incidentId": "archive"}
+    TEAM_STARTED_INDEX = "teamId-started-index"
+    ARCHIVED_ATTRIBUTES = [
+        "teamId",
+        "incidentId",
+        "name",
+        "status",
+        "started_datetime",
+        "closed_at",
+        "callLink",
+        "ticketLink",
+    ]
+
+    @classmethod
+    def get_archive_table(cls):
+        return AwsUtils.get_dynamodb_table(cls.ARCHIVE_TABLE)
+
+    @classmethod
+    def archive_closed_incidents(
+        cls, older_than_days=None, remaining_millis: Callable[[], int] = None
+    ) -> int:
+        """
+        Copies the incidents closed before the cutoff to the archive table and then deletes them,
+        one scan page at a time. The scan runs in ARCHIVE_SCAN_SEGMENTS segments of small pages
+        spaced by ARCHIVE_PAGE_INTERVAL_SECONDS, so it doesn't take the read capacity the app needs.
+        remaining_millis is the time the lambda has left (context.get_remaining_time_in_millis),
+        the run stops when there is no time for another page and the next one continues from the
+        checkpoint. Returns the number of archived incidents
+        """
+        cutoff = cls.__cutoff(older_than_days or cls.ARCHIVE_AFTER_DAYS)
+        archived = []
+
+        def archive_page(items: List[dict]):
+            archived.append(cls.__archive_page(items, cutoff))
+
+        time_left = None
+        if remaining_millis is not None:
+            time_left = (
+                lambda: remaining_millis() / 1000 - cls.ARCHIVE_STOP_MARGIN_SECONDS
+            )
+        checkpoint = ItemScanCheckpoint(cls.ARCHIVE_TABLE, cls.CHECKPOINT_KEY)
+        DynamoBulk.parallel_process(
+            DynamoUtils.INCIDENTS_TABLE,
+            archive_page,
+            total_segments=cls.ARCHIVE_SCAN_SEGMENTS,
+            checkpoint=checkpoint,
+            page_interval_seconds=cls.ARCHIVE_PAGE_INTERVAL_SECONDS,
+            time_left=time_left,
+            Limit=cls.ARCHIVE_PAGE_SIZE,
+            FilterExpression=Attr("status").eq(IncidentStatus.CLOSED.name),
+        )
+        if checkpoint.is_complete():
+            # the whole table was read, the next run starts a new scan
+            checkpoint.clear()
+        else:
+            logger.info("incident archival stopped before the end of the scan")
+        return sum(archived)
+
+    @classmethod
+    def get_archived_incidents(
+        cls, team_id, started_from: str, started_to: str
+    ) -> List[Incident]:
+        """Returns the archived incidents of the team started between the two date times (inclusive)"""
+        query_kwargs = {
+            "IndexName": cls.TEAM_STARTED_INDEX,
+            "KeyConditionExpression": Key("teamId").eq(team_id)
+            & Key("started_datetime").between(started_from, started_to),
+        }
+        incidents = []
+        while True:
+            response = cls.get_archive_table().query(**query_kwargs)
+            incidents.extend(
+                DynamoUtils.build_incident(item) for item in response["Items"]
+            )
+            if "LastEvaluatedKey" not in response:
+                return incidents
+            query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    @classmethod
+    def __archive_page(cls, items: List[dict], cutoff: str) -> int:
+        incident_items = [item for item in items if cls.__is_archivable(item, cutoff)]
+        if len(incident_items) == 0:
+            return 0
+        # copy first, an interrupted run leaves incidents in both tables but never loses them
+        DynamoBulk.batch_write(
+            cls.ARCHIVE_TABLE,
+            put_items=[cls.__build_archive_item(item) for item in incident_items],
+        )
+        archived = 0
+        for item in incident_items:
+            if cls.__delete_closed_incident(item):
+                archived += 1
+        return archived
+
+    @staticmethod
+    def __is_archivable(item: dict, cutoff: str) -> bool:
+        """
+        Closed incidents are archived once closed_at is before the cutoff.
+        Incidents closed before closed_at existed are archived by their start date
+        """
+        if item.get("status") != IncidentStatus.CLOSED.name:
+            return False
+        closed_at = item.get("closed_at") or item.get("started_datetime")
+        return closed_at is not None and closed_at < cutoff
+
+    @classmethod
+    def __delete_closed_incident(cls, item: dict) -> bool:
+        """
+        Deletes the incident only if it is still closed. If it was reopened after the scan,
+        the archived copy is deleted instead and the incident stays in the incidents table
+        """
+        key = {"teamId": item["teamId"], "incidentId": item["incidentId"]}
+        try:
+            DynamoUtils.get_incidents_table().delete_item(
+                Key=key,
+                ConditionExpression=Attr("status").eq(IncidentStatus.CLOSED.name),
+            )
+            return True
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            logger.info(f"incident reopened while archiving {key}")
+            cls.get_archive_table().delete_item(Key=key)
+            return False
+
+    @classmethod
+    def __build_archive_item(cls, item: dict) -> dict:
+        return {
+            attribute: item[attribute]
+            for attribute in cls.ARCHIVED_ATTRIBUTES
+            if item.get(attribute) not in (None, "")
+        }
+
+    @staticmethod
+    def __cutoff(older_than_days) -> str:
+        return (dt.datetime.now() - dt.timedelta(days=older_than_days)).strftime(
+            DateTimeUtils.datetime_format
+        )
@@ -0,0 +1,222 @@
+import logging
+from collections import OrderedDict
+from typing import List, Optional
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from domain.incident import Incident, IncidentStatus
+from utils.dynamo import DynamoUtils
+from utils.dynamo_bulk import DynamoBulk
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class IncidentChange:
+    """A change of an item of the incidents table, read from a DynamoDB stream record"""
+
+    __deserializer = TypeDeserializer()
+
+    def __init__(
+        self,
+        event_name: str,
+        sequence_number: str,
+        keys: dict,
+        old_image: Optional[dict],
+        new_image: Optional[dict],
+    ):
+        self.event_name = event_name
+        self.sequence_number = sequence_number
+        self.keys = keys
+        self.old_image = old_image
+        self.new_image = new_image
+
+    @classmethod
+    def from_stream_record(cls, record: dict):
+        stream_record = record["dynamodb"]
+        return cls(
+            record["eventName"],
+            stream_record["SequenceNumber"],
+            cls.__deserialize(stream_record["Keys"]),
+            cls.__deserialize(stream_record.get("OldImage")),
+            cls.__deserialize(stream_record.get("NewImage")),
+        )
+
+    @classmethod
+    def __deserialize(cls, image: Optional[dict]) -> Optional[dict]:
+        if image is None:
+            return None
+        return {key: cls.__deserializer.deserialize(value) for key, value in image.items()}
+
+    def get_team_id(self):
+        return self.keys["teamId"]
+
+    def get_incident_id(self):
+        return self.keys["incidentId"]
+
+    def is_incident(self) -> bool:
+        """Counter items live in the same table, their changes are not incident changes"""
+        return not DynamoUtils.is_counter_item(self.keys)
+
+    def is_bulk_import(self) -> bool:
+        """
+        Written by a bulk import (scripts/dynamo_ndjson.py), which restores the team items too.
+        Later changes of an imported incident keep the same mark and are not imports
+        """
+        if self.new_image is None or DynamoBulk.IMPORTED_AT not in self.new_image:
+            return False
+        old_mark = (self.old_image or {}).get(DynamoBulk.IMPORTED_AT)
+        return old_mark != self.new_image[DynamoBulk.IMPORTED_AT]
+
+    def was_created(self) -> bool:
+        return self.event_name == "INSERT"
+
+    def was_ongoing(self) -> bool:
+        return self.__is_ongoing(self.old_image)
+
+    def is_ongoing(self) -> bool:
+        return self.__is_ongoing(self.new_image)
+
+    def get_incident(self) -> Incident:
+        return DynamoUtils.build_incident(self.new_image or self.old_image)
+
+    @staticmethod
+    def __is_ongoing(image: Optional[dict]) -> bool:
+        return image is not None and image.get("status") == IncidentStatus.ONGOING.name
+
+
+class OpenIncidentsHandler:
+    """Keeps the open incidents of the team item in line with the ongoing incidents"""
+
+    @classmethod
+    def handle(cls, team_id, changes: List[IncidentChange]):
+        opened, closed_ids = cls.collect(changes)
+        DynamoUtils.update_open_incidents(team_id, opened, closed_ids)
+
+    @classmethod
+    def collect(cls, changes: List[IncidentChange]):
+        """
+        Returns the incidents to add to and the ids to remove from the open incidents.
+        Changes are applied in order, an incident opened and closed in the same batch is only removed
+        """
+        opened = OrderedDict()
+        closed_ids = []
+        for change in changes:
+            incident_id = change.get_incident_id()
+            if change.is_ongoing() and not change.was_ongoing():
+                opened[incident_id] = change.get_incident()
+                if incident_id in closed_ids:
+                    closed_ids.remove(incident_id)
+            elif change.was_ongoing() and not change.is_ongoing():
+                opened.pop(incident_id, None)
+                if incident_id not in closed_ids:
+                    closed_ids.append(incident_id)
+        return list(opened.values()), closed_ids
+
+
+class IncidentStreamConsumer:
+    """
+    Processes batches of records of the incidents table stream, skipping bulk imports. The incident changes are grouped by team
+    and each handler gets the changes of a team in order, so a team costs one write per handler
+    instead of one per change. If a team fails, the batch is retried from its first record,
+    handlers have to be idempotent since the teams processed before may get their changes again.
+    The derived writes are done by the stream only when DynamoUtils.DERIVED_WRITES_FROM_STREAM is set,
+    otherwise create_incident already did them in its transaction and the records are skipped
+    """
+
+    HANDLERS = [OpenIncidentsHandler]
+
+    @classmethod
+    def process(cls, records: List[dict], handlers=None) -> dict:
+        """Returns the failed records in the format of a lambda partial batch response"""
+        if handlers is None:
+            if not DynamoUtils.DERIVED_WRITES_FROM_STREAM:
+                logger.info(
+                    f"derived writes are transactional, skipping {len(records)} records"
+                )
+                return {"batchItemFailures": []}
+            handlers = cls.HANDLERS
+        changes_by_team = OrderedDict()
+        for record in records:
+            change = IncidentChange.from_stream_record(record)
+            if change.is_incident() and not change.is_bulk_import():
+                changes_by_team.setdefault(change.get_team_id(), []).append(change)
+
+        failed = []
+        for team_id, changes in changes_by_team.items():
+            for handler in handlers:
+                try:
+                    handler.handle(team_id, changes)
+                except Exception as e:
+                    logger.error(f"{handler.__name__} failed for team {team_id} {e}")
+                    failed.append({"itemIdentifier": changes[0].sequence_number})
+                    break
+        return {"batchItemFailures": failed}
+
+
+class InMemoryIncidentStream:
+    """
+    Stand-in for the incidents table stream in local runs and tests.
+    Records are kept in the lambda event format and delivered in order
+    """
+
+    __serializer = TypeSerializer()
+
+    def __init__(self):
+        self.__records = []
+        self.__sequence = 0
+
+    def put(self, old_item: Optional[dict], new_item: Optional[dict]):
+        """Records the change of an item, None as old item is an insert and None as new item a removal"""
+        if old_item is None:
+            event_name = "INSERT"
+        elif new_item is None:
+            event_name = "REMOVE"
+        else:
+            event_name = "MODIFY"
+        item = new_item if new_item is not None else old_item
+        self.__sequence += 1
+        stream_record = {
+            "SequenceNumber": str(self.__sequence),
+            "Keys": self.__serialize(
+                {"teamId": item["teamId"], "incidentId": item["incidentId"]}
+            ),
+        }
+        if old_item is not None:
+            stream_record["OldImage"] = self.__serialize(old_item)
+        if new_item is not None:
+            stream_record["NewImage"] = self.__serialize(new_item)
+        self.__records.append({"eventName": event_name, "dynamodb": stream_record})
+
+    def pending(self) -> int:
+        return len(self.__records)
+
+    def deliver(self, batch_size=100, handlers=None) -> List[dict]:
+        """
+        Delivers the records to the consumer in batches, like the lambda event source mapping.
+        A batch with failures is retried from the first failed record, it stops once a retry fails too.
+        Returns the failures
+        """
+        failures = []
+        retrying = False
+        while len(self.__records) > 0:
+            batch = self.__records[:batch_size]
+            response = IncidentStreamConsumer.process(batch, handlers=handlers)
+            failed = response["batchItemFailures"]
+            if len(failed) == 0:
+                del self.__records[: len(batch)]
+                retrying = False
+                continue
+            failures.extend(failed)
+            first_failed = min(int(failure["itemIdentifier"]) for failure in failed)
+            self.__records = [
+                record
+                for record in self.__records
+                if int(record["dynamodb"]["SequenceNumber"]) >= first_failed
+            ]
+            if retrying:
+                return failures
+            retrying = True
+        return failures
+
+    @classmethod
+    def __serialize(cls, item: dict) -> dict:
+        return {key: cls.__serializer.serialize(value) for key, value in item.items()}
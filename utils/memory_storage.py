@@ -0,0 +1,277 @@
+import bisect
+import copy
+import logging
+import threading
+from typing import Iterator, List, Tuple
+from domain.incident import Incident, IncidentStatus
+from domain.integrations.jira import Jira
+from domain.integrations.zoom import Zoom
+from utils.date_time_utils import DateTimeUtils
+from utils.storage_backend import StorageBackend
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class MemoryStorage(StorageBackend):
+    """
+    Storage backend that keeps everything in memory, in the same shape as the DynamoDB items.
+    Incidents are indexed by team and status, sorted by started_datetime, like the status index in dynamo.
+    Meant for local runs, tests and benchmarks, data is lost when the process ends
+    """
+
+    def __init__(self):
+        self.__lock = threading.RLock()
+        self.__teams = {}
+        self.__incidents = {}
+        # (team_id, status) -> sorted list of (started_datetime, incident_id)
+        self.__status_index = {}
+        self.__counters = {}
+        # (team_id, app_name) -> (owner, expires_at)
+        self.__refresh_leases = {}
+        # key -> expires_at
+        self.__idempotency_keys = {}
+
+    def get_slack_access_token(self, team_id):
+        with self.__lock:
+            return self.__get_team(team_id).get("access_token")
+
+    def save_slack_access_token(self, team_id, access_token):
+        with self.__lock:
+            team = self.__teams.setdefault(team_id, {"teamId": team_id})
+            team["access_token"] = access_token
+            team.setdefault("apps", {})
+            return {}
+
+    def get_authorized_apps(self, team_id, consistent_read=False) -> dict:
+        with self.__lock:
+            return copy.deepcopy(self.__get_team(team_id).get("apps", {}))
+
+    def get_jira_data(self, team_id, consistent_read=False) -> Jira:
+        apps = self.get_authorized_apps(team_id)
+        if "jira" not in apps:
+            return None
+        return self.build_jira(apps["jira"])
+
+    def save_jira_data(self, team_id, jira: Jira):
+        return self.__save_app(
+            team_id,
+            "jira",
+            {
+                "id": jira.account_id,
+                "access_token": jira.token_data.access_token,
+                "refresh_token": jira.token_data.refresh_token,
+                "expiry_date": jira.token_data.expiry_date,
+            },
+        )
+
+    def get_zoom_data(self, team_id, consistent_read=False) -> Zoom:
+        apps = self.get_authorized_apps(team_id)
+        if "zoom" not in apps:
+            return None
+        return self.build_zoom(apps["zoom"])
+
+    def save_zoom_data(self, team_id, zoom: Zoom):
+        return self.__save_app(
+            team_id,
+            "zoom",
+            {
+                "access_token": zoom.token_data.access_token,
+                "refresh_token": zoom.token_data.refresh_token,
+                "expiry_date": zoom.token_data.expiry_date,
+            },
+        )
+
+    def iter_authorized_apps(self) -> Iterator[Tuple[str, dict]]:
+        with self.__lock:
+            teams_apps = [
+                (team_id, copy.deepcopy(team["apps"]))
+                for team_id, team in self.__teams.items()
+                if team.get("apps")
+            ]
+        return iter(teams_apps)
+
+    def acquire_refresh_lease(
+        self, team_id, app_name, owner, lease_seconds, now: float
+    ) -> bool:
+        with self.__lock:
+            lease = self.__refresh_leases.get((team_id, app_name))
+            if lease is not None and lease[1] >= now:
+                return False
+            self.__refresh_leases[(team_id, app_name)] = (owner, now + lease_seconds)
+            return True
+
+    def release_refresh_lease(self, team_id, app_name, owner):
+        with self.__lock:
+            lease = self.__refresh_leases.get((team_id, app_name))
+            if lease is not None and lease[0] == owner:
+                del self.__refresh_leases[(team_id, app_name)]
+
+    def claim_idempotency_key(self, key, ttl_seconds, now: float) -> bool:
+        with self.__lock:
+            expires_at = self.__idempotency_keys.get(key)
+            if expires_at is not None and expires_at >= now:
+                return False
+            self.__idempotency_keys[key] = now + ttl_seconds
+            return True
+
+    def release_idempotency_key(self, key):
+        with self.__lock:
+            self.__idempotency_keys.pop(key, None)
+
+    def get_responders(self, team_id):
+        with self.__lock:
+            return set(self.__get_team(team_id).get("responders", []))
+
+    def save_responders(self, team_id, responders):
+        with self.__lock:
+            team = self.__teams.setdefault(team_id, {"teamId": team_id})
+            team["responders"] = team.get("responders", set()) | set(responders)
+            return {"Attributes": {"responders": set(team["responders"])}}
+
+    def remove_responders(self, team_id, responders):
+        with self.__lock:
+            team = self.__teams.setdefault(team_id, {"teamId": team_id})
+            remaining = team.get("responders", set()) - set(responders)
+            if len(remaining) == 0:
+                team.pop("responders", None)
+                return {"Attributes": {}}
+            team["responders"] = remaining
+            return {"Attributes": {"responders": set(remaining)}}
+
+    def get_oncall(self, team_id):
+        with self.__lock:
+            return self.__get_team(team_id).get("oncall")
+
+    def save_oncall(self, team_id, user_id):
+        with self.__lock:
+            self.__teams.setdefault(team_id, {"teamId": team_id})["oncall"] = user_id
+            return {}
+
+    def create_incident(self, incident: Incident):
+        key = (incident.team_id, incident.incident_id)
+        with self.__lock:
+            if key in self.__incidents:
+                logger.error(
+                    f"incident already exists {incident.team_id} {incident.incident_id}"
+                )
+                return None
+            self.__incidents[key] = {
+                "teamId": incident.team_id,
+                "incidentId": incident.incident_id,
+                "name": incident.name,
+                "callLink": (
+                    incident.call.get_link() if incident.call is not None else ""
+                ),
+                "ticketLink": (
+                    incident.ticket.get_link() if incident.ticket is not None else ""
+                ),
+                "status": incident.status.name,
+                "started_datetime": incident.started_datetime,
+            }
+            self.__add_to_status_index(self.__incidents[key])
+            return {}
+
+    def update_incident_status(
+        self, incident: Incident, incident_status: IncidentStatus
+    ):
+        key = (incident.team_id, incident.incident_id)
+        with self.__lock:
+            incident_item = self.__incidents.get(key)
+            if incident_item is None:
+                logger.error(
+                    f"trying to close a non existent incident {incident.team_id}"
+                )
+                return None
+            self.__remove_from_status_index(incident_item)
+            incident_item["status"] = incident_status.name
+            if incident_status == IncidentStatus.CLOSED:
+                incident_item["closed_at"] = DateTimeUtils.current_datetime_as_string()
+            else:
+                incident_item.pop("closed_at", None)
+            self.__add_to_status_index(incident_item)
+            return {"status": incident_status.name}
+
+    def get_incident(
+        self, team_id: str, incident_id: str, consistent_read=False
+    ) -> Incident:
+        with self.__lock:
+            incident_item = self.__incidents.get((team_id, incident_id))
+            if incident_item is None:
+                return None
+            return self.build_incident(incident_item)
+
+    def get_ongoing_incidents(self, team_id) -> List[Incident]:
+        return self.__get_incidents_by_status(team_id, IncidentStatus.ONGOING)
+
+    def get_today_incidents(self, team_id) -> List[Incident]:
+        return self.get_incidents_started_between(
+            team_id,
+            DateTimeUtils.start_of_today_as_string(),
+            DateTimeUtils.end_of_today_as_string(),
+        )
+
+    def get_incidents_started_between(
+        self, team_id, started_from: str, started_to: str
+    ) -> List[Incident]:
+        incidents = []
+        for incident_status in IncidentStatus:
+            incidents.extend(
+                self.__get_incidents_by_status(
+                    team_id, incident_status, started_from, started_to
+                )
+            )
+        return sorted(incidents, key=lambda incident: incident.started_datetime)
+
+    def next_incident_sequence(self, team_id, day: str) -> int:
+        with self.__lock:
+            sequence = self.__counters.get((team_id, day), 0) + 1
+            self.__counters[(team_id, day)] = sequence
+            return sequence
+
+    def __get_team(self, team_id) -> dict:
+        return self.__teams.get(team_id, {})
+
+    def __save_app(self, team_id, app_name, app_data: dict):
+        with self.__lock:
+            team = self.__teams.setdefault(team_id, {"teamId": team_id})
+            team.setdefault("apps", {})[app_name] = app_data
+            return {}
+
+    def __get_incidents_by_status(
+        self,
+        team_id,
+        incident_status: IncidentStatus,
+        started_from=None,
+        started_to=None,
+    ) -> List[Incident]:
+        with self.__lock:
+            entries = self.__status_index.get((team_id, incident_status.name), [])
+            first = 0
+            last = len(entries)
+            if started_from is not None:
+                first = bisect.bisect_left(entries, (started_from, ""))
+            if started_to is not None:
+                # "~" sorts after any incident id, entries started at started_to are included
+                last = bisect.bisect_right(entries, (started_to, "~"))
+            return [
+                self.build_incident(self.__incidents[(team_id, incident_id)])
+                for _started, incident_id in entries[first:last]
+            ]
+
+    def __add_to_status_index(self, incident_item: dict):
+        entries = self.__status_index.setdefault(
+            (incident_item["teamId"], incident_item["status"]), []
+        )
+        bisect.insort(
+            entries, (incident_item["started_datetime"], incident_item["incidentId"])
+        )
+
+    def __remove_from_status_index(self, incident_item: dict):
+        entries = self.__status_index.get(
+            (incident_item["teamId"], incident_item["status"]), []
+        )
+        entry = (incident_item["started_datetime"], incident_item["incidentId"])
+        position = bisect.bisect_left(entries, entry)
+        if position < len(entries) and entries[position] == entry:
+            del entries[position]
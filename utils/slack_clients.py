@@ -0,0 +1,29 @@
+import threading
+from collections import OrderedDict
+from slack_sdk import WebClient
+
+
+class SlackClients:
+    """
+    Slack clients kept per access token, so events of the same team handled by a warm
+    process share one client instead of building a new one per event.
+    The least recently used clients are dropped once there are MAX_CLIENTS
+    """
+
+    MAX_CLIENTS = 128
+
+    __clients = OrderedDict()
+    __lock = threading.Lock()
+
+    @classmethod
+    def get_client(cls, access_token) -> WebClient:
+        with cls.__lock:
+            client = cls.__clients.get(access_token)
+            if client is not None:
+                cls.__clients.move_to_end(access_token)
+                return client
+            client = WebClient(token=access_token)
+            cls.__clients[access_token] = client
+            if len(cls.__clients) > cls.MAX_CLIENTS:
+                cls.__clients.popitem(last=False)
+            return client
@@ -0,0 +1,422 @@
+import contextlib
+import json
+import logging
+import queue
+import sqlite3
+from typing import Iterator, List, Tuple
+from domain.incident import Incident, IncidentStatus
+from domain.integrations.jira import Jira
+from domain.integrations.zoom import Zoom
+from utils.date_time_utils import DateTimeUtils
+from utils.storage_backend import StorageBackend
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS teams (
+        team_id TEXT PRIMARY KEY,
+        access_token TEXT,
+        oncall TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS team_apps (
+        team_id TEXT NOT NULL,
+        app_name TEXT NOT NULL,
+        data TEXT NOT NULL,
+        PRIMARY KEY (team_id, app_name)
+    )""",
+    """CREATE TABLE IF NOT EXISTS responders (
+        team_id TEXT NOT NULL,
+        responder_id TEXT NOT NULL,
+        PRIMARY KEY (team_id, responder_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS incidents (
+        team_id TEXT NOT NULL,
+        incident_id TEXT NOT NULL,
+        name TEXT,
+        call_link TEXT,
+        ticket_link TEXT,
+        status TEXT NOT NULL,
+        started_datetime TEXT NOT NULL,
+        closed_at TEXT,
+        PRIMARY KEY (team_id, incident_id)
+    )""",
+    """CREATE INDEX IF NOT EXISTS incidents_team_status_started
+        ON incidents (team_id, status, started_datetime)""",
+    """CREATE INDEX IF NOT EXISTS incidents_team_started
+        ON incidents (team_id, started_datetime)""",
+    """CREATE TABLE IF NOT EXISTS counters (
+        team_id TEXT NOT NULL,
+        day TEXT NOT NULL,
+        sequence INTEGER NOT NULL,
+        PRIMARY KEY (team_id, day)
+    )""",
+    """CREATE TABLE IF NOT EXISTS refresh_leases (
+        team_id TEXT NOT NULL,
+        app_name TEXT NOT NULL,
+        owner TEXT NOT NULL,
+        expires_at REAL NOT NULL,
+        PRIMARY KEY (team_id, app_name)
+    )""",
+    """CREATE TABLE IF NOT EXISTS idempotency_keys (
+        idempotency_key TEXT PRIMARY KEY,
+        expires_at REAL NOT NULL
+    )""",
+]
+
+# Statements are always the same strings with ? parameters, so sqlite3 prepares them
+# once per connection and reuses them from its statement cache
+INSERT_TEAM = "INSERT OR IGNORE INTO teams (team_id) VALUES (?)"
+SELECT_TEAM = "SELECT access_token, oncall FROM teams WHERE team_id = ?"
+UPDATE_ACCESS_TOKEN = "UPDATE teams SET access_token = ? WHERE team_id = ?"
+UPDATE_ONCALL = "UPDATE teams SET oncall = ? WHERE team_id = ?"
+SELECT_APPS = "SELECT app_name, data FROM team_apps WHERE team_id = ?"
+SELECT_ALL_APPS = "SELECT team_id, app_name, data FROM team_apps ORDER BY team_id"
+UPSERT_APP = (
+    "INSERT OR REPLACE INTO team_apps (team_id, app_name, data) VALUES (?, ?, ?)"
+)
+SELECT_RESPONDERS = "SELECT responder_id FROM responders WHERE team_id = ?"
+INSERT_RESPONDER = (
+    "INSERT OR IGNORE INTO responders (team_id, responder_id) VALUES (?, ?)"
+)
+DELETE_RESPONDER = "DELETE FROM responders WHERE team_id = ? AND responder_id = ?"
+INSERT_INCIDENT = (
+    "INSERT OR IGNORE INTO incidents (team_id, incident_id, name, call_link, ticket_link, "
+    "status, started_datetime) VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+UPDATE_INCIDENT_STATUS = (
+    "UPDATE incidents SET status = ?, closed_at = ? "
+    "WHERE team_id = ? AND incident_id = ?"
+)
+INCIDENT_COLUMNS = (
+    "team_id, incident_id, name, call_link, ticket_link, status, "
+    "started_datetime, closed_at"
+)
+SELECT_INCIDENT = (
+    f"SELECT {INCIDENT_COLUMNS} FROM incidents WHERE team_id = ? AND incident_id = ?"
+)
+SELECT_INCIDENTS_BY_STATUS = (
+    f"SELECT {INCIDENT_COLUMNS} FROM incidents WHERE team_id = ? AND status = ? "
+    "AND started_datetime >= ? ORDER BY started_datetime"
+)
+SELECT_INCIDENTS_STARTED_BETWEEN = (
+    f"SELECT {INCIDENT_COLUMNS} FROM incidents WHERE team_id = ? "
+    "AND started_datetime BETWEEN ? AND ? ORDER BY started_datetime"
+)
+INSERT_COUNTER = (
+    "INSERT OR IGNORE INTO counters (team_id, day, sequence) VALUES (?, ?, 0)"
+)
+INCREASE_COUNTER = (
+    "UPDATE counters SET sequence = sequence + 1 WHERE team_id = ? AND day = ?"
+)
+SELECT_COUNTER = "SELECT sequence FROM counters WHERE team_id = ? AND day = ?"
+DELETE_EXPIRED_LEASE = (
+    "DELETE FROM refresh_leases WHERE team_id = ? AND app_name = ? AND expires_at < ?"
+)
+INSERT_LEASE = (
+    "INSERT OR IGNORE INTO refresh_leases (team_id, app_name, owner, expires_at) "
+    "VALUES (?, ?, ?, ?)"
+)
+DELETE_LEASE = (
+    "DELETE FROM refresh_leases WHERE team_id = ? AND app_name = ? AND owner = ?"
+)
+DELETE_EXPIRED_IDEMPOTENCY_KEY = (
+    "DELETE FROM idempotency_keys WHERE idempotency_key = ? AND expires_at < ?"
+)
+INSERT_IDEMPOTENCY_KEY = (
+    "INSERT OR IGNORE INTO idempotency_keys (idempotency_key, expires_at) VALUES (?, ?)"
+)
+DELETE_IDEMPOTENCY_KEY = "DELETE FROM idempotency_keys WHERE idempotency_key = ?"
+
+
+class SqliteStorage(StorageBackend):
+    """
+    Storage backend for self hosted single node deployments, backed by a SQLite file.
+    Connections are kept in a pool and use WAL mode, so readers don't wait for writers
+    """
+
+    STATEMENT_CACHE_SIZE = 64
+
+    def __init__(self, database_path: str, pool_size=5):
+        self.database_path = database_path
+        self.__pool = queue.Queue()
+        for _ in range(pool_size):
+            self.__pool.put(self.__connect())
+        with self.__transaction() as connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+
+    def get_slack_access_token(self, team_id):
+        with self.__connection() as connection:
+            row = connection.execute(SELECT_TEAM, (team_id,)).fetchone()
+            return row["access_token"] if row is not None else None
+
+    def save_slack_access_token(self, team_id, access_token):
+        with self.__transaction() as connection:
+            connection.execute(INSERT_TEAM, (team_id,))
+            connection.execute(UPDATE_ACCESS_TOKEN, (access_token, team_id))
+            return {}
+
+    def get_authorized_apps(self, team_id, consistent_read=False) -> dict:
+        with self.__connection() as connection:
+            rows = connection.execute(SELECT_APPS, (team_id,)).fetchall()
+            return {row["app_name"]: json.loads(row["data"]) for row in rows}
+
+    def get_jira_data(self, team_id, consistent_read=False) -> Jira:
+        apps = self.get_authorized_apps(team_id)
+        if "jira" not in apps:
+            return None
+        return self.build_jira(apps["jira"])
+
+    def save_jira_data(self, team_id, jira: Jira):
+        return self.__save_app(
+            team_id,
+            "jira",
+            {
+                "id": jira.account_id,
+                "access_token": jira.token_data.access_token,
+                "refresh_token": jira.token_data.refresh_token,
+                "expiry_date": jira.token_data.expiry_date,
+            },
+        )
+
+    def get_zoom_data(self, team_id, consistent_read=False) -> Zoom:
+        apps = self.get_authorized_apps(team_id)
+        if "zoom" not in apps:
+            return None
+        return self.build_zoom(apps["zoom"])
+
+    def save_zoom_data(self, team_id, zoom: Zoom):
+        return self.__save_app(
+            team_id,
+            "zoom",
+            {
+                "access_token": zoom.token_data.access_token,
+                "refresh_token": zoom.token_data.refresh_token,
+                "expiry_date": zoom.token_data.expiry_date,
+            },
+        )
+
+    def iter_authorized_apps(self) -> Iterator[Tuple[str, dict]]:
+        with self.__connection() as connection:
+            rows = connection.execute(SELECT_ALL_APPS).fetchall()
+        teams_apps = {}
+        for row in rows:
+            teams_apps.setdefault(row["team_id"], {})[row["app_name"]] = json.loads(
+                row["data"]
+            )
+        return iter(teams_apps.items())
+
+    def acquire_refresh_lease(
+        self, team_id, app_name, owner, lease_seconds, now: float
+    ) -> bool:
+        with self.__transaction() as connection:
+            connection.execute(DELETE_EXPIRED_LEASE, (team_id, app_name, now))
+            cursor = connection.execute(
+                INSERT_LEASE, (team_id, app_name, owner, now + lease_seconds)
+            )
+            return cursor.rowcount == 1
+
+    def release_refresh_lease(self, team_id, app_name, owner):
+        with self.__transaction() as connection:
+            connection.execute(DELETE_LEASE, (team_id, app_name, owner))
+
+    def claim_idempotency_key(self, key, ttl_seconds, now: float) -> bool:
+        with self.__transaction() as connection:
+            connection.execute(DELETE_EXPIRED_IDEMPOTENCY_KEY, (key, now))
+            cursor = connection.execute(
+                INSERT_IDEMPOTENCY_KEY, (key, now + ttl_seconds)
+            )
+            return cursor.rowcount == 1
+
+    def release_idempotency_key(self, key):
+        with self.__transaction() as connection:
+            connection.execute(DELETE_IDEMPOTENCY_KEY, (key,))
+
+    def get_responders(self, team_id):
+        with self.__connection() as connection:
+            return self.__select_responders(connection, team_id)
+
+    def save_responders(self, team_id, responders):
+        with self.__transaction() as connection:
+            connection.executemany(
+                INSERT_RESPONDER, [(team_id, responder) for responder in responders]
+            )
+            return self.__responders_response(connection, team_id)
+
+    def remove_responders(self, team_id, responders):
+        with self.__transaction() as connection:
+            connection.executemany(
+                DELETE_RESPONDER, [(team_id, responder) for responder in responders]
+            )
+            return self.__responders_response(connection, team_id)
+
+    def get_oncall(self, team_id):
+        with self.__connection() as connection:
+            row = connection.execute(SELECT_TEAM, (team_id,)).fetchone()
+            return row["oncall"] if row is not None else None
+
+    def save_oncall(self, team_id, user_id):
+        with self.__transaction() as connection:
+            connection.execute(INSERT_TEAM, (team_id,))
+            connection.execute(UPDATE_ONCALL, (user_id, team_id))
+            return {}
+
+    def create_incident(self, incident: Incident):
+        with self.__transaction() as connection:
+            cursor = connection.execute(
+                INSERT_INCIDENT,
+                (
+                    incident.team_id,
+                    incident.incident_id,
+                    incident.name,
+                    incident.call.get_link() if incident.call is not None else "",
+                    incident.ticket.get_link() if incident.ticket is not None else "",
+                    incident.status.name,
+                    incident.started_datetime,
+                ),
+            )
+            if cursor.rowcount == 0:
+                logger.error(
+                    f"incident already exists {incident.team_id} {incident.incident_id}"
+                )
+                return None
+            return {}
+
+    def update_incident_status(
+        self, incident: Incident, incident_status: IncidentStatus
+    ):
+        with self.__transaction() as connection:
+            cursor = connection.execute(
+                UPDATE_INCIDENT_STATUS,
+                (
+                    incident_status.name,
+                    (
+                        DateTimeUtils.current_datetime_as_string()
+                        if incident_status == IncidentStatus.CLOSED
+                        else None
+                    ),
+                    incident.team_id,
+                    incident.incident_id,
+                ),
+            )
+            if cursor.rowcount == 0:
+                logger.error(
+                    f"trying to close a non existent incident {incident.team_id}"
+                )
+                return None
+            return {"status": incident_status.name}
+
+    def get_incident(
+        self, team_id: str, incident_id: str, consistent_read=False
+    ) -> Incident:
+        with self.__connection() as connection:
+            row = connection.execute(SELECT_INCIDENT, (team_id, incident_id)).fetchone()
+            if row is None:
+                return None
+            return self.__build_incident_from_row(row)
+
+    def get_ongoing_incidents(self, team_id) -> List[Incident]:
+        return self.__get_incidents_by_status(team_id, IncidentStatus.ONGOING, "")
+
+    def get_today_incidents(self, team_id) -> List[Incident]:
+        return self.get_incidents_started_between(
+            team_id,
+            DateTimeUtils.start_of_today_as_string(),
+            DateTimeUtils.end_of_today_as_string(),
+        )
+
+    def get_incidents_started_between(
+        self, team_id, started_from: str, started_to: str
+    ) -> List[Incident]:
+        with self.__connection() as connection:
+            rows = connection.execute(
+                SELECT_INCIDENTS_STARTED_BETWEEN, (team_id, started_from, started_to)
+            ).fetchall()
+            return [self.__build_incident_from_row(row) for row in rows]
+
+    def next_incident_sequence(self, team_id, day: str) -> int:
+        with self.__transaction() as connection:
+            connection.execute(INSERT_COUNTER, (team_id, day))
+            connection.execute(INCREASE_COUNTER, (team_id, day))
+            row = connection.execute(SELECT_COUNTER, (team_id, day)).fetchone()
+            return row["sequence"]
+
+    def __connect(self) -> sqlite3.Connection:
+        # isolation_level=None leaves transactions to __transaction
+        connection = sqlite3.connect(
+            self.database_path,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.STATEMENT_CACHE_SIZE,
+        )
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA busy_timeout=5000")
+        return connection
+
+    @contextlib.contextmanager
+    def __connection(self):
+        """Takes a connection from the pool and gives it back when done"""
+        connection = self.__pool.get()
+        try:
+            yield connection
+        finally:
+            self.__pool.put(connection)
+
+    @contextlib.contextmanager
+    def __transaction(self):
+        """
+        Runs the statements in a write transaction. BEGIN IMMEDIATE takes the write lock
+        at the start, so read-then-write steps (like counters) can't interleave
+        """
+        with self.__connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def __save_app(self, team_id, app_name, app_data: dict):
+        with self.__transaction() as connection:
+            connection.execute(INSERT_TEAM, (team_id,))
+            connection.execute(UPSERT_APP, (team_id, app_name, json.dumps(app_data)))
+            return {}
+
+    def __select_responders(self, connection, team_id) -> set:
+        rows = connection.execute(SELECT_RESPONDERS, (team_id,)).fetchall()
+        return {row["responder_id"] for row in rows}
+
+    def __responders_response(self, connection, team_id) -> dict:
+        """Same shape as the dynamo update response, without responders when there are none"""
+        responders = self.__select_responders(connection, team_id)
+        if len(responders) == 0:
+            return {"Attributes": {}}
+        return {"Attributes": {"responders": responders}}
+
+    def __get_incidents_by_status(
+        self, team_id, incident_status: IncidentStatus, started_from: str
+    ) -> List[Incident]:
+        with self.__connection() as connection:
+            rows = connection.execute(
+                SELECT_INCIDENTS_BY_STATUS,
+                (team_id, incident_status.name, started_from),
+            ).fetchall()
+            return [self.__build_incident_from_row(row) for row in rows]
+
+    def __build_incident_from_row(self, row) -> Incident:
+        return self.build_incident(
+            {
+                "teamId": row["team_id"],
+                "incidentId": row["incident_id"],
+                "name": row["name"],
+                "callLink": row["call_link"],
+                "ticketLink": row["ticket_link"],
+                "status": row["status"],
+                "started_datetime": row["started_datetime"],
+                "closed_at": row["closed_at"],
+            }
+        )
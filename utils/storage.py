@@ -0,0 +1,51 @@
+import os
+import threading
+from utils.storage_backend import StorageBackend
+
+
+class Storage:
+    """
+    Gives access to the configured storage backend.
+    The STORAGE_BACKEND environment variable selects it: dynamo (default), memory or sqlite.
+    The sqlite backend saves to the file in SQLITE_DATABASE_PATH (sereno.db by default).
+    The backend is created once and shared by the whole process
+    """
+
+    DYNAMO = "dynamo"
+    MEMORY = "memory"
+    SQLITE = "sqlite"
+
+    __backend: StorageBackend = None
+    __lock = threading.Lock()
+
+    @classmethod
+    def get_backend(cls) -> StorageBackend:
+        if cls.__backend is None:
+            with cls.__lock:
+                if cls.__backend is None:
+                    cls.__backend = cls.__build_backend(
+                        os.environ.get("STORAGE_BACKEND", cls.DYNAMO)
+                    )
+        return cls.__backend
+
+    @classmethod
+    def set_backend(cls, backend: StorageBackend):
+        """Replaces the backend, e.g. to use a fresh MemoryStorage in tests or benchmarks"""
+        cls.__backend = backend
+
+    @classmethod
+    def __build_backend(cls, backend_name) -> StorageBackend:
+        # backends are imported here so only the selected one (and its dependencies) is loaded
+        if backend_name == cls.DYNAMO:
+            from utils.dynamo import DynamoUtils
+
+            return DynamoUtils()
+        if backend_name == cls.MEMORY:
+            from utils.memory_storage import MemoryStorage
+
+            return MemoryStorage()
+        if backend_name == cls.SQLITE:
+            from utils.sqlite_storage import SqliteStorage
+
+            return SqliteStorage(os.environ.get("SQLITE_DATABASE_PATH", "sereno.db"))
+        raise Exception(f"Unknown storage backend {backend_name}")
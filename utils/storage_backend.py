@@ -0,0 +1,190 @@
+"""
+Abstract class with the operations the slackbot needs from its database.
+Teams (users table) keep the slack token, authorized apps, responders and oncall.
+Incidents (incidents table) are saved per team, the incident id is the slack channel id.
+Each backend (DynamoDB, in memory, etc) has to extend this class and implement the abstract methods
+"""
+from abc import ABC, abstractmethod
+from typing import Iterator, List, Tuple
+from domain.incident import Incident, IncidentStatus
+from domain.integrations.jira import Jira
+from domain.integrations.zoom import Zoom
+from domain.token_data import TokenData
+
+
+class StorageUnavailableError(Exception):
+    """
+    The database didn't answer in time (e.g. throttled) after retrying.
+    Reads can fall back to cached data, derived writes are deferred, the rest fail
+    """
+
+    pass
+
+
+class StorageBackend(ABC):
+    @abstractmethod
+    def get_slack_access_token(self, team_id):
+        pass
+
+    @abstractmethod
+    def save_slack_access_token(self, team_id, access_token):
+        pass
+
+    @abstractmethod
+    def get_authorized_apps(self, team_id, consistent_read=False) -> dict:
+        """
+        Returns a dict with the data of each authorized app, keyed by app name (jira, zoom).
+        consistent_read skips any cached copy, so a token saved just before is seen
+        """
+        pass
+
+    @abstractmethod
+    def get_jira_data(self, team_id, consistent_read=False) -> Jira:
+        pass
+
+    @abstractmethod
+    def save_jira_data(self, team_id, jira: Jira):
+        pass
+
+    @abstractmethod
+    def get_zoom_data(self, team_id, consistent_read=False) -> Zoom:
+        pass
+
+    @abstractmethod
+    def save_zoom_data(self, team_id, zoom: Zoom):
+        pass
+
+    @abstractmethod
+    def iter_authorized_apps(self) -> Iterator[Tuple[str, dict]]:
+        """Yields (team_id, authorized apps) of every team with apps, meant for background jobs"""
+        pass
+
+    @abstractmethod
+    def acquire_refresh_lease(
+        self, team_id, app_name, owner, lease_seconds, now: float
+    ) -> bool:
+        """
+        Takes the lease to refresh the oauth token of the app for lease_seconds.
+        Returns False if somebody else holds a lease that didn't expire yet (now is epoch seconds)
+        """
+        pass
+
+    @abstractmethod
+    def release_refresh_lease(self, team_id, app_name, owner):
+        """Drops the lease, only if it still belongs to the owner"""
+        pass
+
+    @abstractmethod
+    def claim_idempotency_key(self, key, ttl_seconds, now: float) -> bool:
+        """
+        Records the key for ttl_seconds, e.g. the id of a slack event.
+        Returns False if the key was already claimed and didn't expire yet (now is epoch seconds)
+        """
+        pass
+
+    @abstractmethod
+    def release_idempotency_key(self, key):
+        """Drops the claim of the key, so it can be claimed again"""
+        pass
+
+    @abstractmethod
+    def get_responders(self, team_id):
+        pass
+
+    @abstractmethod
+    def save_responders(self, team_id, responders):
+        """
+        Adds responders to the team.
+        Returns a dict with the whole updated set in ["Attributes"]["responders"]
+        """
+        pass
+
+    @abstractmethod
+    def remove_responders(self, team_id, responders):
+        """
+        Removes responders from the team.
+        Returns a dict with the updated set in ["Attributes"]["responders"], without it if the set is empty
+        """
+        pass
+
+    @abstractmethod
+    def get_oncall(self, team_id):
+        pass
+
+    @abstractmethod
+    def save_oncall(self, team_id, user_id):
+        pass
+
+    @abstractmethod
+    def create_incident(self, incident: Incident):
+        """Saves a new incident. Returns None if there is already an incident for the channel"""
+        pass
+
+    @abstractmethod
+    def update_incident_status(
+        self, incident: Incident, incident_status: IncidentStatus
+    ):
+        """Returns None if the incident doesn't exist"""
+        pass
+
+    @abstractmethod
+    def get_incident(
+        self, team_id: str, incident_id: str, consistent_read=False
+    ) -> Incident:
+        """Returns None if the incident doesn't exist"""
+        pass
+
+    @abstractmethod
+    def get_ongoing_incidents(self, team_id) -> List[Incident]:
+        pass
+
+    @abstractmethod
+    def get_today_incidents(self, team_id) -> List[Incident]:
+        """Returns the incidents started today in any status"""
+        pass
+
+    @abstractmethod
+    def get_incidents_started_between(
+        self, team_id, started_from: str, started_to: str
+    ) -> List[Incident]:
+        """Returns the incidents started between the two date times (inclusive) in any status, sorted by start"""
+        pass
+
+    @abstractmethod
+    def next_incident_sequence(self, team_id, day: str) -> int:
+        """Returns the next number of the team counter for the day, concurrent callers get different numbers"""
+        pass
+
+    @staticmethod
+    def build_jira(jira_dict: dict) -> Jira:
+        """Builds Jira from the data saved in the authorized apps"""
+        token_data = TokenData(
+            jira_dict.get("access_token"),
+            jira_dict.get("refresh_token"),
+            jira_dict.get("expiry_date"),
+        )
+        return Jira(token_data, jira_dict.get("id"))
+
+    @staticmethod
+    def build_zoom(zoom_dict: dict) -> Zoom:
+        """Builds Zoom from the data saved in the authorized apps"""
+        token_data = TokenData(
+            zoom_dict.get("access_token"),
+            zoom_dict.get("refresh_token"),
+            zoom_dict.get("expiry_date"),
+        )
+        return Zoom(token_data)
+
+    @staticmethod
+    def build_incident(incident_item: dict) -> Incident:
+        """Builds an incident from its saved attributes, the call and ticket only have their links"""
+        incident = Incident.build_from_dict(incident_item)
+        if "callLink" in incident_item:
+            zoom = Zoom(None)
+            zoom.link = incident_item.get("callLink")
+            incident.set_call(zoom)
+        if "ticketLink" in incident_item:
+            jira = Jira(None, "")
+            jira.link = incident_item.get("ticketLink")
+            incident.set_ticket(jira)
+        return incident
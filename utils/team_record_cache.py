@@ -0,0 +1,50 @@
+import time
+from domain.team_record import TeamRecord
+
+
+class TeamRecordCache:
+    """
+    Keeps team records in memory while the lambda container is warm.
+    Every record remembers when it was last validated against the database
+    """
+
+    def __init__(
+        self, ttl_seconds: float, max_stale_seconds: float, clock=time.monotonic
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.clock = clock
+        self.__team_records = {}
+        self.__validated_at = {}
+
+    def get(self, team_id) -> TeamRecord:
+        return self.__team_records.get(team_id)
+
+    def put(self, team_record: TeamRecord):
+        self.__team_records[team_record.team_id] = team_record
+        self.mark_validated(team_record.team_id)
+
+    def mark_validated(self, team_id):
+        self.__validated_at[team_id] = self.clock()
+
+    def is_fresh(self, team_id) -> bool:
+        """Returns True if the record can be used without checking the database"""
+        return self.__age(team_id) < self.ttl_seconds
+
+    def can_serve_stale(self, team_id) -> bool:
+        """Returns True if the record is still good enough to be used when the database fails"""
+        return self.__age(team_id) < self.max_stale_seconds
+
+    def invalidate(self, team_id):
+        self.__team_records.pop(team_id, None)
+        self.__validated_at.pop(team_id, None)
+
+    def clear(self):
+        self.__team_records = {}
+        self.__validated_at = {}
+
+    def __age(self, team_id) -> float:
+        validated_at = self.__validated_at.get(team_id)
+        if validated_at is None:
+            return float("inf")
+        return self.clock() - validated_at